@@ -0,0 +1,230 @@
+"""
+Aggregate queries shared by the dashboard, view-only page and JSON APIs
+Monthly revenue/expense/count and the expense category breakdown are each
+computed in a single GROUP BY pass over daily_rollups (see rollups.py)
+instead of one SUM query per month over the raw transactions
+"""
+
+import calendar
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter')
+
+DEFAULT_SERIES_DAYS = 30
+MAX_SERIES_DAYS = 366
+
+
+@dataclass
+class MonthTotals:
+    """Revenue, expense and transaction count for one calendar month"""
+    start: date
+    revenue: float = 0.0
+    expense: float = 0.0
+    count: int = 0
+
+    @property
+    def key(self):
+        return self.start.strftime('%Y-%m')
+
+    @property
+    def profit(self):
+        return self.revenue - self.expense
+
+
+@dataclass
+class CategoryTotal:
+    kategori: str
+    total: float
+    count: int
+
+
+@dataclass
+class DashboardAggregates:
+    """Monthly trend (oldest month first) plus the current month's breakdown"""
+    months: list
+    current: MonthTotals
+    categories: list = field(default_factory=list)
+
+    def labels(self, fmt='%B'):
+        return [m.start.strftime(fmt) for m in self.months]
+
+    @property
+    def revenue_series(self):
+        return [float(m.revenue) for m in self.months]
+
+    @property
+    def expense_series(self):
+        return [float(m.expense) for m in self.months]
+
+    @property
+    def profit_series(self):
+        return [float(m.profit) for m in self.months]
+
+
+def month_starts(now, months):
+    """First day of the last ``months`` calendar months, oldest first"""
+    year, month = now.year, now.month
+    starts = []
+    for _ in range(months):
+        starts.append(date(year, month, 1))
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return starts[::-1]
+
+
+def monthly_totals(conn, now=None, months=6):
+    """Per-month totals for the last ``months`` months in one statement.
+
+    The last bucket is open-ended like the original "tanggal >= first of
+    month" queries, so future-dated rows still count toward this month.
+    """
+    now = now or datetime.now()
+    starts = month_starts(now, months)
+    buckets = {s.strftime('%Y-%m'): MonthTotals(s) for s in starts}
+    current_key = starts[-1].strftime('%Y-%m')
+
+    rows = conn.execute(
+        """
+        SELECT substr(tanggal, 1, 7) AS bulan,
+               COALESCE(SUM(CASE WHEN tipe = 'pendapatan' THEN total END), 0) AS revenue,
+               COALESCE(SUM(CASE WHEN tipe = 'pengeluaran' THEN total END), 0) AS expense,
+               COALESCE(SUM(count), 0) AS count
+        FROM daily_rollups
+        WHERE tanggal >= ?
+        GROUP BY bulan
+        """,
+        (starts[0].isoformat(),)
+    ).fetchall()
+
+    for row in rows:
+        bucket = buckets.get(row['bulan'] if row['bulan'] < current_key else current_key)
+        if bucket is None:
+            continue
+        bucket.revenue += row['revenue']
+        bucket.expense += row['expense']
+        bucket.count += row['count']
+
+    return [buckets[s.strftime('%Y-%m')] for s in starts]
+
+
+def expense_categories(conn, start_date):
+    """Expense totals per kategori since ``start_date``, largest first"""
+    rows = conn.execute(
+        """
+        SELECT kategori, COALESCE(SUM(total), 0) AS total, COALESCE(SUM(count), 0) AS count
+        FROM daily_rollups
+        WHERE tipe = 'pengeluaran' AND tanggal >= ?
+        GROUP BY kategori
+        ORDER BY total DESC
+        """,
+        (start_date,)
+    ).fetchall()
+    return [CategoryTotal(row['kategori'], float(row['total']), row['count']) for row in rows]
+
+
+def dashboard_aggregates(conn, now=None, months=6, with_categories=True):
+    """Everything the dashboards chart, in at most two statements"""
+    now = now or datetime.now()
+    trend = monthly_totals(conn, now, months)
+    current = trend[-1]
+    categories = expense_categories(conn, current.start.isoformat()) if with_categories else []
+    return DashboardAggregates(months=trend, current=current, categories=categories)
+
+
+@dataclass
+class PeriodSeries:
+    """Dense revenue/expense series over a date range, one entry per bucket"""
+    granularity: str
+    starts: list = field(default_factory=list)
+    labels: list = field(default_factory=list)
+    revenue: list = field(default_factory=list)
+    expense: list = field(default_factory=list)
+
+
+def bucket_start(day, granularity):
+    """First day of the bucket containing ``day``"""
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'quarter':
+        return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def _next_bucket(start, granularity):
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    months = 1 if granularity == 'month' else 3
+    month = start.month - 1 + months
+    return date(start.year + month // 12, month % 12 + 1, 1)
+
+
+def bucket_label(start, granularity):
+    if granularity == 'day':
+        return str(start.day)
+    if granularity == 'week':
+        return f"W{start.isocalendar()[1]}"
+    if granularity == 'month':
+        return calendar.month_name[start.month][:3]
+    return f"Q{(start.month - 1) // 3 + 1}"
+
+
+def period_series(conn, start, end, granularity='day'):
+    """Revenue/expense per bucket over [start, end) from the daily rollups.
+
+    One grouped query returns at most two rows per day; each row is placed
+    in its bucket by a dict lookup, so the cost is linear in the days.
+    """
+    first, stop = date.fromisoformat(start), date.fromisoformat(end)
+    series = PeriodSeries(granularity)
+    index = {}
+    current = bucket_start(first, granularity)
+    while current < stop:
+        index[current] = len(series.starts)
+        series.starts.append(current)
+        series.labels.append(bucket_label(current, granularity))
+        current = _next_bucket(current, granularity)
+    series.revenue = [0.0] * len(series.starts)
+    series.expense = [0.0] * len(series.starts)
+
+    rows = conn.execute(
+        """
+        SELECT tanggal, tipe, SUM(total) AS total
+        FROM daily_rollups
+        WHERE tanggal >= ? AND tanggal < ?
+        GROUP BY tanggal, tipe
+        """,
+        (start, end)
+    ).fetchall()
+
+    for row in rows:
+        try:
+            i = index[bucket_start(date.fromisoformat(row['tanggal']), granularity)]
+        except (ValueError, KeyError):
+            continue
+        target = series.revenue if row['tipe'] == 'pendapatan' else series.expense
+        target[i] += float(row['total'])
+
+    return series
+
+
+def clamp_days(value, default=DEFAULT_SERIES_DAYS):
+    try:
+        days = int(value) if value else default
+    except ValueError:
+        days = default
+    return max(1, min(days, MAX_SERIES_DAYS))
+
+
+def daily_series(conn, days=DEFAULT_SERIES_DAYS, today=None):
+    """Zero-filled daily series for the ``days`` days ending today, inclusive"""
+    today = today or date.today()
+    start = today - timedelta(days=days - 1)
+    return period_series(conn, start.isoformat(), (today + timedelta(days=1)).isoformat(), 'day')
@@ -1,15 +1,40 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, jsonify, send_file, stream_with_context
+from werkzeug.security import generate_password_hash
 from functools import wraps
-from datetime import datetime, timedelta
+from jinja2 import ChoiceLoader, FileSystemLoader
+from datetime import datetime
+import math
 import sqlite3
 import os
-from collections import defaultdict
-import calendar
+import db
+import cache
+import exports
+import conditional
+import credentials
+import aggregates
+import filters
+import fragments
+import importer
+import pagination
+import querylog
+import reports
+import sessions
+import stream
 
 app = Flask(__name__)
+# The HTML templates sit next to app.py in this repo; templates/ is still searched first
+app.jinja_loader = ChoiceLoader([app.jinja_loader, FileSystemLoader(app.root_path)])
 app.secret_key = 'your-secret-key-change-this-in-production'
-app.config['DATABASE'] = 'kopi_makmur.db'
+app.config['DATABASE'] = os.getenv('DATABASE', 'kopi_makmur.db')
+app.config['CASHFLOW_PAGE_SIZE'] = pagination.DEFAULT_PAGE_SIZE
+db.init_app(app)
+cache.init_app(app)
+conditional.init_app(app)
+stream.init_app(app)
+exports.init_app(app)
+reports.init_app(app)
+querylog.init_app(app)
+fragments.init_app(app)
 
 # Demo data for login page
 DEMO_USERS = [
@@ -20,19 +45,77 @@ DEMO_USERS = [
     {'username': 'Hari', 'password': 'owner', 'role': 'guest'},
     {'username': 'Dimse', 'password': 'owner', 'role': 'guest'},
 ]
+credentials.init_app(app, DEMO_USERS)
+sessions.init_app(app)
 
 # Database helper functions
 def get_db_connection():
-    conn = sqlite3.connect(app.config['DATABASE'])
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Pooled connection bound to the current request, returned on teardown;
+    # wrapped so each request's statements are timed (querylog)
+    return querylog.traced(db.get_db())
+
+def dashboard_data(conn):
+    """Aggregates shared by admin_dashboard and viewonly, cached per data version"""
+    def compute():
+        return {
+            'stats': aggregates.dashboard_aggregates(conn),
+            'recent_transactions': conn.execute(
+                "SELECT * FROM transactions ORDER BY tanggal DESC, id DESC LIMIT 10"
+            ).fetchall(),
+            'total_users': conn.execute("SELECT COUNT(*) as total FROM users").fetchone()['total'],
+        }
+    return cache.cached_value('dashboard', conn, compute)
+
+def stats_payload(current, total_users):
+    return {
+        'total_revenue': float(current.revenue),
+        'total_expense': float(current.expense),
+        'total_transactions': int(current.count),
+        'total_users': int(total_users),
+        'profit': float(current.profit)
+    }
+
+def distribution_payload(categories):
+    if not categories:
+        # Return default sample data if no real data
+        return {
+            'labels': ['Bahan Pokok', 'Barang', 'Pengeluaran lain_lain'],
+            'data': [90.9, 5.3, 3.8]
+        }
+    return {
+        'labels': [cat.kategori for cat in categories],
+        'data': [cat.total for cat in categories]
+    }
+
+def trend_payload(trend):
+    return {
+        'labels': trend.labels('%B %Y'),
+        'revenue': trend.revenue_series,
+        'expense': trend.expense_series
+    }
+
+def daily_payload(series):
+    return {
+        'days': len(series.starts),
+        'dates': [d.isoformat() for d in series.starts],
+        'labels': [d.strftime('%d/%m') for d in series.starts],
+        'income': series.revenue,
+        'expense': series.expense
+    }
+
+def dashboard_stats(conn):
+    """Current month totals for the stats cards and the live stream"""
+    def compute():
+        current = aggregates.monthly_totals(conn, months=1)[-1]
+        total_users = conn.execute("SELECT COUNT(*) as total FROM users").fetchone()['total']
+        return stats_payload(current, total_users)
+    return cache.cached_value('dashboard-stats', conn, compute)
 
 def init_db():
     conn = get_db_connection()
     with app.open_resource('schema.sql', mode='r') as f:
         conn.executescript(f.read())
     conn.commit()
-    conn.close()
 
 # Authentication decorator
 def login_required(f):
@@ -70,21 +153,44 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
+        auth = credentials.get_credentials()
+        
+        # Throttle before spending anything on the attempt
+        wait = auth.throttle(username, request.remote_addr)
+        if wait:
+            flash(f'Terlalu banyak percobaan login, coba lagi dalam {math.ceil(wait)} detik', 'error')
+            response = app.make_response((render_template('login.html', demo_users=DEMO_USERS), 429))
+            response.headers['Retry-After'] = str(math.ceil(wait))
+            return response
         
         # Check demo users first
-        for user in DEMO_USERS:
-            if user['username'] == username and user['password'] == password:
-                session['username'] = username
-                session['role'] = user['role']
-                flash('Login berhasil!', 'success')
-                return redirect(url_for('admin_dashboard'))
+        user = auth.demo_users.authenticate(username, password)
+        if user:
+            # Link the demo account to its users row when there is one, so
+            # routes that record or check user_id work for it too
+            row = get_db_connection().execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
+            session['username'] = username
+            session['role'] = user['role']
+            if row:
+                session['user_id'] = row['id']
+            flash('Login berhasil!', 'success')
+            return redirect(url_for('admin_dashboard'))
         
         # If not found in demo users, check database
         conn = get_db_connection()
         user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
+        # Don't hold a pooled connection while the hash is checked
+        db.close_db()
         
-        if user and check_password_hash(user['password'], password):
+        try:
+            valid = user is not None and auth.check_password(user['password'], password)
+        except credentials.HashingBusy:
+            flash('Server sedang sibuk, coba login lagi sebentar', 'error')
+            response = app.make_response((render_template('login.html', demo_users=DEMO_USERS), 503))
+            response.headers['Retry-After'] = '1'
+            return response
+        
+        if valid:
             session['username'] = user['username']
             session['role'] = user['role']
             session['user_id'] = user['id']
@@ -114,79 +220,30 @@ def logout():
 def admin_dashboard():
     conn = get_db_connection()
     
-    # Get current month data
+    # Current month totals, 6-month trend and category breakdown
     now = datetime.now()
-    start_date = now.replace(day=1).strftime('%Y-%m-%d')
-    
-    # Total revenue this month
-    total_revenue = conn.execute(
-        "SELECT COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pendapatan' AND tanggal >= ?",
-        (start_date,)
-    ).fetchone()['total']
-    
-    # Total expense this month
-    total_expense = conn.execute(
-        "SELECT COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pengeluaran' AND tanggal >= ?",
-        (start_date,)
-    ).fetchone()['total']
-    
-    # Total transactions this month
-    total_transactions = conn.execute(
-        "SELECT COUNT(*) as total FROM transactions WHERE tanggal >= ?",
-        (start_date,)
-    ).fetchone()['total']
+    data = dashboard_data(conn)
+    stats = data['stats']
     
-    # Recent transactions
-    recent_transactions = conn.execute(
-        "SELECT * FROM transactions ORDER BY tanggal DESC, id DESC LIMIT 10"
-    ).fetchall()
+    total_revenue = stats.current.revenue
+    total_expense = stats.current.expense
+    total_transactions = stats.current.count
     
-    # Get last 6 months data for charts
-    revenue_labels = []
-    revenue_data = []
-    expense_data = []
-    profit_data = []
+    # Recent transactions
+    recent_transactions = data['recent_transactions']
     
-    for i in range(5, -1, -1):
-        month_date = now - timedelta(days=30*i)
-        month_name = month_date.strftime('%B')
-        month_start = month_date.replace(day=1).strftime('%Y-%m-%d')
-        
-        # Calculate next month start
-        if month_date.month == 12:
-            next_month = month_date.replace(year=month_date.year + 1, month=1, day=1)
-        else:
-            next_month = month_date.replace(month=month_date.month + 1, day=1)
-        month_end = next_month.strftime('%Y-%m-%d')
-        
-        revenue = conn.execute(
-            "SELECT COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pendapatan' AND tanggal >= ? AND tanggal < ?",
-            (month_start, month_end)
-        ).fetchone()['total']
-        
-        expense = conn.execute(
-            "SELECT COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pengeluaran' AND tanggal >= ? AND tanggal < ?",
-            (month_start, month_end)
-        ).fetchone()['total']
-        
-        revenue_labels.append(month_name)
-        revenue_data.append(float(revenue))
-        expense_data.append(float(expense))
-        profit_data.append(float(revenue - expense))
+    # Last 6 months data for charts
+    revenue_labels = stats.labels('%B')
+    revenue_data = stats.revenue_series
+    expense_data = stats.expense_series
+    profit_data = stats.profit_series
     
     # Category breakdown
-    categories = conn.execute(
-        "SELECT kategori, COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pengeluaran' AND tanggal >= ? GROUP BY kategori",
-        (start_date,)
-    ).fetchall()
-    
-    category_labels = [cat['kategori'] for cat in categories]
-    category_data = [float(cat['total']) for cat in categories]
+    category_labels = [cat.kategori for cat in stats.categories]
+    category_data = [cat.total for cat in stats.categories]
     
     # Get user count
-    user_count = conn.execute("SELECT COUNT(*) as total FROM users").fetchone()['total']
-    
-    conn.close()
+    user_count = data['total_users']
     
     # Calculate additional metrics
     net_profit = total_revenue - total_expense
@@ -210,6 +267,7 @@ def admin_dashboard():
 
 @app.route('/cashflow')
 @login_required
+@conditional.conditional(get_db_connection, per_user=True)
 def cashflow_index():
     conn = get_db_connection()
     
@@ -219,84 +277,108 @@ def cashflow_index():
     month = request.args.get('month')
     year = request.args.get('year')
     
-    # Build query
-    query = "SELECT * FROM transactions WHERE 1=1"
-    params = []
-    
-    if date_from:
-        query += " AND tanggal >= ?"
-        params.append(date_from)
-    
-    if date_to:
-        query += " AND tanggal <= ?"
-        params.append(date_to)
-    
-    if month:
-        query += " AND strftime('%m', tanggal) = ?"
-        params.append(f"{int(month):02d}")
-    
-    if year:
-        query += " AND strftime('%Y', tanggal) = ?"
-        params.append(year)
-    
-    query += " ORDER BY tanggal DESC, id DESC"
-    
-    transactions = conn.execute(query, params).fetchall()
-    
-    # Calculate totals
-    total_pendapatan = sum([t['jumlah'] for t in transactions if t['tipe'] == 'pendapatan'])
-    total_pengeluaran = sum([t['jumlah'] for t in transactions if t['tipe'] == 'pengeluaran'])
+    # One page of rows on an index-friendly date range
+    try:
+        start, end = filters.date_range(month, year, date_from, date_to)
+    except ValueError:
+        flash('Filter tanggal tidak valid', 'error')
+        start = end = None
+    page_size = pagination.clamp_page_size(
+        request.args.get('page_size'), app.config['CASHFLOW_PAGE_SIZE']
+    )
+    try:
+        page = pagination.transactions_page(
+            conn, start, end,
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            page_size=page_size
+        )
+    except ValueError:
+        # Stale or hand-edited cursor: start again from the newest rows
+        page = pagination.transactions_page(conn, start, end, page_size=page_size)
+    transactions = page.rows
+    
+    # Next/prev links keep the current filters
+    page_args = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+    next_url = url_for('cashflow_index', after=page.next_cursor, **page_args) if page.next_cursor else None
+    prev_url = url_for('cashflow_index', before=page.prev_cursor, **page_args) if page.prev_cursor else None
+    
+    # Totals and category breakdown over the whole filter, not just the page,
+    # from the daily rollups: one row per day and category, not per transaction
+    where, params = filters.range_filter(start, end)
+    totals = conn.execute(
+        f"SELECT tipe, kategori, SUM(total) as total, SUM(count) as items FROM daily_rollups WHERE {where} GROUP BY tipe, kategori",
+        params
+    ).fetchall()
     
-    # Get category breakdown
-    category_summary = defaultdict(lambda: {'total_harga': 0, 'total_items': 0, 'total_quantity': '-'})
+    total_pendapatan = sum([r['total'] for r in totals if r['tipe'] == 'pendapatan'])
+    total_pengeluaran = sum([r['total'] for r in totals if r['tipe'] == 'pengeluaran'])
+    
+    # Quantity per unit for goods, e.g. "12 kg + 3 dus", grouped in SQL
+    quantities = conn.execute(
+        f"""
+        SELECT kategori,
+               group_concat(CASE WHEN qty = CAST(qty AS INTEGER) THEN CAST(qty AS INTEGER) ELSE qty END
+                            || ' ' || satuan, ' + ') as total_quantity
+        FROM (
+            SELECT kategori, satuan, SUM(jumlah) as qty
+            FROM transactions
+            WHERE {where} AND tipe = 'pengeluaran' AND kategori IN ('Bahan Pokok', 'Barang')
+              AND satuan IS NOT NULL AND satuan != '' AND jumlah
+            GROUP BY kategori, satuan
+            ORDER BY kategori, satuan
+        )
+        GROUP BY kategori
+        """,
+        params
+    ).fetchall()
+    quantity_by_kategori = {row['kategori']: row['total_quantity'] for row in quantities}
     
-    for transaction in transactions:
-        if transaction['tipe'] == 'pengeluaran':
-            cat = transaction['kategori']
-            category_summary[cat]['total_harga'] += transaction['jumlah']
-            category_summary[cat]['total_items'] += 1
-            
-            # Calculate total quantity if kategori is "Bahan Pokok" or "Barang"
-            if cat in ['Bahan Pokok', 'Barang'] and transaction.get('satuan') and transaction.get('jumlah'):
-                quantity = transaction.get('jumlah', 0)
-                unit = transaction.get('satuan', '')
-                if category_summary[cat]['total_quantity'] == '-':
-                    category_summary[cat]['total_quantity'] = f"{quantity} {unit}"
-                else:
-                    category_summary[cat]['total_quantity'] += f" + {quantity} {unit}"
-    
-    # Convert to list for template
     category_breakdown = []
-    for kategori, data in category_summary.items():
-        category_breakdown.append({
-            'kategori': kategori,
-            'total_harga': data['total_harga'],
-            'total_items': data['total_items'],
-            'total_quantity': data['total_quantity']
-        })
-    
-    # Get monthly summary (current month)
+    for row in totals:
+        if row['tipe'] == 'pengeluaran':
+            category_breakdown.append({
+                'kategori': row['kategori'],
+                'total_harga': row['total'],
+                'total_items': row['items'],
+                'total_quantity': quantity_by_kategori.get(row['kategori'], '-')
+            })
+    
+    # Monthly summary (current month) from the daily rollups
     now = datetime.now()
-    current_month = now.strftime('%m')
-    current_year = now.strftime('%Y')
-    
-    monthly_transactions = conn.execute(
-        "SELECT * FROM transactions WHERE strftime('%m', tanggal) = ? AND strftime('%Y', tanggal) = ?",
-        (current_month, current_year)
+    month_where, month_params = filters.build_date_filter(now.month, now.year)
+    monthly = conn.execute(
+        f"SELECT tipe, SUM(total) as total, SUM(count) as items FROM daily_rollups WHERE {month_where} GROUP BY tipe",
+        month_params
     ).fetchall()
     
-    monthly_revenue = sum([t['jumlah'] for t in monthly_transactions if t['tipe'] == 'pendapatan'])
-    monthly_expense = sum([t['jumlah'] for t in monthly_transactions if t['tipe'] == 'pengeluaran'])
-    monthly_transactions_count = len(monthly_transactions)
-    
-    conn.close()
+    monthly_revenue = sum([r['total'] for r in monthly if r['tipe'] == 'pendapatan'])
+    monthly_expense = sum([r['total'] for r in monthly if r['tipe'] == 'pengeluaran'])
+    monthly_transactions_count = sum([r['items'] for r in monthly])
     
     # Month name for display
     month_names = ['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
                   'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember']
     
+    # The page's filter badge, form and row table
+    today = now.strftime('%Y-%m-%d')
+    selected_month = int(month) if month and month.isdigit() and 1 <= int(month) <= 12 else now.month
+    selected_year = int(year) if year and year.isdigit() else now.year
+    available_years = sorted({selected_year, *range(now.year - 4, now.year + 1)}, reverse=True)
+    
     return render_template('cashflow_index.html',
                          transactions=transactions,
+                         data=transactions,
+                         view_mode='harian',
+                         today=today,
+                         selected_date=date_from or today,
+                         selected_month=selected_month,
+                         selected_year=selected_year,
+                         available_years=available_years,
+                         total=total_pengeluaran,
+                         next_url=next_url,
+                         prev_url=prev_url,
+                         page_size=page_size,
                          total_pendapatan=total_pendapatan,
                          total_pengeluaran=total_pengeluaran,
                          category_breakdown=category_breakdown,
@@ -314,30 +396,70 @@ def add_transaction():
     kategori = request.form['kategori']
     deskripsi = request.form['deskripsi']
     jumlah = request.form['jumlah']
+    satuan = request.form.get('satuan') or None
     
     conn = get_db_connection()
-    conn.execute(
-        'INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah, user_id) VALUES (?, ?, ?, ?, ?, ?)',
-        (tanggal, tipe, kategori, deskripsi, jumlah, session['user_id'])
+    cursor = conn.execute(
+        'INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah, satuan, user_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (tanggal, tipe, kategori, deskripsi, jumlah, satuan, session.get('user_id'))
     )
     conn.commit()
-    conn.close()
+    stream.publish('add', id=cursor.lastrowid, tanggal=tanggal, tipe=tipe, kategori=kategori, jumlah=jumlah)
     
     flash('Transaksi berhasil ditambahkan', 'success')
     return redirect(url_for('cashflow_index'))
 
+@app.route('/cashflow/import', methods=['POST'])
+@login_required
+def import_transactions():
+    """Import transaksi massal dari file CSV/JSON (mis. dump penjualan harian POS)"""
+    wants_json = request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        if wants_json:
+            return jsonify({'success': False, 'error': 'File belum dipilih'}), 400
+        flash('Pilih file CSV atau JSON untuk diimport', 'error')
+        return redirect(url_for('cashflow_index'))
+    
+    fmt = request.form.get('format') or importer.detect_format(upload.filename)
+    conn = get_db_connection()
+    try:
+        result = importer.import_stream(conn, importer.text_stream(upload.stream), fmt, session.get('user_id'))
+    except ValueError as e:
+        # Unreadable file: nothing was imported
+        if wants_json:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        flash(f'File tidak bisa dibaca: {e}', 'error')
+        return redirect(url_for('cashflow_index'))
+    
+    if result.inserted:
+        stream.publish('import', count=result.inserted)
+    
+    if wants_json:
+        return jsonify({
+            'success': result.rejected == 0,
+            'inserted': result.inserted,
+            'rejected': result.rejected,
+            'errors': [{'line': e.line, 'error': e.error} for e in result.errors]
+        })
+    
+    flash(f'{result.inserted} transaksi berhasil diimport', 'success')
+    if result.rejected:
+        details = '; '.join(f'baris {e.line}: {e.error}' for e in result.errors[:5])
+        flash(f'{result.rejected} baris ditolak ({details})', 'warning')
+    return redirect(url_for('cashflow_index'))
+
 @app.route('/cashflow/edit/<int:id>')
 @login_required
 def edit_transaksi(id):
     conn = get_db_connection()
     transaction = conn.execute('SELECT * FROM transactions WHERE id = ?', (id,)).fetchone()
-    conn.close()
     
     if not transaction:
         flash('Transaksi tidak ditemukan', 'error')
         return redirect(url_for('cashflow_index'))
     
-    return render_template('edit_transaksi.html', transaction=transaction)
+    return render_template('edit_transaksi.html', transaksi=transaction)
 
 @app.route('/cashflow/update/<int:id>', methods=['POST'])
 @login_required
@@ -347,14 +469,15 @@ def update_transaksi(id):
     kategori = request.form['kategori']
     deskripsi = request.form['deskripsi']
     jumlah = request.form['jumlah']
+    satuan = request.form.get('satuan') or None
     
     conn = get_db_connection()
     conn.execute(
-        'UPDATE transactions SET tanggal=?, tipe=?, kategori=?, deskripsi=?, jumlah=? WHERE id=?',
-        (tanggal, tipe, kategori, deskripsi, jumlah, id)
+        'UPDATE transactions SET tanggal=?, tipe=?, kategori=?, deskripsi=?, jumlah=?, satuan=? WHERE id=?',
+        (tanggal, tipe, kategori, deskripsi, jumlah, satuan, id)
     )
     conn.commit()
-    conn.close()
+    stream.publish('update', id=id, tanggal=tanggal, tipe=tipe, kategori=kategori, jumlah=jumlah)
     
     flash('Transaksi berhasil diupdate', 'success')
     return redirect(url_for('cashflow_index'))
@@ -365,12 +488,13 @@ def delete_transaction(id):
     conn = get_db_connection()
     conn.execute('DELETE FROM transactions WHERE id = ?', (id,))
     conn.commit()
-    conn.close()
+    stream.publish('delete', id=id)
     
     return jsonify({'success': True})
 
 @app.route('/laporan')
 @login_required
+@conditional.conditional(get_db_connection, per_user=True)
 def laporan_cashflow():
     conn = get_db_connection()
     
@@ -378,66 +502,52 @@ def laporan_cashflow():
     month = request.args.get('month')
     year = request.args.get('year', datetime.now().year)
     
-    # Build query
-    query = "SELECT * FROM transactions WHERE 1=1"
-    params = []
-    
-    if month:
-        query += " AND strftime('%m', tanggal) = ?"
-        params.append(f"{int(month):02d}")
-    
-    if year:
-        query += " AND strftime('%Y', tanggal) = ?"
-        params.append(str(year))
-    
-    query += " ORDER BY tanggal DESC"
+    # Date range filter, shared by the row query and the rollup query
+    try:
+        start, end = filters.date_range(month, year)
+    except ValueError:
+        flash('Filter tanggal tidak valid', 'error')
+        month = year = None
+        start = end = None
+    where, params = filters.range_filter(start, end)
+    
+    transactions = conn.execute(
+        f"SELECT * FROM transactions WHERE {where} ORDER BY tanggal DESC", params
+    ).fetchall()
     
-    transactions = conn.execute(query, params).fetchall()
+    # Totals and category breakdown from the daily rollups
+    totals = conn.execute(
+        f"SELECT tipe, kategori, SUM(total) as total, SUM(count) as items FROM daily_rollups WHERE {where} GROUP BY tipe, kategori",
+        params
+    ).fetchall()
     
-    # Calculate totals
-    total_revenue = sum([t['jumlah'] for t in transactions if t['tipe'] == 'pendapatan'])
-    total_expense = sum([t['jumlah'] for t in transactions if t['tipe'] == 'pengeluaran'])
+    total_revenue = sum([r['total'] for r in totals if r['tipe'] == 'pendapatan'])
+    total_expense = sum([r['total'] for r in totals if r['tipe'] == 'pengeluaran'])
     
-    # Prepare chart data
-    chart_labels = []
-    revenue_data = []
-    expense_data = []
+    # Chart data bucketed by day (selected month) or month (whole year)
+    granularity = request.args.get('granularity') or ('day' if month else 'month')
+    if granularity not in aggregates.GRANULARITIES:
+        granularity = 'day' if month else 'month'
+    if not start:
+        # The chart needs a bounded range; unfiltered it shows this year
+        start, end = filters.date_range(year=datetime.now().year)
+    series = aggregates.period_series(conn, start, end, granularity)
     
-    if month:
-        # Daily data for the month
-        _, num_days = calendar.monthrange(int(year), int(month))
-        for day in range(1, num_days + 1):
-            date_str = f"{year}-{int(month):02d}-{day:02d}"
-            chart_labels.append(str(day))
-            
-            revenue = sum([t['jumlah'] for t in transactions if t['tanggal'] == date_str and t['tipe'] == 'pendapatan'])
-            expense = sum([t['jumlah'] for t in transactions if t['tanggal'] == date_str and t['tipe'] == 'pengeluaran'])
-            
-            revenue_data.append(float(revenue))
-            expense_data.append(float(expense))
-    else:
-        # Monthly data for the year
-        for m in range(1, 13):
-            month_name = calendar.month_name[m][:3]
-            chart_labels.append(month_name)
-            
-            month_transactions = [t for t in transactions if int(t['tanggal'].split('-')[1]) == m]
-            revenue = sum([t['jumlah'] for t in month_transactions if t['tipe'] == 'pendapatan'])
-            expense = sum([t['jumlah'] for t in month_transactions if t['tipe'] == 'pengeluaran'])
-            
-            revenue_data.append(float(revenue))
-            expense_data.append(float(expense))
+    chart_labels = series.labels
+    revenue_data = series.revenue
+    expense_data = series.expense
     
     # Category breakdown
-    categories = defaultdict(float)
-    for t in transactions:
-        if t['tipe'] == 'pengeluaran':
-            categories[t['kategori']] += t['jumlah']
+    category_labels = [r['kategori'] for r in totals if r['tipe'] == 'pengeluaran']
+    category_data = [float(r['total']) for r in totals if r['tipe'] == 'pengeluaran']
+    pengeluaran_per_kategori = {
+        r['kategori']: {'total': r['total'], 'count': r['items']}
+        for r in totals if r['tipe'] == 'pengeluaran'
+    }
     
-    category_labels = list(categories.keys())
-    category_data = [float(v) for v in categories.values()]
-    
-    conn.close()
+    selected_bulan = int(month) if month else datetime.now().month
+    selected_tahun = int(year) if year else datetime.now().year
+    available_years = sorted({selected_tahun, *range(datetime.now().year - 4, datetime.now().year + 1)}, reverse=True)
     
     # Month names for display
     month_names = ['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
@@ -447,14 +557,19 @@ def laporan_cashflow():
                          transactions=transactions,
                          total_revenue=total_revenue,
                          total_expense=total_expense,
+                         total_pengeluaran=total_expense,
+                         pengeluaran_per_kategori=pengeluaran_per_kategori,
                          chart_labels=chart_labels,
                          revenue_data=revenue_data,
                          expense_data=expense_data,
                          category_labels=category_labels,
                          category_data=category_data,
+                         chart_data={'labels': category_labels, 'data': category_data},
                          month_names=month_names,
-                         selected_bulan=int(month) if month else datetime.now().month,
-                         selected_tahun=int(year) if year else datetime.now().year)
+                         granularity=granularity,
+                         available_years=available_years,
+                         selected_bulan=selected_bulan,
+                         selected_tahun=selected_tahun)
 
 @app.route('/viewonly')
 @login_required
@@ -464,70 +579,28 @@ def viewonly():
     
     conn = get_db_connection()
     
-    # Get current month data
+    # Current month totals, 6-month trend and category breakdown
     now = datetime.now()
-    start_date = now.replace(day=1).strftime('%Y-%m-%d')
-    
-    # Total revenue this month
-    total_revenue = conn.execute(
-        "SELECT COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pendapatan' AND tanggal >= ?",
-        (start_date,)
-    ).fetchone()['total']
+    data = dashboard_data(conn)
+    stats = data['stats']
     
-    # Total expense this month
-    total_expense = conn.execute(
-        "SELECT COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pengeluaran' AND tanggal >= ?",
-        (start_date,)
-    ).fetchone()['total']
+    total_revenue = stats.current.revenue
+    total_expense = stats.current.expense
     
     # Recent transactions
-    recent_transactions = conn.execute(
-        "SELECT * FROM transactions ORDER BY tanggal DESC, id DESC LIMIT 10"
-    ).fetchall()
+    recent_transactions = data['recent_transactions']
     
-    # Get last 6 months data for charts
-    revenue_labels = []
-    revenue_data = []
-    expense_data = []
-    
-    for i in range(5, -1, -1):
-        month_date = now - timedelta(days=30*i)
-        month_name = month_date.strftime('%B')
-        month_start = month_date.replace(day=1).strftime('%Y-%m-%d')
-        
-        if month_date.month == 12:
-            next_month = month_date.replace(year=month_date.year + 1, month=1, day=1)
-        else:
-            next_month = month_date.replace(month=month_date.month + 1, day=1)
-        month_end = next_month.strftime('%Y-%m-%d')
-        
-        revenue = conn.execute(
-            "SELECT COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pendapatan' AND tanggal >= ? AND tanggal < ?",
-            (month_start, month_end)
-        ).fetchone()['total']
-        
-        expense = conn.execute(
-            "SELECT COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pengeluaran' AND tanggal >= ? AND tanggal < ?",
-            (month_start, month_end)
-        ).fetchone()['total']
-        
-        revenue_labels.append(month_name)
-        revenue_data.append(float(revenue))
-        expense_data.append(float(expense))
+    # Last 6 months data for charts
+    revenue_labels = stats.labels('%B')
+    revenue_data = stats.revenue_series
+    expense_data = stats.expense_series
     
     # Category breakdown
-    categories = conn.execute(
-        "SELECT kategori, COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pengeluaran' AND tanggal >= ? GROUP BY kategori",
-        (start_date,)
-    ).fetchall()
-    
-    category_labels = [cat['kategori'] for cat in categories]
-    category_data = [float(cat['total']) for cat in categories]
+    category_labels = [cat.kategori for cat in stats.categories]
+    category_data = [cat.total for cat in stats.categories]
     
     # Get user count
-    total_users = conn.execute("SELECT COUNT(*) as total FROM users").fetchone()['total']
-    
-    conn.close()
+    total_users = data['total_users']
     
     # Calculate net profit
     net_profit = total_revenue - total_expense
@@ -553,7 +626,6 @@ def manajemen_user():
     conn = get_db_connection()
     users = conn.execute('SELECT * FROM users ORDER BY id').fetchall()
     total_users_count = len(users)
-    conn.close()
     
     return render_template('manajemen_user.html', users=users, total_users_count=total_users_count)
 
@@ -577,8 +649,6 @@ def add_user():
         flash(f'User {username} berhasil ditambahkan', 'success')
     except sqlite3.IntegrityError:
         flash(f'Username {username} sudah ada', 'error')
-    finally:
-        conn.close()
     
     return redirect(url_for('manajemen_user'))
 
@@ -606,7 +676,8 @@ def edit_user():
         )
     
     conn.commit()
-    conn.close()
+    # Role is re-read on the next request; a new password ends the user's sessions
+    sessions.revoke_user(user_id, delete=bool(password))
     
     flash('User berhasil diupdate', 'success')
     return redirect(url_for('manajemen_user'))
@@ -615,13 +686,13 @@ def edit_user():
 @login_required
 @admin_required
 def delete_user(id):
-    if id == session['user_id']:
+    if id == session.get('user_id'):
         return jsonify({'success': False, 'message': 'Tidak dapat menghapus user sendiri'})
     
     conn = get_db_connection()
     conn.execute('DELETE FROM users WHERE id = ?', (id,))
     conn.commit()
-    conn.close()
+    sessions.revoke_user(id, delete=True)
     
     return jsonify({'success': True})
 
@@ -633,7 +704,6 @@ def manajemen_product():
     conn = get_db_connection()
     products = conn.execute('SELECT * FROM products ORDER BY id').fetchall()
     total_products_count = len(products)
-    conn.close()
     
     return render_template('manajemen_product.html', products=products, total_products_count=total_products_count)
 
@@ -652,7 +722,6 @@ def add_product():
         (nama, kategori, harga, stok)
     )
     conn.commit()
-    conn.close()
     
     flash(f'Produk {nama} berhasil ditambahkan', 'success')
     return redirect(url_for('manajemen_product'))
@@ -673,7 +742,6 @@ def edit_product():
         (nama, kategori, harga, stok, product_id)
     )
     conn.commit()
-    conn.close()
     
     flash('Produk berhasil diupdate', 'success')
     return redirect(url_for('manajemen_product'))
@@ -685,144 +753,247 @@ def delete_product(id):
     conn = get_db_connection()
     conn.execute('DELETE FROM products WHERE id = ?', (id,))
     conn.commit()
-    conn.close()
     
     return jsonify({'success': True})
 
-# Export routes (placeholder)
+# Export routes
+def export_range():
+    """(start, end) of the laporan filters (month/year/date_from/date_to); raises ValueError"""
+    month = request.args.get('month')
+    date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
+    # The current year is only the default for the laporan page's own filters;
+    # an explicit date range (the daily export link) stands on its own
+    year = request.args.get('year') or (None if date_from or date_to else datetime.now().year)
+    return filters.date_range(month, year, date_from, date_to)
+
+def report_status_payload(status):
+    job_id = status['job_id']
+    payload = {key: status.get(key) for key in ('job_id', 'state', 'start', 'end', 'error')}
+    payload['status_url'] = url_for('export_pdf_status', job_id=job_id)
+    if status['state'] == 'done':
+        payload['download_url'] = url_for('export_pdf_download', job_id=job_id)
+    return payload
+
 @app.route('/export/pdf')
 @login_required
 def export_pdf():
-    flash('Fitur export PDF akan segera tersedia', 'info')
-    return redirect(url_for('laporan_cashflow'))
+    """Minta laporan PDF; dirender di background dan disimpan di cache disk"""
+    try:
+        start, end = export_range()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Filter tanggal tidak valid'}), 400
+    
+    conn = get_db_connection()
+    version = cache.data_version(conn)
+    try:
+        status = reports.submit(app.config['DATABASE'], start, end, version,
+                                exports.filename(start, end, 'pdf'))
+    except reports.ReportBusy:
+        response = jsonify({'success': False, 'error': 'Server sedang membuat laporan lain, coba lagi nanti'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '10'
+        return response
+    
+    payload = report_status_payload(status)
+    if status['state'] == 'done':
+        return jsonify(payload)
+    response = jsonify(payload)
+    response.status_code = 202
+    response.headers['Location'] = payload['status_url']
+    return response
+
+@app.route('/export/pdf/status/<job_id>')
+@login_required
+def export_pdf_status(job_id):
+    status = reports.read_status(app.config['REPORT_DIR'], job_id) if reports.valid_job_id(job_id) else None
+    if status is None:
+        return jsonify({'success': False, 'error': 'Job tidak ditemukan'}), 404
+    return jsonify(report_status_payload(status))
+
+@app.route('/export/pdf/download/<job_id>')
+@login_required
+def export_pdf_download(job_id):
+    status = reports.read_status(app.config['REPORT_DIR'], job_id) if reports.valid_job_id(job_id) else None
+    if status is None or status['state'] != 'done':
+        return jsonify({'success': False, 'error': 'Laporan belum tersedia'}), 404
+    return send_file(os.path.abspath(reports.pdf_path(app.config['REPORT_DIR'], job_id)),
+                     mimetype='application/pdf', as_attachment=True,
+                     download_name=status.get('download_name') or f"{job_id}.pdf")
+
+def export_response(encode, extension, mimetype):
+    """Stream transactions matching the laporan filters (month/year/date_from/date_to)"""
+    try:
+        start, end = export_range()
+    except ValueError:
+        flash('Filter tanggal tidak valid', 'error')
+        return redirect(url_for('laporan_cashflow'))
+    where, params = filters.range_filter(start, end)
+    
+    conn = get_db_connection()
+    body = encode(exports.iter_batches(conn, where, params))
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="{exports.filename(start, end, extension)}"',
+            'X-Accel-Buffering': 'no',
+        },
+    )
 
 @app.route('/export/excel')
 @login_required
 def export_excel():
-    flash('Fitur export Excel akan segera tersedia', 'info')
-    return redirect(url_for('laporan_cashflow'))
+    return export_response(exports.xlsx_stream, 'xlsx', exports.XLSX_MIMETYPE)
+
+@app.route('/export/csv')
+@login_required
+def export_csv():
+    return export_response(exports.csv_stream, 'csv', exports.CSV_MIMETYPE)
 
 # API endpoints for dynamic data
 @app.route('/api/expense-distribution')
 @login_required
+@conditional.conditional(get_db_connection)
+@cache.cached_response(get_db_connection)
 def api_expense_distribution():
     """API endpoint untuk data distribusi pengeluaran"""
     conn = get_db_connection()
     
-    # Get current month data
-    now = datetime.now()
-    start_date = now.replace(day=1).strftime('%Y-%m-%d')
-    
-    # Category breakdown
-    categories = conn.execute(
-        "SELECT kategori, COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pengeluaran' AND tanggal >= ? GROUP BY kategori ORDER BY total DESC",
-        (start_date,)
-    ).fetchall()
+    # Category breakdown for the current month
+    start_date = datetime.now().replace(day=1).strftime('%Y-%m-%d')
+    categories = aggregates.expense_categories(conn, start_date)
     
-    if not categories:
-        # Return default sample data if no real data
-        return jsonify({
-            'labels': ['Bahan Pokok', 'Barang', 'Pengeluaran lain_lain'],
-            'data': [90.9, 5.3, 3.8]
-        })
-    
-    labels = [cat['kategori'] for cat in categories]
-    data = [float(cat['total']) for cat in categories]
-    
-    conn.close()
-    
-    return jsonify({
-        'labels': labels,
-        'data': data
-    })
+    return jsonify(distribution_payload(categories))
 
 @app.route('/api/cashflow-trend')
 @login_required
+@conditional.conditional(get_db_connection)
+@cache.cached_response(get_db_connection)
 def api_cashflow_trend():
     """API endpoint untuk data trend cashflow"""
     conn = get_db_connection()
     
-    # Get last 6 months data
-    now = datetime.now()
-    labels = []
-    revenue_data = []
-    expense_data = []
-    
-    for i in range(5, -1, -1):
-        month_date = now - timedelta(days=30*i)
-        month_name = month_date.strftime('%B %Y')
-        month_start = month_date.replace(day=1).strftime('%Y-%m-%d')
-        
-        # Calculate next month start
-        if month_date.month == 12:
-            next_month = month_date.replace(year=month_date.year + 1, month=1, day=1)
-        else:
-            next_month = month_date.replace(month=month_date.month + 1, day=1)
-        month_end = next_month.strftime('%Y-%m-%d')
-        
-        revenue = conn.execute(
-            "SELECT COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pendapatan' AND tanggal >= ? AND tanggal < ?",
-            (month_start, month_end)
-        ).fetchone()['total']
-        
-        expense = conn.execute(
-            "SELECT COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pengeluaran' AND tanggal >= ? AND tanggal < ?",
-            (month_start, month_end)
-        ).fetchone()['total']
-        
-        labels.append(month_name)
-        revenue_data.append(float(revenue))
-        expense_data.append(float(expense))
+    # Last 6 months data in one grouped query
+    trend = aggregates.dashboard_aggregates(conn, with_categories=False)
+    
+    return jsonify(trend_payload(trend))
+
+@app.route('/api/monthly-cashflow')
+@login_required
+@conditional.conditional(get_db_connection)
+@cache.cached_response(get_db_connection)
+def api_monthly_cashflow():
+    """API endpoint untuk grafik cashflow harian (default 30 hari terakhir)"""
+    conn = get_db_connection()
     
-    conn.close()
+    days = aggregates.clamp_days(request.args.get('days'))
+    series = aggregates.daily_series(conn, days)
     
-    return jsonify({
-        'labels': labels,
-        'revenue': revenue_data,
-        'expense': expense_data
-    })
+    return jsonify(dict(daily_payload(series), success=True))
+
+DASHBOARD_FIELDS = ('stats', 'distribution', 'trend', 'daily')
+
+@app.route('/api/dashboard')
+@login_required
+@conditional.conditional(get_db_connection)
+@cache.cached_response(get_db_connection)
+def api_dashboard():
+    """API endpoint gabungan: stats, distribusi, trend dan grafik harian dalam satu request"""
+    conn = get_db_connection()
+    
+    requested = request.args.get('fields')
+    fields = [f.strip() for f in requested.split(',') if f.strip()] if requested else list(DASHBOARD_FIELDS)
+    unknown = [f for f in fields if f not in DASHBOARD_FIELDS]
+    if unknown:
+        return jsonify({'success': False, 'error': f"Field tidak dikenal: {', '.join(unknown)}",
+                        'fields': list(DASHBOARD_FIELDS)}), 400
+    
+    payload = {'success': True}
+    if {'stats', 'distribution', 'trend'} & set(fields):
+        # Same cached pass the dashboard pages render from
+        data = dashboard_data(conn)
+        aggregated = data['stats']
+        if 'stats' in fields:
+            payload['stats'] = stats_payload(aggregated.current, data['total_users'])
+        if 'distribution' in fields:
+            payload['distribution'] = distribution_payload(aggregated.categories)
+        if 'trend' in fields:
+            payload['trend'] = trend_payload(aggregated)
+    if 'daily' in fields:
+        days = aggregates.clamp_days(request.args.get('days'))
+        payload['daily'] = daily_payload(aggregates.daily_series(conn, days))
+    
+    return jsonify(payload)
 
 @app.route('/api/dashboard-stats')
 @login_required
+@conditional.conditional(get_db_connection)
+@cache.cached_response(get_db_connection)
 def api_dashboard_stats():
     """API endpoint untuk statistik dashboard"""
     conn = get_db_connection()
-    
-    # Get current month data
-    now = datetime.now()
-    start_date = now.replace(day=1).strftime('%Y-%m-%d')
-    
-    # Total revenue this month
-    total_revenue = conn.execute(
-        "SELECT COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pendapatan' AND tanggal >= ?",
-        (start_date,)
-    ).fetchone()['total']
-    
-    # Total expense this month
-    total_expense = conn.execute(
-        "SELECT COALESCE(SUM(jumlah), 0) as total FROM transactions WHERE tipe = 'pengeluaran' AND tanggal >= ?",
-        (start_date,)
-    ).fetchone()['total']
-    
-    # Total transactions this month
-    total_transactions = conn.execute(
-        "SELECT COUNT(*) as total FROM transactions WHERE tanggal >= ?",
-        (start_date,)
-    ).fetchone()['total']
-    
-    # Total users
-    total_users = conn.execute("SELECT COUNT(*) as total FROM users").fetchone()['total']
-    
-    conn.close()
-    
+    return jsonify(dashboard_stats(conn))
+
+@app.route('/api/stream')
+@login_required
+def api_stream():
+    """Server-Sent Events: dorong update dashboard setiap ada transaksi yang berubah"""
+    # Borrow a connection only for the initial version; the stream itself
+    # must not pin one of the pool's few connections
+    pool = db.get_pool()
+    conn = pool.acquire()
+    try:
+        version = cache.data_version(conn)
+    finally:
+        pool.release(conn)
+
+    # A reconnecting EventSource sends the last version it saw, so changes
+    # made while it was away are pushed straight away
+    last_seen = request.headers.get('Last-Event-ID', '')
+    if last_seen.isdigit():
+        version = int(last_seen)
+
+    broadcaster = stream.get_broadcaster()
+    subscriber = broadcaster.subscribe()
+    if subscriber is None:
+        response = jsonify({'success': False, 'error': 'Terlalu banyak koneksi live, coba lagi nanti'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+
+    response = Response(
+        stream_with_context(stream.event_stream(subscriber, pool, dashboard_stats, version)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    # The generator's own cleanup never runs if the client leaves before
+    # the first chunk
+    response.call_on_close(lambda: broadcaster.unsubscribe(subscriber))
+    return response
+
+@app.route('/api/db-status')
+@login_required
+@admin_required
+def api_db_status():
+    """API endpoint untuk melihat profil storage SQLite yang aktif"""
+    conn = get_db_connection()
     return jsonify({
-        'total_revenue': float(total_revenue),
-        'total_expense': float(total_expense),
-        'total_transactions': int(total_transactions),
-        'total_users': int(total_users),
-        'profit': float(total_revenue - total_expense)
+        'settings': db.storage_settings(conn),
+        'pool': db.get_pool().stats()
     })
 
+@app.route('/api/cache-stats')
+@login_required
+@admin_required
+def api_cache_stats():
+    """API endpoint untuk statistik hit/miss cache"""
+    conn = get_db_connection()
+    stats = cache.get_cache().stats()
+    stats['data_version'] = cache.data_version(conn)
+    stats['fragments'] = fragments.get_fragments().stats()
+    return jsonify(stats)
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -7,6 +7,7 @@ import os
 from collections import defaultdict
 import calendar
 import logging
+import db
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -39,6 +40,7 @@ def get_database_path():
 
 app.config['DATABASE'] = get_database_path()
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
+db.init_app(app)
 
 # Configure logging for production
 if not app.config['DEBUG']:
@@ -57,10 +59,8 @@ DEMO_USERS = [
 # Database helper functions
 def get_db_connection():
     try:
-        # Try SQLite first
-        conn = sqlite3.connect(app.config['DATABASE'])
-        conn.row_factory = sqlite3.Row
-        return conn
+        # Pooled per-request connection, returned on teardown
+        return db.get_db()
     except sqlite3.OperationalError as e:
         app.logger.error(f"Database connection error: {e}")
         return None
@@ -78,9 +78,6 @@ def init_db():
     except Exception as e:
         app.logger.error(f"Database initialization error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 # Authentication decorator
 def login_required(f):
@@ -173,8 +170,6 @@ def admin_dashboard():
             "SELECT nama, kategori, harga FROM products ORDER BY kategori, nama"
         ).fetchall()
         
-        conn.close()
-        
         profit_margin = ((total_revenue - total_expense) / total_revenue * 100) if total_revenue > 0 else 0
         
         return render_template('admin_dashboard.html',
@@ -221,8 +216,6 @@ def api_dashboard_stats():
         
         total_users = conn.execute("SELECT COUNT(*) as total FROM users").fetchone()['total']
         
-        conn.close()
-        
         return jsonify({
             'total_revenue': float(total_revenue),
             'total_expense': float(total_expense),
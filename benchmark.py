@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+"""
+HTTP benchmark for Toko Kopi Makmur
+Seeds databases of several sizes with init_db's deterministic bulk loader,
+then drives every route two ways:
+
+  client  in-process through Flask's test client
+  http    against a real gunicorn (gthread, several workers) with a pool of
+          forked client processes on keep-alive connections
+  login   (on request) a storm of password logins against gunicorn, with
+          the API latency measured before and during it
+
+and reports p50/p95/p99 latency of the successful (2xx/3xx) responses, the
+error count, throughput and queries per request (from the Server-Timing
+header querylog adds) per route as JSON, so two runs can be diffed with
+--compare. Everything runs offline on one box. A route that fails shows up
+as errors with no latency rather than as a fast response.
+
+Usage:
+    python benchmark.py                                   # 10k rows, both modes
+    python benchmark.py --sizes 10000,100000,1000000 --output bench.json
+    python benchmark.py --mode client --routes api/ --requests 500
+    python benchmark.py --mode login --concurrency 16     # password logins under contention
+    python benchmark.py --compare before.json after.json
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import re
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date
+
+import init_db
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(ROOT, 'bench_data')
+DEFAULT_SIZES = (10000,)
+SEED = 42
+SEED_DAYS = 400
+SEED_END = date(2025, 12, 31)
+
+# Session of the seeded admin (init_db creates BagasNz first)
+SESSION = {'username': 'BagasNz', 'role': 'admin', 'user_id': 1}
+
+
+def identity(role):
+    """Session for a route's role; other roles get a demo-style login without a users row"""
+    if role == SESSION['role']:
+        return dict(SESSION)
+    return {'username': f'bench-{role}', 'role': role}
+
+
+@dataclass
+class Route:
+    name: str
+    path: str
+    method: str = 'GET'
+    form: dict = field(default_factory=dict)
+    write: bool = False
+    role: str = 'admin'
+
+    def target(self, i, max_id):
+        """Path for the i-th request; {id} walks existing rows, {delete_id} walks down from the top"""
+        return self.path.format(id=1 + i % max_id, delete_id=max_id - i)
+
+
+TRANSACTION_FORM = {'tanggal': '2025-06-15', 'tipe': 'pengeluaran', 'kategori': 'Barang',
+                    'deskripsi': 'Benchmark', 'jumlah': '12500'}
+
+# Reads first: the write routes bump data_version and empty the caches
+ROUTES = [
+    Route('admin_dashboard', '/admin/dashboard'),
+    Route('viewonly', '/viewonly', role='viewonly'),
+    Route('cashflow', '/cashflow'),
+    Route('cashflow_month', '/cashflow?month=6&year=2025'),
+    Route('cashflow_range', '/cashflow?date_from=2025-03-01&date_to=2025-05-31&page_size=100'),
+    Route('cashflow_edit', '/cashflow/edit/{id}'),
+    Route('laporan', '/laporan?year=2025'),
+    Route('laporan_month', '/laporan?month=6&year=2025'),
+    Route('users', '/users'),
+    Route('products', '/products'),
+    Route('export_csv', '/export/csv?month=6&year=2025'),
+    Route('export_excel', '/export/excel?month=6&year=2025'),
+    Route('api_expense_distribution', '/api/expense-distribution'),
+    Route('api_cashflow_trend', '/api/cashflow-trend'),
+    Route('api_monthly_cashflow', '/api/monthly-cashflow?days=90'),
+    Route('api_dashboard', '/api/dashboard'),
+    Route('api_dashboard_stats', '/api/dashboard-stats'),
+    Route('api_db_status', '/api/db-status'),
+    Route('api_cache_stats', '/api/cache-stats'),
+    Route('cashflow_add', '/cashflow/add', 'POST', TRANSACTION_FORM, write=True),
+    Route('cashflow_update', '/cashflow/update/{id}', 'POST', TRANSACTION_FORM, write=True),
+    Route('delete_transaction', '/delete_transaction/{delete_id}', 'POST', write=True),
+]
+
+
+SERVER_TIMING_QUERIES = re.compile(r'queries=(\d+)')
+
+
+def server_timing_queries(header):
+    """Statement count from querylog's Server-Timing header, None when absent"""
+    match = SERVER_TIMING_QUERIES.search(header or '')
+    return int(match.group(1)) if match else None
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(values)))
+    return values[rank - 1]
+
+
+def succeeded(status):
+    """2xx/3xx; statuses are "200" or "500:ExceptionName" strings"""
+    return 200 <= int(status.split(':')[0]) < 400
+
+
+def summarize(route, latencies, statuses, elapsed, queries=()):
+    """``latencies`` holds successful responses only; failures count as errors"""
+    latencies = sorted(latencies)
+    requests = sum(statuses.values())
+    ms = lambda value: None if value is None else round(value * 1000, 3)
+    result = {
+        'route': route.name,
+        'method': route.method,
+        'path': route.path,
+        'requests': requests,
+        'errors': sum(count for status, count in statuses.items() if not succeeded(status)),
+        'status_codes': dict(sorted(statuses.items())),
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else None,
+    }
+    result['queries_per_request'] = round(sum(queries) / len(queries), 2) if queries else None
+    return result
+
+
+def seed_database(rows, seed=SEED):
+    """Path of a cached seeded database with ``rows`` transactions"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f'bench_{rows}_{seed}.db')
+    if not os.path.exists(path):
+        days = min(SEED_DAYS, rows)
+        per_day, rest = divmod(rows, days)
+        if rest:
+            raise ValueError(f"size {rows} must be a multiple of {days}")
+        tmp = path + '.tmp'
+        for stale in (tmp, tmp + '-wal', tmp + '-shm'):
+            if os.path.exists(stale):
+                os.remove(stale)
+        init_db.bulk_seed(tmp, days=days, rows_per_day=per_day, seed=seed, end_date=SEED_END)
+        os.replace(tmp, path)
+    return path
+
+
+def working_copy(path, directory):
+    """Each run writes to its own copy so the seeded file stays pristine"""
+    target = os.path.join(directory, 'bench.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    shutil.copyfile(path, target)
+    return target
+
+
+def max_transaction_id(database):
+    conn = sqlite3.connect(database)
+    try:
+        return conn.execute("SELECT MAX(id) FROM transactions").fetchone()[0] or 1
+    finally:
+        conn.close()
+
+
+def select_routes(patterns):
+    if not patterns:
+        return list(ROUTES)
+    return [route for route in ROUTES if any(p in route.name or p in route.path for p in patterns)]
+
+
+# --- in-process: Flask test client ---------------------------------------
+
+def run_client(database, routes, requests, warmup):
+    import app as app_module
+
+    flask_app = app_module.app
+    flask_app.config.update(DATABASE=database, TESTING=False)
+    # Failing requests are counted, not logged with a traceback each
+    log_level = flask_app.logger.level
+    flask_app.logger.setLevel(logging.CRITICAL)
+    client = flask_app.test_client()
+
+    results = []
+    max_id = max_transaction_id(database)
+    try:
+        for route in routes:
+            with client.session_transaction() as sess:
+                sess.clear()
+                sess.update(identity(route.role))
+            for i in range(0 if route.write else warmup):
+                _client_request(client, route, i, max_id)
+            offset = warmup if not route.write else 0
+            latencies, statuses, queries = [], {}, []
+            began = time.perf_counter()
+            for i in range(requests):
+                t0 = time.perf_counter()
+                status, count = _client_request(client, route, offset + i, max_id)
+                if succeeded(status):
+                    latencies.append(time.perf_counter() - t0)
+                statuses[status] = statuses.get(status, 0) + 1
+                if count is not None:
+                    queries.append(count)
+            elapsed = time.perf_counter() - began
+            results.append(summarize(route, latencies, statuses, elapsed, queries))
+            if route.name == 'delete_transaction':
+                max_id -= offset + requests
+    finally:
+        pool = flask_app.extensions.get('db_pool')
+        if pool is not None:
+            pool.close_all()
+        flask_app.extensions['db_pool'] = None
+        flask_app.logger.setLevel(log_level)
+    return results
+
+
+def _client_request(client, route, i, max_id):
+    """Returns (status, statements from Server-Timing or None)"""
+    try:
+        response = client.open(route.target(i, max_id), method=route.method, data=route.form or None)
+        # Streamed bodies only run their queries while being read
+        response.get_data()
+        response.close()
+        return str(response.status_code), server_timing_queries(response.headers.get('Server-Timing'))
+    except Exception as e:
+        # Surfaced as an error status instead of stopping the run
+        return f"500:{type(e).__name__}", None
+
+
+# --- over HTTP: gunicorn plus forked clients -----------------------------
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def session_cookie(database, role):
+    """Session cookie for a stored login, valid for any worker sharing the secret key"""
+    import app as app_module
+    import sessions
+
+    flask_app = app_module.app
+    flask_app.config['DATABASE'] = database
+    try:
+        with flask_app.app_context():
+            sid = sessions.get_store(flask_app).create(
+                flask_app, identity(role), flask_app.permanent_session_lifetime.total_seconds())
+    finally:
+        pool = flask_app.extensions.get('db_pool')
+        if pool is not None:
+            pool.close_all()
+        flask_app.extensions['db_pool'] = None
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    return f"{flask_app.config['SESSION_COOKIE_NAME']}={serializer.dumps({sessions.SID_KEY: sid})}"
+
+
+def start_gunicorn(database, port, workers, threads, **env_overrides):
+    env = dict(os.environ, DATABASE=database, PYTHONPATH=ROOT, **env_overrides)
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(workers), '--worker-class', 'gthread', '--threads', str(threads),
+               '--log-level', 'warning', '--chdir', ROOT, 'app:app']
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+def _http_worker(job):
+    """Run ``count`` requests of one route on a keep-alive connection.
+
+    Returns (latencies, statuses, queries); latencies are those of the
+    successful responses, queries holds the statement
+    count of every response that carried a Server-Timing header.
+    """
+    port, cookie, route, start, count, max_id = job
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = {'Cookie': cookie}
+    body = None
+    if route.form:
+        body = '&'.join(f"{k}={v}" for k, v in route.form.items())
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    latencies, statuses, queries = [], {}, []
+    for i in range(start, start + count):
+        t0 = time.perf_counter()
+        try:
+            conn.request(route.method, route.target(i, max_id), body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = str(response.status)
+            reported = server_timing_queries(response.getheader('Server-Timing'))
+            if reported is not None:
+                queries.append(reported)
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            status = f"599:{type(e).__name__}"
+        if succeeded(status):
+            latencies.append(time.perf_counter() - t0)
+        statuses[status] = statuses.get(status, 0) + 1
+    conn.close()
+    return latencies, statuses, queries
+
+
+def run_http(database, routes, requests, warmup, concurrency, workers, threads):
+    port = _free_port()
+    max_id = max_transaction_id(database)
+    process = start_gunicorn(database, port, workers, threads)
+    results = []
+    try:
+        with multiprocessing.get_context('fork').Pool(concurrency) as clients:
+            for route in routes:
+                cookie = session_cookie(database, route.role)
+                offset = 0
+                if warmup and not route.write:
+                    clients.map(_http_worker, _split(port, cookie, route, 0, warmup * concurrency,
+                                                     concurrency, max_id))
+                    offset = warmup * concurrency
+                began = time.perf_counter()
+                parts = clients.map(_http_worker, _split(port, cookie, route, offset, requests,
+                                                         concurrency, max_id))
+                elapsed = time.perf_counter() - began
+                results.append(_merge(route, parts, elapsed))
+                if route.name == 'delete_transaction':
+                    max_id -= offset + requests
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return results
+
+
+def _merge(route, parts, elapsed):
+    latencies, statuses, queries = [], {}, []
+    for part_latencies, part_statuses, part_queries in parts:
+        latencies.extend(part_latencies)
+        queries.extend(part_queries)
+        for status, count in part_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    return summarize(route, latencies, statuses, elapsed, queries)
+
+
+# --- login under contention ------------------------------------------------
+
+LOGIN_USER = ('bench', 'bench-password')
+PROBE = Route('api_dashboard_stats', '/api/dashboard-stats')
+
+
+def add_login_user(database):
+    """A database-only account, so every login runs the real password hash check"""
+    from werkzeug.security import generate_password_hash
+
+    conn = sqlite3.connect(database)
+    conn.execute("INSERT OR REPLACE INTO users (username, password, role) VALUES (?, ?, 'user')",
+                 (LOGIN_USER[0], generate_password_hash(LOGIN_USER[1])))
+    conn.commit()
+    conn.close()
+
+
+def run_login(database, requests, concurrency, workers, threads, rate_limit=False):
+    """Login storm from ``concurrency`` clients while one client keeps reading the API.
+
+    Reports the logins themselves plus the API latency before (``_idle``)
+    and during the storm (``_contended``): the second should stay close to
+    the first when hashing is confined to its pool.
+    """
+    add_login_user(database)
+    port = _free_port()
+    max_id = max_transaction_id(database)
+    process = start_gunicorn(database, port, workers, threads,
+                             LOGIN_RATE_LIMIT_ENABLED='1' if rate_limit else '0')
+    login = Route('login', '/login', 'POST', dict(zip(('username', 'password'), LOGIN_USER)), write=True)
+    probe_cookie = session_cookie(database, PROBE.role)
+    probe_count = max(requests // 2, 20)
+    results = []
+    try:
+        with multiprocessing.get_context('fork').Pool(concurrency + 1) as clients:
+            began = time.perf_counter()
+            idle = clients.apply(_http_worker, ((port, probe_cookie, PROBE, 0, probe_count, max_id),))
+            results.append(_merge(Route('api_dashboard_stats_idle', PROBE.path), [idle],
+                                  time.perf_counter() - began))
+
+            began = time.perf_counter()
+            storm = clients.map_async(_http_worker, _split(port, '', login, 0, requests, concurrency, max_id))
+            time.sleep(0.2)
+            probe_began = time.perf_counter()
+            contended = clients.apply(_http_worker, ((port, probe_cookie, PROBE, 0, probe_count, max_id),))
+            probe_elapsed = time.perf_counter() - probe_began
+            parts = storm.get()
+            results.append(_merge(login, parts, time.perf_counter() - began))
+            results.append(_merge(Route('api_dashboard_stats_contended', PROBE.path), [contended],
+                                  probe_elapsed))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return results
+
+
+def _split(port, cookie, route, offset, total, concurrency, max_id):
+    # Disjoint index ranges, so write routes never touch the same row twice
+    share, rest = divmod(total, concurrency)
+    jobs, start = [], offset
+    for n in range(concurrency):
+        count = share + (1 if n < rest else 0)
+        if count:
+            jobs.append((port, cookie, route, start, count, max_id))
+        start += count
+    return jobs
+
+
+# --- reporting ------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path, after_path, metric='p95_ms'):
+    """Print the change of ``metric`` per (size, mode, route) between two result files"""
+    def index(path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return data, {(run['size'], run['mode'], row['route']): row
+                      for run in data['runs'] for row in run['results']}
+
+    before_data, before = index(before_path)
+    after_data, after = index(after_path)
+    print(f"{metric}: {before_data['meta'].get('commit')} -> {after_data['meta'].get('commit')}")
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key].get(metric), after[key].get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100
+        flag = '⚠️ ' if change > 10 else '   '
+        print(f"{flag}{key[0]:>8} {key[1]:<6} {key[2]:<26} {old:>10.2f} {new:>10.2f} {change:>+7.1f}%")
+
+
+def print_results(run):
+    print(f"\n📊 {run['size']} rows, {run['mode']}")
+    print(f"   {'route':<26} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'q/req':>6} {'err':>4}")
+    for row in run['results']:
+        queries = row.get('queries_per_request')
+        p50, p95, p99 = (f"{row[key]:.2f}" if row[key] is not None else '-'
+                         for key in ('p50_ms', 'p95_ms', 'p99_ms'))
+        print(f"   {row['route']:<26} {p50:>8} {p95:>8} {p99:>8} "
+              f"{row['throughput_rps']:>8.1f} {'' if queries is None else queries:>6} {row['errors']:>4}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every route against seeded databases')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated transaction counts, e.g. 10000,100000,1000000')
+    parser.add_argument('--mode', choices=['client', 'http', 'both', 'login'], default='both',
+                        help='login: password logins under contention, against gunicorn')
+    parser.add_argument('--login-rate-limit', action='store_true',
+                        help='keep the login limiter on in login mode (off by default, to measure hashing)')
+    parser.add_argument('--routes', nargs='*', help='only routes whose name or path contains one of these')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per route (per client for http)')
+    parser.add_argument('--concurrency', type=int, default=4, help='client processes for http mode')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers for http mode')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gunicorn worker')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='diff two result files and exit')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    routes = select_routes(args.routes)
+    if not routes:
+        print("❌ No routes match")
+        return 1
+    modes = ['client', 'http'] if args.mode == 'both' else [args.mode]
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'cpus': os.cpu_count(),
+            'seed': args.seed,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'concurrency': args.concurrency,
+            'workers': args.workers,
+            'threads': args.threads,
+        },
+        'runs': [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix='bench-') as directory:
+        for size in (int(s) for s in args.sizes.split(',')):
+            seeded = seed_database(size, args.seed)
+            for mode in modes:
+                database = working_copy(seeded, directory)
+                if mode == 'client':
+                    results = run_client(database, routes, args.requests, args.warmup)
+                elif mode == 'login':
+                    results = run_login(database, args.requests, args.concurrency, args.workers,
+                                        args.threads, args.login_rate_limit)
+                else:
+                    results = run_http(database, routes, args.requests, args.warmup,
+                                       args.concurrency, args.workers, args.threads)
+                run = {'size': size, 'mode': mode, 'results': results}
+                report['runs'].append(run)
+                print_results(run)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Server-side cache for dashboard data and the JSON API
+Entries are keyed by endpoint, query string and date window, expire after a
+TTL and are evicted least-recently-used. Every entry also remembers the
+data_version it was computed at; the triggers from migration 4 bump that
+counter on any write from any worker, so the next read recomputes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import current_app, request
+
+DEFAULT_CONFIG = {
+    'RESPONSE_CACHE_ENABLED': True,
+    'RESPONSE_CACHE_TTL': 120.0,      # seconds, matches the dashboard poll interval
+    'RESPONSE_CACHE_SIZE': 256,       # entries per worker process
+}
+
+
+def data_version(conn):
+    """Current value of the shared write counter"""
+    row = conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU map of key -> (version, expires_at, value)"""
+
+    def __init__(self, max_entries=256, ttl=120.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, version):
+        """Return the cached value, or None when missing, expired or stale"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or entry[1] <= now:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, version, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (version, expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, version, compute, ttl=None):
+        value = self.get(key, version)
+        if value is None:
+            value = compute()
+            self.set(key, version, value, ttl)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            'entries': size,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def init_app(app):
+    for key, default in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, default)
+    app.extensions['response_cache'] = ResponseCache(
+        max_entries=app.config['RESPONSE_CACHE_SIZE'],
+        ttl=app.config['RESPONSE_CACHE_TTL'],
+    )
+
+
+def get_cache():
+    return current_app.extensions['response_cache']
+
+
+def window_key():
+    """Date window the current-period endpoints depend on"""
+    return date.today().isoformat()
+
+
+def request_key(endpoint=None):
+    """Cache key for the current request: endpoint, sorted args, date window"""
+    args = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    return (endpoint or request.endpoint, args, window_key())
+
+
+def cached_value(name, conn, compute):
+    """Return compute() cached under ``name`` for today's window and data version"""
+    if not current_app.config['RESPONSE_CACHE_ENABLED']:
+        return compute()
+    return get_cache().get_or_compute((name, window_key()), data_version(conn), compute)
+
+
+def cached_response(get_conn):
+    """Cache a view's response body per request_key() and data_version.
+
+    ``get_conn`` returns the request's database connection; it is only
+    used to read the version counter. Adds an X-Cache: HIT/MISS header.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config['RESPONSE_CACHE_ENABLED']:
+                return view(*args, **kwargs)
+
+            cache = get_cache()
+            key = request_key()
+            version = data_version(get_conn())
+            entry = cache.get(key, version)
+            if entry is not None:
+                body, status, mimetype = entry
+                response = current_app.response_class(body, status=status, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                cache.set(key, version, (response.get_data(), response.status_code, response.mimetype))
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,109 @@
+"""
+HTTP conditional responses (ETag / Last-Modified) for read-only views
+The validator is derived from a cheap data stamp - the shared write counter,
+its timestamp and MAX(transactions.id) - so a client that already holds the
+current page gets a 304 before the view runs any aggregate query.
+"""
+
+import hashlib
+import os
+from datetime import datetime, time, timezone, date
+from functools import wraps
+
+from flask import current_app, request, session
+
+from cache import request_key
+
+DEFAULT_CONFIG = {
+    'CONDITIONAL_RESPONSES': True,
+    'CONDITIONAL_CACHE_CONTROL': 'private, no-cache',
+}
+
+STAMP_SQL = """
+    SELECT version, updated_at, (SELECT MAX(id) FROM transactions)
+    FROM data_version WHERE id = 1
+"""
+
+
+def data_stamp(conn):
+    """Return (version, last write as aware UTC datetime or None, max transaction id)"""
+    row = conn.execute(STAMP_SQL).fetchone()
+    if row is None:
+        return 0, None, None
+    version, updated_at, max_id = row[0], row[1], row[2]
+    if updated_at:
+        updated_at = datetime.fromisoformat(str(updated_at)).replace(tzinfo=timezone.utc)
+    return version, updated_at or None, max_id
+
+
+def _release_stamp(app):
+    """Newest mtime of the code and templates, so a deploy changes every validator"""
+    newest = 0.0
+    for name in os.listdir(app.root_path):
+        if name.endswith(('.py', '.html')):
+            newest = max(newest, os.path.getmtime(os.path.join(app.root_path, name)))
+    return datetime.fromtimestamp(int(newest), timezone.utc)
+
+
+def init_app(app):
+    for key, default in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, default)
+    app.config.setdefault('RELEASE_STAMP', _release_stamp(app))
+
+
+def make_etag(stamp, per_user=False):
+    parts = request_key() + (stamp[0], stamp[2], current_app.config['RELEASE_STAMP'].isoformat())
+    if per_user:
+        parts += (session.get('username'), session.get('role'))
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+
+def last_modified(stamp):
+    """Latest of the last write, the start of today's window and the release"""
+    candidates = [
+        datetime.combine(date.today(), time.min).astimezone(timezone.utc),
+        current_app.config['RELEASE_STAMP'],
+    ]
+    if stamp[1] is not None:
+        candidates.append(stamp[1])
+    return max(candidates).replace(microsecond=0)
+
+
+def is_not_modified(etag, modified):
+    """RFC 9110: If-None-Match wins; If-Modified-Since only when it is absent"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return since is not None and modified <= since
+
+
+def conditional(get_conn, per_user=False):
+    """Answer If-None-Match / If-Modified-Since with 304 before calling the view.
+
+    ``per_user`` mixes the session's username and role into the ETag for
+    HTML pages that render them. Requests carrying pending flash messages
+    always get a full response so the messages are not lost.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config['CONDITIONAL_RESPONSES'] or request.method != 'GET' \
+                    or (per_user and session.get('_flashes')):
+                return view(*args, **kwargs)
+
+            stamp = data_stamp(get_conn())
+            etag = make_etag(stamp, per_user)
+            modified = last_modified(stamp)
+            if is_not_modified(etag, modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.last_modified = modified
+            response.headers['Cache-Control'] = current_app.config['CONDITIONAL_CACHE_CONTROL']
+            return response
+        return wrapper
+    return decorator
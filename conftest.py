@@ -0,0 +1,48 @@
+"""
+Shared pytest fixtures: a throwaway copy of the schema and a Flask test client
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Path to a fresh database built from schema.sql"""
+    path = str(tmp_path / 'test.db')
+    conn = sqlite3.connect(path)
+    with open(SCHEMA, 'r') as f:
+        conn.executescript(f.read())
+    conn.execute(
+        "INSERT INTO users (username, password, role) VALUES ('admin', 'x', 'admin')"
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def flask_app(database):
+    import app as app_module
+
+    app = app_module.app
+    app.config.update(TESTING=True, DATABASE=database)
+    yield app
+    pool = app.extensions.get('db_pool')
+    if pool is not None:
+        pool.close_all()
+
+
+@pytest.fixture
+def client(flask_app):
+    """Test client logged in as the admin user"""
+    client = flask_app.test_client()
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['role'] = 'admin'
+        sess['user_id'] = 1
+    return client
@@ -0,0 +1,191 @@
+"""
+Login hot path: demo-user index, attempt limiter and bounded password hashing
+A login costs one dict lookup for the demo accounts. Every attempt first
+takes a token from a per-username and a per-IP bucket, so brute force is
+turned away before any hashing happens. Password hashes are checked on a
+small thread pool with a bounded queue: a burst of logins waits for (or is
+refused by) that pool instead of tying up every request thread of the
+worker. Limiter state lives in this worker process only, in maps of fixed
+size.
+
+Behind a reverse proxy (nginx in docker-compose) every request arrives
+from the proxy's address; set TRUSTED_PROXY_HOPS to the number of proxies
+in front of the app so the per-IP buckets are keyed on the client address
+from X-Forwarded-For instead.
+"""
+
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import check_password_hash
+
+from db import env_default
+
+DEFAULT_CONFIG = {
+    'LOGIN_RATE_LIMIT_ENABLED': True,
+    'LOGIN_USER_BURST': 5,            # attempts per username before throttling
+    'LOGIN_USER_PER_MINUTE': 5.0,     # refill rate of a username's bucket
+    'LOGIN_IP_BURST': 20,             # attempts per client IP before throttling
+    'LOGIN_IP_PER_MINUTE': 30.0,
+    'LOGIN_LIMITER_SIZE': 10000,      # buckets kept per map; least recently used are dropped
+    'LOGIN_HASH_WORKERS': 2,          # concurrent password hash checks per worker process
+    'LOGIN_HASH_QUEUE': 8,            # hash checks queued or running before logins are refused
+    'LOGIN_HASH_TIMEOUT': 10.0,       # seconds a request waits for its hash check
+    'TRUSTED_PROXY_HOPS': 0,          # reverse proxies whose X-Forwarded-* headers are believed
+}
+
+
+class HashingBusy(Exception):
+    """Raised when the hash pool is full or did not answer within LOGIN_HASH_TIMEOUT"""
+
+
+class DemoUsers:
+    """Demo accounts indexed by username; passwords compared in constant time"""
+
+    def __init__(self, users):
+        self._by_name = {user['username']: user for user in users}
+
+    def authenticate(self, username, password):
+        user = self._by_name.get(username)
+        if user is not None and hmac.compare_digest(user['password'].encode(), password.encode()):
+            return user
+        return None
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by string in an LRU map of at most ``max_keys`` entries.
+
+    An evicted key comes back with a full bucket, which only matters once
+    more than ``max_keys`` distinct keys are active at the same time.
+    """
+
+    def __init__(self, burst, per_minute, max_keys=10000):
+        self.burst = float(burst)
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def take(self, key, now=None):
+        """Spend one token; returns 0 when allowed, else the seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+            if tokens >= 1:
+                wait = 0.0
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate if self.rate else float('inf')
+                self.limited += 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class HashPool:
+    """Bounded thread pool for check_password_hash.
+
+    PBKDF2/scrypt run in C without the GIL, so the pool caps how many
+    cores logins can occupy; requests beyond ``max_pending`` are refused
+    instead of queueing up behind them.
+    """
+
+    def __init__(self, workers=2, max_pending=8):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pid = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.refused = 0
+
+    def _get_executor(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='login-hash')
+                self._pid = os.getpid()
+                self._slots = threading.BoundedSemaphore(self.max_pending)
+            return self._executor
+
+    def verify(self, pwhash, password, timeout=None):
+        executor = self._get_executor()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            self.refused += 1
+            raise HashingBusy('login hash queue full')
+        try:
+            future = executor.submit(check_password_hash, pwhash, password)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            self.refused += 1
+            raise HashingBusy('login hash check timed out') from None
+
+
+class Credentials:
+    def __init__(self, config, demo_users=()):
+        self.config = config
+        self.demo_users = DemoUsers(demo_users)
+        self.users = TokenBucketLimiter(config['LOGIN_USER_BURST'], config['LOGIN_USER_PER_MINUTE'],
+                                        config['LOGIN_LIMITER_SIZE'])
+        self.ips = TokenBucketLimiter(config['LOGIN_IP_BURST'], config['LOGIN_IP_PER_MINUTE'],
+                                      config['LOGIN_LIMITER_SIZE'])
+        self.hashes = HashPool(config['LOGIN_HASH_WORKERS'], config['LOGIN_HASH_QUEUE'])
+
+    def throttle(self, username, ip):
+        """Seconds the client must wait before another attempt, 0 when it may go ahead"""
+        if not self.config['LOGIN_RATE_LIMIT_ENABLED']:
+            return 0.0
+        # Both buckets pay for the attempt, so one cannot be drained through the other
+        return max(self.users.take(username.lower()), self.ips.take(ip or '-'))
+
+    def check_password(self, pwhash, password):
+        """check_password_hash on the bounded pool; raises HashingBusy"""
+        return self.hashes.verify(pwhash, password, self.config['LOGIN_HASH_TIMEOUT'])
+
+    def stats(self):
+        return {
+            'user_buckets': len(self.users),
+            'ip_buckets': len(self.ips),
+            'limited': self.users.limited + self.ips.limited,
+            'hash_refused': self.hashes.refused,
+        }
+
+
+def init_app(app, demo_users=()):
+    for key, default in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, env_default(key, default))
+    app.extensions['credentials'] = Credentials(app.config, demo_users)
+    trust_proxies(app, app.config['TRUSTED_PROXY_HOPS'])
+
+
+def trust_proxies(app, hops):
+    """Take remote_addr and scheme from the last ``hops`` proxies' X-Forwarded-* headers.
+
+    Only for proxies that overwrite or append to those headers; with no
+    proxy in front, a client could pick its own address.
+    """
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+
+def get_credentials():
+    return current_app.extensions['credentials']
@@ -0,0 +1,293 @@
+"""
+Database connection layer for Toko Kopi Makmur
+Keeps a small pool of SQLite connections per worker process and hands one
+out per request through flask.g
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g
+
+import migrations
+
+# Defaults, overridable through app.config or environment variables
+DEFAULT_CONFIG = {
+    'DB_POOL_SIZE': 5,                  # max open connections per worker process
+    'DB_POOL_TIMEOUT': 10.0,            # seconds to wait for a free connection
+    'DB_HEALTHCHECK_INTERVAL': 30.0,    # idle seconds before a connection is re-checked
+    'DB_PRAGMAS': {},                   # extra PRAGMAs, override the storage profile
+
+    # Storage profile for several gunicorn workers sharing one file
+    'DB_JOURNAL_MODE': 'WAL',           # set once at startup, persists in the file
+    'DB_SYNCHRONOUS': 'NORMAL',         # safe with WAL, skips the fsync per commit
+    'DB_BUSY_TIMEOUT': 5000,            # ms a writer waits for the lock before failing
+    'DB_CACHE_SIZE_KB': 16384,          # page cache per connection
+    'DB_MMAP_SIZE': 64 * 1024 * 1024,   # bytes of the file read through mmap
+    'DB_TEMP_STORE': 'MEMORY',          # sorts and temp b-trees stay in RAM
+    'DB_WAL_AUTOCHECKPOINT': 1000,      # pages in the WAL before an automatic checkpoint
+    'DB_CHECKPOINT_INTERVAL': 300.0,    # seconds between explicit checkpoints, 0 disables
+    'DB_CHECKPOINT_MODE': 'PASSIVE',    # PASSIVE never blocks readers or writers
+}
+
+# Settings reported by storage_settings()
+INSPECTED_PRAGMAS = [
+    'journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size',
+    'temp_store', 'wal_autocheckpoint', 'page_size', 'page_count', 'freelist_count',
+]
+
+_pool_lock = threading.Lock()
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no connection becomes free within DB_POOL_TIMEOUT"""
+
+
+def apply_pragmas(conn, pragmas):
+    """Apply a dict of PRAGMA name -> value to a connection"""
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def connection_pragmas(config):
+    """Per-connection PRAGMAs of the storage profile, plus DB_PRAGMAS overrides"""
+    pragmas = {
+        'busy_timeout': int(config['DB_BUSY_TIMEOUT']),
+        'synchronous': config['DB_SYNCHRONOUS'],
+        'cache_size': -int(config['DB_CACHE_SIZE_KB']),
+        'mmap_size': int(config['DB_MMAP_SIZE']),
+        'temp_store': config['DB_TEMP_STORE'],
+        'wal_autocheckpoint': int(config['DB_WAL_AUTOCHECKPOINT']),
+    }
+    pragmas.update(config['DB_PRAGMAS'])
+    return pragmas
+
+
+def apply_storage_profile(database, config):
+    """Switch the database file to the configured journal mode.
+
+    journal_mode is a property of the file rather than the connection, so it
+    only needs to be set once per process start. Returns the active mode.
+    """
+    conn = sqlite3.connect(database, timeout=int(config['DB_BUSY_TIMEOUT']) / 1000)
+    try:
+        mode = conn.execute(f"PRAGMA journal_mode = {config['DB_JOURNAL_MODE']}").fetchone()[0]
+    finally:
+        conn.close()
+    return mode
+
+
+def checkpoint(conn, mode='PASSIVE'):
+    """Run a WAL checkpoint; returns (busy, wal_pages, checkpointed_pages)"""
+    return tuple(conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone())
+
+
+def storage_settings(conn):
+    """Return the PRAGMA values currently active on a connection"""
+    settings = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in INSPECTED_PRAGMAS}
+    settings['sqlite_version'] = sqlite3.sqlite_version
+    return settings
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections for a single database file.
+
+    At most ``max_size`` connections are open at once; idle connections are
+    reused LIFO and re-checked with ``SELECT 1`` when they have been idle for
+    longer than ``healthcheck_interval`` seconds.
+    """
+
+    def __init__(self, database, max_size=5, timeout=10.0, healthcheck_interval=30.0, pragmas=None,
+                 checkpoint_interval=0, checkpoint_mode='PASSIVE'):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self.pragmas = dict(pragmas or {})
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_mode = checkpoint_mode
+        self._reset()
+
+    def _reset(self):
+        # Connections inherited across fork() are dropped, never closed
+        self._pid = os.getpid()
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._lock = threading.Lock()
+        self._last_checkpoint = time.monotonic()
+        self.created = 0
+        self.checkpoints = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn, self.pragmas)
+        self.created += 1
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self):
+        """Return a connection, reusing an idle one when possible"""
+        if os.getpid() != self._pid:
+            self._reset()
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection available after {self.timeout}s")
+
+        try:
+            while True:
+                with self._lock:
+                    item = self._idle.pop() if self._idle else None
+                if item is None:
+                    return self._connect()
+
+                conn, last_used = item
+                if time.monotonic() - last_used < self.healthcheck_interval or self._is_healthy(conn):
+                    return conn
+                self._close_quietly(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        """Give a connection back to the pool, rolling back any open transaction"""
+        if os.getpid() != self._pid:
+            return
+
+        try:
+            if not discard and conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            discard = True
+
+        if discard:
+            self._close_quietly(conn)
+        else:
+            self._maybe_checkpoint(conn)
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        self._slots.release()
+
+    def _maybe_checkpoint(self, conn):
+        # Checkpoint policy: besides wal_autocheckpoint, run an explicit
+        # checkpoint from whichever request finishes after the interval
+        if not self.checkpoint_interval:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_checkpoint < self.checkpoint_interval:
+                return
+            self._last_checkpoint = now
+        try:
+            checkpoint(conn, self.checkpoint_mode)
+            self.checkpoints += 1
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {'max_size': self.max_size, 'idle': idle, 'created': self.created,
+                'checkpoints': self.checkpoints}
+
+
+def env_default(key, default):
+    """Environment override for a config default, converted to the default's type"""
+    value = os.getenv(key)
+    if value is None or isinstance(default, dict):
+        return default
+    if isinstance(default, bool):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return type(default)(value)
+
+
+def init_app(app):
+    """Register pool configuration and request teardown on a Flask app"""
+    for key, default in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, env_default(key, default))
+    app.extensions['db_pool'] = None
+    app.teardown_appcontext(close_db)
+
+
+def get_pool(app=None):
+    """Return the process-wide pool for the app, creating it on first use"""
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get('db_pool')
+    if pool is None or pool.database != app.config['DATABASE']:
+        with _pool_lock:
+            pool = app.extensions.get('db_pool')
+            if pool is None or pool.database != app.config['DATABASE']:
+                if pool is not None:
+                    pool.close_all()
+                try:
+                    mode = apply_storage_profile(app.config['DATABASE'], app.config)
+                    app.logger.info(f"SQLite journal_mode={mode} for {app.config['DATABASE']}")
+                except sqlite3.Error as e:
+                    app.logger.warning(f"Could not apply storage profile: {e}")
+                try:
+                    applied = migrations.migrate(app.config['DATABASE'])
+                    if applied:
+                        app.logger.info(f"Applied schema migrations {applied}")
+                except sqlite3.Error as e:
+                    app.logger.warning(f"Could not migrate database: {e}")
+                pool = ConnectionPool(
+                    app.config['DATABASE'],
+                    max_size=app.config['DB_POOL_SIZE'],
+                    timeout=app.config['DB_POOL_TIMEOUT'],
+                    healthcheck_interval=app.config['DB_HEALTHCHECK_INTERVAL'],
+                    pragmas=connection_pragmas(app.config),
+                    checkpoint_interval=app.config['DB_CHECKPOINT_INTERVAL'],
+                    checkpoint_mode=app.config['DB_CHECKPOINT_MODE'],
+                )
+                app.extensions['db_pool'] = pool
+    return pool
+
+
+def get_db():
+    """Return the connection bound to the current app context"""
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+def close_db(exc=None):
+    """Return the context's connection to the pool (teardown_appcontext)"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn, discard=isinstance(exc, sqlite3.DatabaseError))
+
+
+if __name__ == '__main__':
+    import json
+    import sys
+
+    # Print the storage profile a worker would run with: python db.py [database]
+    database = sys.argv[1] if len(sys.argv) > 1 else 'kopi_makmur.db'
+    config = {key: env_default(key, default) for key, default in DEFAULT_CONFIG.items()}
+    conn = sqlite3.connect(database)
+    apply_pragmas(conn, connection_pragmas(config))
+    print(json.dumps(storage_settings(conn), indent=2))
+    conn.close()
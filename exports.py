@@ -0,0 +1,176 @@
+"""
+Streaming CSV / XLSX export of transactions
+Rows come straight off a SQLite cursor in fetchmany() batches and are
+encoded as they arrive, so memory stays flat whatever the row count and
+the download starts with the first batch. The XLSX writer has no
+dependencies: the zip is written through zipfile to an unseekable sink
+(data descriptors instead of back-patched headers) and the sheet uses
+inline strings, since a shared-strings table would have to be held in
+memory until the end.
+"""
+
+import csv
+import io
+import zipfile
+from datetime import date, timedelta
+from xml.sax.saxutils import escape
+
+from flask import current_app
+
+DEFAULT_CONFIG = {
+    'EXPORT_BATCH_SIZE': 1000,
+}
+
+COLUMNS = ('id', 'tanggal', 'tipe', 'kategori', 'deskripsi', 'jumlah', 'satuan')
+HEADERS = ('ID', 'Tanggal', 'Tipe', 'Kategori', 'Deskripsi', 'Jumlah', 'Satuan')
+NUMERIC = {'id', 'jumlah'}
+
+CSV_MIMETYPE = 'text/csv'
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def init_app(app):
+    for key, default in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, default)
+
+
+def iter_batches(conn, where='1=1', params=(), batch_size=None):
+    """Yield lists of transaction rows in (tanggal, id) order, one batch at a time"""
+    batch_size = batch_size or current_app.config['EXPORT_BATCH_SIZE']
+    cursor = conn.execute(
+        f"SELECT {', '.join(COLUMNS)} FROM transactions WHERE {where} ORDER BY tanggal, id",
+        params
+    )
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
+
+
+# Text cells starting with these are run as formulas by Excel/Sheets
+FORMULA_PREFIXES = ('=', '+', '-', '@')
+
+
+def csv_cell(value):
+    """Prefix text a spreadsheet would run as a formula with a quote"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_stream(batches):
+    """Encode batches as UTF-8 CSV with a BOM so Excel detects the encoding"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADERS)
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(tuple(csv_cell(value) for value in row) for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _Sink:
+    """Write-only file object collecting what zipfile writes until drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>"""
+
+ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>"""
+
+SHEET_HEAD = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>"""
+
+SHEET_TAIL = "</sheetData></worksheet>"
+
+
+def _cell(value, numeric):
+    if value is None:
+        return '<c/>'
+    if numeric and isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+
+def _row(number, values, numeric_flags):
+    cells = ''.join(_cell(v, n) for v, n in zip(values, numeric_flags))
+    return f'<row r="{number}">{cells}</row>'
+
+
+def xlsx_stream(batches, sheet_name='Transaksi'):
+    """Encode batches as a single-sheet XLSX workbook, yielding zip bytes as they are produced"""
+    sink = _Sink()
+    numeric_flags = [c in NUMERIC for c in COLUMNS]
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES)
+        archive.writestr('_rels/.rels', ROOT_RELS)
+        archive.writestr('xl/workbook.xml', WORKBOOK.format(name=escape(sheet_name, {'"': '&quot;'})))
+        archive.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        yield sink.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(SHEET_HEAD.encode('utf-8'))
+            sheet.write(_row(1, HEADERS, [False] * len(HEADERS)).encode('utf-8'))
+            number = 1
+            for rows in batches:
+                parts = []
+                for row in rows:
+                    number += 1
+                    parts.append(_row(number, tuple(row), numeric_flags))
+                sheet.write(''.join(parts).encode('utf-8'))
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            sheet.write(SHEET_TAIL.encode('utf-8'))
+    yield sink.drain()
+
+
+def filename(start, end, extension):
+    """Download name for the exported [start, end) range, naming the last day inclusively"""
+    last = (date.fromisoformat(end) - timedelta(days=1)).isoformat() if end else None
+    if start and last:
+        return f"transaksi_{start}_sd_{last}.{extension}"
+    if start:
+        return f"transaksi_sejak_{start}.{extension}"
+    if last:
+        return f"transaksi_sd_{last}.{extension}"
+    return f"transaksi_semua.{extension}"
@@ -0,0 +1,62 @@
+"""
+Date filters for transaction queries
+Turns the month/year/date_from/date_to request parameters into a single
+half-open range ``tanggal >= ? AND tanggal < ?`` that SQLite can answer
+from idx_transactions_tanggal, instead of strftime() calls on every row.
+"""
+
+from datetime import date, timedelta
+
+
+def _next_month(day):
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def date_range(month=None, year=None, date_from=None, date_to=None, today=None):
+    """Return (start, end) ISO dates of the half-open range, either may be None.
+
+    ``month`` without ``year`` means that month of the current year;
+    ``date_to`` is inclusive, like the date pickers that send it.
+    Raises ValueError on malformed input.
+    """
+    start = end = None
+
+    if month or year:
+        year = int(year) if year else (today or date.today()).year
+        if month:
+            start = date(year, int(month), 1)
+            end = _next_month(start)
+        else:
+            start = date(year, 1, 1)
+            end = date(year + 1, 1, 1)
+
+    if date_from:
+        lower = date.fromisoformat(date_from)
+        start = max(start, lower) if start else lower
+
+    if date_to:
+        upper = date.fromisoformat(date_to) + timedelta(days=1)
+        end = min(end, upper) if end else upper
+
+    return (start.isoformat() if start else None,
+            end.isoformat() if end else None)
+
+
+def build_date_filter(month=None, year=None, date_from=None, date_to=None, column='tanggal', today=None):
+    """Return (sql, params) for a WHERE fragment; ``1=1`` when unfiltered"""
+    start, end = date_range(month, year, date_from, date_to, today)
+    return range_filter(start, end, column)
+
+
+def range_filter(start=None, end=None, column='tanggal'):
+    """Return (sql, params) for ``start <= column < end``; ``1=1`` when both are None"""
+    clauses, params = [], []
+    if start:
+        clauses.append(f"{column} >= ?")
+        params.append(start)
+    if end:
+        clauses.append(f"{column} < ?")
+        params.append(end)
+    return (' AND '.join(clauses) or '1=1'), params
@@ -0,0 +1,109 @@
+"""
+Fragment cache and on-disk bytecode cache for the Jinja templates
+Templates mark their data-only parts with
+
+    {% cache 'recent_transactions' %} ... {% endcache %}
+    {% cache 'rows', month, year %} ... {% endcache %}
+
+The rendered HTML is kept in an LRU map keyed by template, fragment name,
+the extra key values and today's date window, and is only reused while the
+data_version counter (migration 4) is unchanged, so any write from any
+worker invalidates every fragment at once. Everything outside the blocks,
+the page chrome and inline JS, is rendered as before.
+
+Compiled templates are written to JINJA_BYTECODE_DIR, so a freshly started
+worker loads bytecode instead of parsing and compiling the 20-30 KB
+templates again; `python fragments.py` fills that directory at deploy time.
+"""
+
+import argparse
+import os
+
+from flask import current_app, g, has_app_context
+from jinja2 import FileSystemBytecodeCache, TemplateNotFound, nodes
+from jinja2.ext import Extension
+
+import cache
+import db
+import querylog
+
+DEFAULT_CONFIG = {
+    'FRAGMENT_CACHE_ENABLED': True,
+    'FRAGMENT_CACHE_SIZE': 256,       # rendered fragments per worker process
+    'FRAGMENT_CACHE_TTL': 300.0,      # seconds; data_version invalidates sooner
+    'JINJA_BYTECODE_DIR': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jinja_cache'),
+}
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache name[, key, ...] %}body{% endcache %}"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        # The template name keeps equally named fragments of two templates apart
+        key = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(key)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        if not has_app_context() or not current_app.config['FRAGMENT_CACHE_ENABLED']:
+            return caller()
+        key = tuple(key) + (cache.window_key(),)
+        return get_fragments().get_or_compute(key, current_version(), caller)
+
+
+def current_version():
+    """data_version, read once per request however many fragments a page has"""
+    if '_fragment_version' not in g:
+        g._fragment_version = cache.data_version(querylog.traced(db.get_db()))
+    return g._fragment_version
+
+
+def init_app(app):
+    for key, default in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, db.env_default(key, default))
+    app.extensions['fragment_cache'] = cache.ResponseCache(
+        max_entries=app.config['FRAGMENT_CACHE_SIZE'],
+        ttl=app.config['FRAGMENT_CACHE_TTL'],
+    )
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    directory = app.config['JINJA_BYTECODE_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def get_fragments():
+    return current_app.extensions['fragment_cache']
+
+
+def precompile(app):
+    """Load every template once so its bytecode is on disk; returns the names compiled"""
+    compiled = []
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateNotFound:
+            continue
+        compiled.append(name)
+    return compiled
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compile the templates into the Jinja bytecode cache')
+    parser.parse_args(argv)
+
+    from app import app
+    names = precompile(app)
+    print(f"✅ {len(names)} templates compiled into {app.config['JINJA_BYTECODE_DIR']}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
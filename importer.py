@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Bulk transaction import for Toko Kopi Makmur
+Reads CSV or JSON (an array of objects, or one object per line) as a
+stream, validates every record against the transactions table's
+constraints and inserts the valid ones with executemany in chunks inside
+a single transaction. Invalid records are reported by line (CSV) or
+record number (JSON) and never abort the rest of the batch.
+
+Usage:
+    python importer.py penjualan.csv [--database kopi_makmur.db] [--user-id 1]
+    python importer.py penjualan.json --format json --chunk-size 5000
+"""
+
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+from dataclasses import dataclass, field
+from datetime import date
+
+TIPES = ('pendapatan', 'pengeluaran')
+FORMATS = ('csv', 'json')
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+INSERT_SQL = (
+    "INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah, satuan, user_id) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+@dataclass
+class RowError:
+    line: int
+    error: str
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    rejected: int = 0
+    errors: list = field(default_factory=list)
+
+    @property
+    def total(self):
+        return self.inserted + self.rejected
+
+    def reject(self, line, error):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(line, error))
+
+
+def detect_format(filename, default='csv'):
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if extension in ('json', 'jsonl', 'ndjson'):
+        return 'json'
+    if extension == 'csv':
+        return 'csv'
+    return default
+
+
+def parse_csv(stream):
+    """Yield (line number, record dict) from a text stream with a header row.
+
+    Raises ValueError when the file is not readable CSV.
+    """
+    reader = csv.DictReader(stream)
+    try:
+        if reader.fieldnames:
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for record in reader:
+            yield reader.line_num, record
+    except csv.Error as e:
+        raise ValueError(f"Invalid CSV at line {reader.line_num}: {e}") from e
+
+
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def parse_json(stream, chunk_size=65536):
+    """Yield (record number, record) from a JSON array or whitespace-separated objects.
+
+    Decodes one value at a time out of a sliding buffer, so the whole
+    document is never held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+    in_array = False
+    number = 0
+
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if pos == len(buffer):
+            if eof:
+                return
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        if number == 0 and not in_array and buffer[pos] == '[':
+            in_array = True
+            pos += 1
+            continue
+        if in_array and buffer[pos] == ']':
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise ValueError(f"Invalid JSON after record {number}: {e.msg}") from e
+            end = None
+        if end is None or (end == len(buffer) and not eof):
+            # Incomplete value, or a number that may continue: read on
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        number += 1
+        pos = end
+        yield number, value
+
+
+def validate(record, user_id=None):
+    """Return the INSERT parameters for a record; raises ValueError with the reason"""
+    if not isinstance(record, dict):
+        raise ValueError("bukan objek")
+
+    def text(name, required=True):
+        value = record.get(name)
+        value = '' if value is None else str(value).strip()
+        if required and not value:
+            raise ValueError(f"{name} kosong")
+        return value
+
+    tanggal = text('tanggal')
+    try:
+        tanggal = date.fromisoformat(tanggal).isoformat()
+    except ValueError:
+        raise ValueError(f"tanggal tidak valid: {tanggal!r}") from None
+
+    tipe = text('tipe').lower()
+    if tipe not in TIPES:
+        raise ValueError(f"tipe harus {' atau '.join(TIPES)}, bukan {tipe!r}")
+
+    raw = record.get('jumlah')
+    try:
+        jumlah = float(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"jumlah bukan angka: {raw!r}") from None
+    if not math.isfinite(jumlah) or jumlah < 0:
+        raise ValueError(f"jumlah tidak valid: {raw!r}")
+
+    return (tanggal, tipe, text('kategori'), text('deskripsi', required=False),
+            jumlah, text('satuan', required=False) or None, user_id)
+
+
+def _flush(conn, chunk, result):
+    """Insert one chunk; if the database rejects it, retry row by row to find the culprits"""
+    conn.execute("SAVEPOINT import_chunk")
+    try:
+        conn.executemany(INSERT_SQL, [params for _, params in chunk])
+        result.inserted += len(chunk)
+    except sqlite3.IntegrityError:
+        conn.execute("ROLLBACK TO import_chunk")
+        for line, params in chunk:
+            try:
+                conn.execute(INSERT_SQL, params)
+                result.inserted += 1
+            except sqlite3.IntegrityError as e:
+                result.reject(line, str(e))
+    conn.execute("RELEASE import_chunk")
+
+
+def import_records(conn, records, user_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Validate and insert (line, record) pairs in one transaction; returns ImportResult.
+
+    A malformed file (unparseable JSON) rolls back everything; per-record
+    problems only skip that record.
+    """
+    result = ImportResult()
+    chunk = []
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    try:
+        for line, record in records:
+            try:
+                chunk.append((line, validate(record, user_id)))
+            except ValueError as e:
+                result.reject(line, str(e))
+                continue
+            if len(chunk) >= chunk_size:
+                _flush(conn, chunk, result)
+                chunk = []
+        if chunk:
+            _flush(conn, chunk, result)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return result
+
+
+def import_stream(conn, stream, fmt='csv', user_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import from a text stream in the given format"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    records = parse_csv(stream) if fmt == 'csv' else parse_json(stream)
+    return import_records(conn, records, user_id, chunk_size)
+
+
+def text_stream(binary):
+    """Wrap an uploaded binary stream as UTF-8 text, dropping a BOM"""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk import transactions from CSV or JSON')
+    parser.add_argument('file', help="CSV/JSON file, or - for stdin")
+    parser.add_argument('--database', default='kopi_makmur.db')
+    parser.add_argument('--format', choices=FORMATS, help='default: from the file extension')
+    parser.add_argument('--user-id', type=int, help='recorded as the transactions\' user_id')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.file)
+    conn = sqlite3.connect(args.database)
+    try:
+        if args.file == '-':
+            result = import_stream(conn, text_stream(sys.stdin.buffer), fmt, args.user_id, args.chunk_size)
+        else:
+            with open(args.file, 'r', encoding='utf-8-sig', newline='') as f:
+                result = import_stream(conn, f, fmt, args.user_id, args.chunk_size)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        conn.close()
+
+    print(f"✅ {result.inserted} transactions imported")
+    if result.rejected:
+        print(f"⚠️  {result.rejected} rows rejected:")
+        for error in result.errors[:20]:
+            print(f"   line {error.line}: {error.error}")
+        if result.rejected > 20:
+            print(f"   ... and {result.rejected - 20} more")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
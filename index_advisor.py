@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Index advisor for Toko Kopi Makmur
+Collects every SQL statement passed to execute() in the given modules,
+runs EXPLAIN QUERY PLAN for it and flags full table scans.
+
+Usage:
+    python index_advisor.py [--database kopi_makmur.db] [files ...]
+
+Without --database the plans are taken from a scratch database built from
+schema.sql plus all migrations. Exits with status 1 when a full scan of a
+table outside SMALL_TABLES is found.
+"""
+
+import argparse
+import ast
+import os
+import sqlite3
+import sys
+import tempfile
+
+import migrations
+
+DEFAULT_FILES = ['app.py', 'aggregates.py']
+
+# Reference tables with a handful of rows; scanning them is expected
+SMALL_TABLES = {'users', 'products', 'sqlite_master'}
+
+# Stand-ins for interpolated fragments of f-string queries, by variable name
+FRAGMENTS = {
+    'where': "tanggal >= ? AND tanggal < ?",
+    'month_where': "tanggal >= ? AND tanggal < ?",
+}
+
+
+def _render(node):
+    """Return the SQL text of a str or f-string node, or None"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            elif isinstance(value, ast.FormattedValue) and isinstance(value.value, ast.Name) \
+                    and value.value.id in FRAGMENTS:
+                parts.append(FRAGMENTS[value.value.id])
+            else:
+                return None
+        return ''.join(parts)
+    return None
+
+
+def _resolve_name(function, name, lineno):
+    """Last string assigned to ``name`` in ``function`` before ``lineno``"""
+    found = None
+    for node in ast.walk(function):
+        if isinstance(node, ast.Assign) and node.lineno < lineno:
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id == name:
+                    found = node.value
+    return _render(found) if found is not None else None
+
+
+def collect_statements(path):
+    """Yield (lineno, function name, sql or None) for each execute() call"""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    for function in ast.walk(tree):
+        if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for node in ast.walk(function):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr in ('execute', 'executemany') and node.args):
+                continue
+            arg = node.args[0]
+            if isinstance(arg, ast.Name):
+                sql = _resolve_name(function, arg.id, node.lineno)
+            else:
+                sql = _render(arg)
+            yield node.lineno, function.name, sql
+
+
+def scratch_database():
+    """Build a throwaway database from schema.sql and all migrations"""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    conn = sqlite3.connect(path)
+    with open('schema.sql', 'r') as f:
+        conn.executescript(f.read())
+    conn.close()
+    migrations.migrate(path)
+    return path
+
+
+def explain(conn, sql):
+    """Return the plan detail lines for a statement"""
+    params = [None] * sql.count('?')
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def full_scans(plan):
+    """Tables read without any index, ignoring SMALL_TABLES and subqueries"""
+    tables = []
+    for detail in plan:
+        words = detail.split()
+        if len(words) >= 2 and words[0] == 'SCAN' and 'USING' not in words:
+            name = words[1]
+            if name not in SMALL_TABLES and name != 'CONSTANT' and not name.startswith('('):
+                tables.append(name)
+    return tables
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='EXPLAIN QUERY PLAN every statement and flag full scans')
+    parser.add_argument('files', nargs='*', default=DEFAULT_FILES)
+    parser.add_argument('--database', help='database to plan against (default: scratch copy of schema.sql)')
+    args = parser.parse_args(argv)
+
+    scratch = None
+    database = args.database
+    if database is None:
+        database = scratch = scratch_database()
+
+    conn = sqlite3.connect(database)
+    flagged = skipped = checked = 0
+    try:
+        for path in args.files:
+            for lineno, function, sql in collect_statements(path):
+                where = f"{path}:{lineno} {function}()"
+                if sql is None:
+                    print(f"⚠️  {where}: dynamic SQL, skipped")
+                    skipped += 1
+                    continue
+                if sql.lstrip().upper().startswith(('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK')):
+                    continue
+                try:
+                    plan = explain(conn, sql)
+                except sqlite3.Error as e:
+                    print(f"⚠️  {where}: {e}")
+                    skipped += 1
+                    continue
+                checked += 1
+                scans = full_scans(plan)
+                if scans:
+                    flagged += 1
+                    print(f"❌ {where}: full scan of {', '.join(scans)}")
+                    print(f"     {' '.join(sql.split())}")
+                    for detail in plan:
+                        print(f"     -> {detail}")
+    finally:
+        conn.close()
+        if scratch:
+            os.remove(scratch)
+
+    print(f"\n📊 {checked} statements planned, {flagged} with full scans, {skipped} skipped")
+    return 1 if flagged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
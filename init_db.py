@@ -2,31 +2,63 @@
 """
 Database Initialization Script for Toko Kopi Makmur
 This script creates the database and populates it with sample data
+
+Usage:
+    python init_db.py                        # 90 days of sample data
+    python init_db.py --days 365 --rows-per-day 3000 --seed 42 --database load.db
+
+Any of --days/--rows-per-day/--seed switches to bulk mode: rows come from a
+seeded generator and go in through one executemany inside one transaction,
+with synchronous=OFF and the transactions indexes and triggers dropped for
+the load and rebuilt afterwards. The same seed, sizes and --end-date always
+produce the same rows.
 """
 
+import argparse
+import os
 import sqlite3
+import sys
+import time
 from werkzeug.security import generate_password_hash
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import random
 
+import migrations
+import rollups
+
 DATABASE = 'kopi_makmur.db'
+SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
 
-def init_database():
-    """Initialize database with schema and sample data"""
-    
-    print("🔧 Initializing database...")
-    
-    # Connect to database
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
+CATEGORIES_PENDAPATAN = ['Penjualan']
+CATEGORIES_PENGELUARAN = ['Bahan Pokok', 'Barang', 'Jasa', 'Pengeluaran lain-lain']
+
+def random_transaction(rng=random):
+    """(tipe, kategori, deskripsi, jumlah) with the shop's usual mix and price ranges"""
+    # Random choice between pendapatan and pengeluaran (60% pendapatan, 40% pengeluaran)
+    tipe = 'pendapatan' if rng.random() < 0.6 else 'pengeluaran'
     
-    # Read and execute schema
-    print("📋 Creating tables...")
-    with open('schema.sql', 'r') as f:
-        schema = f.read()
-        cursor.executescript(schema)
+    if tipe == 'pendapatan':
+        kategori = rng.choice(CATEGORIES_PENDAPATAN)
+        jumlah = rng.randint(50, 500) * 1000  # 50k - 500k
+        deskripsi = f"Penjualan {rng.choice(['Kopi', 'Makanan', 'Minuman', 'Paket'])}"
+    else:
+        kategori = rng.choice(CATEGORIES_PENGELUARAN)
+        if kategori == 'Bahan Pokok':
+            jumlah = rng.randint(50, 300) * 1000  # 50k - 300k
+            deskripsi = f"Pembelian {rng.choice(['Kopi', 'Susu', 'Gula', 'Tepung'])}"
+        elif kategori == 'Barang':
+            jumlah = rng.randint(100, 500) * 1000  # 100k - 500k
+            deskripsi = f"Pembelian {rng.choice(['Peralatan', 'Kemasan', 'Perlengkapan'])}"
+        elif kategori == 'Jasa':
+            jumlah = rng.randint(50, 200) * 1000  # 50k - 200k
+            deskripsi = f"{rng.choice(['Listrik', 'Air', 'Internet', 'Maintenance'])}"
+        else:
+            jumlah = rng.randint(20, 150) * 1000  # 20k - 150k
+            deskripsi = f"{rng.choice(['Transport', 'ATK', 'Kebersihan', 'Lain-lain'])}"
     
-    # Insert sample users
+    return tipe, kategori, deskripsi, jumlah
+
+def create_users(cursor):
     print("👥 Creating sample users...")
     users = [
         ('BagasNz', '162316', 'admin'),
@@ -47,8 +79,8 @@ def init_database():
             print(f"   ✓ Created user: {username} (password: {password}, role: {role})")
         except sqlite3.IntegrityError:
             print(f"   - User {username} already exists")
-    
-    # Insert sample products
+
+def create_products(cursor):
     print("📦 Creating sample products...")
     products = [
         ('Kopi Arabica', 'Kopi', 25000, 50),
@@ -71,13 +103,31 @@ def init_database():
             print(f"   ✓ Added product: {nama}")
         except sqlite3.IntegrityError:
             print(f"   - Product {nama} already exists")
+
+def init_database(database=DATABASE):
+    """Initialize database with schema and sample data"""
+    
+    print("🔧 Initializing database...")
+    
+    # Connect to database
+    conn = sqlite3.connect(database)
+    cursor = conn.cursor()
+    
+    # Read and execute schema
+    print("📋 Creating tables...")
+    with open(SCHEMA, 'r') as f:
+        schema = f.read()
+        cursor.executescript(schema)
+    
+    # Insert sample users
+    create_users(cursor)
+    
+    # Insert sample products
+    create_products(cursor)
     
     # Insert sample transactions (last 3 months)
     print("💰 Creating sample transactions...")
     
-    categories_pendapatan = ['Penjualan']
-    categories_pengeluaran = ['Bahan Pokok', 'Barang', 'Jasa', 'Pengeluaran lain-lain']
-    
     # Get admin user id
     admin_id = cursor.execute("SELECT id FROM users WHERE username = 'BagasNz'").fetchone()[0]
     
@@ -93,27 +143,7 @@ def init_database():
         num_transactions = random.randint(2, 5)
         
         for _ in range(num_transactions):
-            # Random choice between pendapatan and pengeluaran (60% pendapatan, 40% pengeluaran)
-            tipe = 'pendapatan' if random.random() < 0.6 else 'pengeluaran'
-            
-            if tipe == 'pendapatan':
-                kategori = random.choice(categories_pendapatan)
-                jumlah = random.randint(50, 500) * 1000  # 50k - 500k
-                deskripsi = f"Penjualan {random.choice(['Kopi', 'Makanan', 'Minuman', 'Paket'])}"
-            else:
-                kategori = random.choice(categories_pengeluaran)
-                if kategori == 'Bahan Pokok':
-                    jumlah = random.randint(50, 300) * 1000  # 50k - 300k
-                    deskripsi = f"Pembelian {random.choice(['Kopi', 'Susu', 'Gula', 'Tepung'])}"
-                elif kategori == 'Barang':
-                    jumlah = random.randint(100, 500) * 1000  # 100k - 500k
-                    deskripsi = f"Pembelian {random.choice(['Peralatan', 'Kemasan', 'Perlengkapan'])}"
-                elif kategori == 'Jasa':
-                    jumlah = random.randint(50, 200) * 1000  # 50k - 200k
-                    deskripsi = f"{random.choice(['Listrik', 'Air', 'Internet', 'Maintenance'])}"
-                else:
-                    jumlah = random.randint(20, 150) * 1000  # 20k - 150k
-                    deskripsi = f"{random.choice(['Transport', 'ATK', 'Kebersihan', 'Lain-lain'])}"
+            tipe, kategori, deskripsi, jumlah = random_transaction()
             
             cursor.execute(
                 'INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah, user_id) VALUES (?, ?, ?, ?, ?, ?)',
@@ -145,5 +175,94 @@ def init_database():
     print("=" * 50)
     print("\n🚀 You can now run the application with: python app.py")
 
+def generate_transactions(rng, start, days, rows_per_day, user_id):
+    """Yield transaction rows day by day; nothing is materialized"""
+    for offset in range(days):
+        tanggal = (start + timedelta(days=offset)).isoformat()
+        for _ in range(rows_per_day):
+            tipe, kategori, deskripsi, jumlah = random_transaction(rng)
+            yield (tanggal, tipe, kategori, deskripsi, jumlah, user_id)
+
+def bulk_seed(database=DATABASE, days=90, rows_per_day=4, seed=0, end_date=None):
+    """Load days * rows_per_day generated transactions ending at end_date; returns the row count"""
+    end_date = end_date or date.today()
+    start = end_date - timedelta(days=days - 1)
+    print(f"🔧 Bulk seeding {database}: {days} days x {rows_per_day} rows, seed {seed}, "
+          f"{start.isoformat()} s/d {end_date.isoformat()}")
+    
+    conn = sqlite3.connect(database)
+    with open(SCHEMA, 'r') as f:
+        conn.executescript(f.read())
+    create_users(conn.cursor())
+    create_products(conn.cursor())
+    conn.commit()
+    conn.close()
+    migrations.migrate(database)
+    
+    # Autocommit mode: the load runs in the one explicit transaction below
+    conn = sqlite3.connect(database, isolation_level=None)
+    admin_id = conn.execute("SELECT id FROM users WHERE username = 'BagasNz'").fetchone()[0]
+    conn.execute("PRAGMA synchronous = OFF")
+    
+    began = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Indexes and triggers are maintained row by row during an insert;
+        # building them once afterwards is much cheaper
+        deferred = conn.execute(
+            "SELECT type, name, sql FROM sqlite_master "
+            "WHERE tbl_name = 'transactions' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+        ).fetchall()
+        for kind, name, _sql in deferred:
+            conn.execute(f"DROP {kind.upper()} {name}")
+        
+        print("💰 Loading transactions...")
+        rows = generate_transactions(random.Random(seed), start, days, rows_per_day, admin_id)
+        conn.executemany(
+            'INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah, user_id) VALUES (?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        loaded = time.perf_counter()
+        
+        print("📇 Building indexes and rollups...")
+        for kind, _name, sql in deferred:
+            if kind == 'index':
+                conn.execute(sql)
+        rollups.rebuild(conn)
+        conn.execute("UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1")
+        for kind, _name, sql in deferred:
+            if kind == 'trigger':
+                conn.execute(sql)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA synchronous = FULL")
+    count = days * rows_per_day
+    finished = time.perf_counter()
+    conn.close()
+    
+    print(f"   ✓ Inserted {count} transactions in {loaded - began:.1f}s "
+          f"({count / max(loaded - began, 1e-9):,.0f} rows/s), indexes and rollups in {finished - loaded:.1f}s")
+    print("\n✅ Bulk seed completed successfully!")
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Create the database and fill it with sample data')
+    parser.add_argument('--database', default=DATABASE)
+    parser.add_argument('--days', type=int, help='bulk mode: number of days to generate (default 90)')
+    parser.add_argument('--rows-per-day', type=int, help='bulk mode: transactions per day (default 4)')
+    parser.add_argument('--seed', type=int, help='bulk mode: random seed (default 0)')
+    parser.add_argument('--end-date', type=date.fromisoformat, help='bulk mode: last day, YYYY-MM-DD (default today)')
+    args = parser.parse_args(argv)
+    
+    if args.days is None and args.rows_per_day is None and args.seed is None:
+        init_database(args.database)
+    else:
+        bulk_seed(args.database, args.days or 90, args.rows_per_day or 4, args.seed or 0, args.end_date)
+    return 0
+
 if __name__ == '__main__':
-    init_database()
+    sys.exit(main())
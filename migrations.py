@@ -0,0 +1,160 @@
+"""
+Schema migrations for existing databases
+Each migration runs once, in order, tracked through PRAGMA user_version.
+Fresh databases built from schema.sql start at version 0 and replay them,
+so every migration must be safe to run against an up-to-date schema.
+"""
+
+import sqlite3
+
+import rollups
+
+
+def _daily_rollups(conn):
+    rollups.create(conn)
+    rollups.rebuild(conn)
+
+
+def _covering_indexes(conn):
+    # tipe = ? AND tanggal range, summing jumlah or grouping by kategori,
+    # answered from the index alone. A (tipe, tanggal, jumlah) index is not a
+    # prefix of this one, but this one covers those queries too (jumlah is
+    # read from the leaf entry), so it gets no index of its own
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_transactions_tipe_tanggal_kategori "
+        "ON transactions(tipe, tanggal, kategori, jumlah)"
+    )
+    # Date-range aggregates over both tipes and the rollup rebuild/verify
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_transactions_tanggal_tipe_kategori "
+        "ON transactions(tanggal, tipe, kategori, jumlah)"
+    )
+    # Two distinct values; every query using it is better served above
+    conn.execute("DROP INDEX IF EXISTS idx_transactions_tipe")
+    conn.execute("ANALYZE")
+
+
+def _satuan_column(conn):
+    # The transaction forms post a unit (dus, pcs, liter) that had no column
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(transactions)")]
+    if 'satuan' not in columns:
+        conn.execute("ALTER TABLE transactions ADD COLUMN satuan TEXT")
+
+
+VERSIONED_TABLES = ('transactions', 'users')
+VERSIONED_EVENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+DATA_VERSION_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS data_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)",
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_version_{table}_{event.lower()} AFTER {event} ON {table}
+    BEGIN
+        UPDATE data_version SET version = version + 1 WHERE id = 1;
+    END
+    """
+    for table in VERSIONED_TABLES
+    for event in VERSIONED_EVENTS
+]
+
+
+def _data_version(conn):
+    # Write counter shared by every worker; bumped inside the writing
+    # transaction so caches can never see new rows with an old version
+    for statement in DATA_VERSION_DDL:
+        conn.execute(statement)
+
+
+def _data_version_timestamp(conn):
+    # Last write time for Last-Modified headers, stamped by the same triggers
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(data_version)")]
+    if 'updated_at' not in columns:
+        conn.execute("ALTER TABLE data_version ADD COLUMN updated_at TIMESTAMP")
+    conn.execute("UPDATE data_version SET updated_at = COALESCE(updated_at, CURRENT_TIMESTAMP)")
+    for table in VERSIONED_TABLES:
+        for event in VERSIONED_EVENTS:
+            name = f"trg_version_{table}_{event.lower()}"
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(f"""
+                CREATE TRIGGER {name} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_version
+                    SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = 1;
+                END
+            """)
+
+
+SESSIONS_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER,
+        username TEXT NOT NULL,
+        role TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)",
+]
+
+
+def _sessions(conn):
+    # Server-side login sessions (sessions.py); not versioned, logins must
+    # not invalidate the data caches
+    for statement in SESSIONS_DDL:
+        conn.execute(statement)
+
+
+# (version, description, function taking an open connection)
+MIGRATIONS = [
+    (1, 'daily_rollups table and maintenance triggers', _daily_rollups),
+    (2, 'composite covering indexes on transactions, drop idx_transactions_tipe', _covering_indexes),
+    (3, 'transactions.satuan unit column', _satuan_column),
+    (4, 'data_version write counter', _data_version),
+    (5, 'data_version.updated_at last write time', _data_version_timestamp),
+    (6, 'sessions table for server-side login sessions', _sessions),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(database, timeout=5.0):
+    """Bring a database file up to LATEST_VERSION; returns the applied versions.
+
+    Concurrent workers serialize on BEGIN IMMEDIATE and re-read the version
+    once they hold the write lock.
+    """
+    conn = sqlite3.connect(database, timeout=timeout)
+    applied = []
+    try:
+        if current_version(conn) >= LATEST_VERSION:
+            return applied
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = current_version(conn)
+            for number, _description, apply in MIGRATIONS:
+                if number > version:
+                    apply(conn)
+                    conn.execute(f"PRAGMA user_version = {number}")
+                    applied.append(number)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return applied
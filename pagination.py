@@ -0,0 +1,95 @@
+"""
+Keyset pagination over transactions ordered by (tanggal DESC, id DESC)
+Pages are addressed by opaque cursor tokens holding the (tanggal, id) of
+the boundary row, so fetching page N costs the same as fetching page 1.
+"""
+
+import base64
+from dataclasses import dataclass, field
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+@dataclass
+class Page:
+    rows: list = field(default_factory=list)
+    next_cursor: str = None   # older rows
+    prev_cursor: str = None   # newer rows
+    page_size: int = DEFAULT_PAGE_SIZE
+
+
+def encode_cursor(tanggal, id):
+    raw = f"{tanggal}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (tanggal, id) from a cursor token; raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        tanggal, id = raw.rsplit('|', 1)
+        return tanggal, int(id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+
+
+def clamp_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value) if value else default
+    except ValueError:
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def transactions_page(conn, start=None, end=None, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """Fetch one page of transactions within [start, end).
+
+    ``after`` continues towards older rows, ``before`` goes back towards
+    newer ones; with neither the newest page is returned. The cursor row
+    value bounds the index range directly, so deep pages do not re-read
+    the rows before them.
+    """
+    clauses, params = [], []
+    if after:
+        cursor = decode_cursor(after)
+        clauses.append("(tanggal, id) < (?, ?)")
+        params.extend(cursor)
+        order = "tanggal DESC, id DESC"
+    elif before:
+        cursor = decode_cursor(before)
+        clauses.append("(tanggal, id) > (?, ?)")
+        params.extend(cursor)
+        order = "tanggal ASC, id ASC"
+    else:
+        order = "tanggal DESC, id DESC"
+
+    if start:
+        clauses.append("tanggal >= ?")
+        params.append(start)
+    if end:
+        clauses.append("tanggal < ?")
+        params.append(end)
+
+    where = ' AND '.join(clauses) or '1=1'
+    rows = conn.execute(
+        f"SELECT * FROM transactions WHERE {where} ORDER BY {order} LIMIT ?",
+        params + [page_size + 1]
+    ).fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before:
+        rows.reverse()
+
+    page = Page(rows=rows, page_size=page_size)
+    if rows:
+        # The cursor row itself lies on the side we came from, so that
+        # direction always has another page
+        more_newer = has_more if before else bool(after)
+        more_older = True if before else has_more
+        if more_newer:
+            page.prev_cursor = encode_cursor(rows[0]['tanggal'], rows[0]['id'])
+        if more_older:
+            page.next_cursor = encode_cursor(rows[-1]['tanggal'], rows[-1]['id'])
+    return page
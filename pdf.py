@@ -0,0 +1,101 @@
+"""
+Minimal PDF writer for the laporan reports
+Enough of PDF 1.4 for text in the standard Helvetica fonts, filled
+rectangles and lines on A4 pages, with Flate-compressed content streams.
+No fonts are embedded, so text is limited to the WinAnsi (cp1252) range.
+"""
+
+import zlib
+
+A4 = (595, 842)
+
+
+def _escape(text):
+    raw = str(text).encode('cp1252', 'replace').decode('latin-1')
+    return raw.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _color(rgb):
+    return ' '.join(f"{c:.3f}" for c in rgb)
+
+
+def text_width(text, size):
+    """Rough Helvetica advance width, good enough for right-aligning numbers"""
+    return len(str(text)) * size * 0.5
+
+
+class Page:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._ops = []
+
+    def text(self, x, y, value, size=10, bold=False, color=(0, 0, 0)):
+        font = 'F2' if bold else 'F1'
+        self._ops.append(
+            f"BT {_color(color)} rg /{font} {size} Tf {x:.2f} {y:.2f} Td ({_escape(value)}) Tj ET"
+        )
+
+    def text_right(self, x, y, value, size=10, bold=False, color=(0, 0, 0)):
+        self.text(x - text_width(value, size), y, value, size, bold, color)
+
+    def rect(self, x, y, width, height, fill=(0, 0, 0)):
+        self._ops.append(f"{_color(fill)} rg {x:.2f} {y:.2f} {width:.2f} {height:.2f} re f")
+
+    def line(self, x1, y1, x2, y2, width=0.5, color=(0, 0, 0)):
+        self._ops.append(f"{_color(color)} RG {width:.2f} w {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S")
+
+    def content(self):
+        return '\n'.join(self._ops).encode('latin-1')
+
+
+class Document:
+    def __init__(self, size=A4, title=None):
+        self.width, self.height = size
+        self.title = title
+        self.pages = []
+
+    def new_page(self):
+        page = Page(self.width, self.height)
+        self.pages.append(page)
+        return page
+
+    def to_bytes(self):
+        # Object numbers: 1 catalog, 2 pages, 3-4 fonts, 5 info, then
+        # (page, content) pairs
+        objects = {
+            1: b"<< /Type /Catalog /Pages 2 0 R >>",
+            3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+            4: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+            5: f"<< /Title ({_escape(self.title or '')}) /Producer (Toko Kopi Makmur) >>".encode('latin-1'),
+        }
+        kids = []
+        for index, page in enumerate(self.pages or [self.new_page()]):
+            page_number = 6 + 2 * index
+            stream = zlib.compress(page.content())
+            objects[page_number] = (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page.width} {page.height}] "
+                f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {page_number + 1} 0 R >>"
+            ).encode('latin-1')
+            objects[page_number + 1] = (
+                f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode('latin-1')
+                + stream + b"\nendstream"
+            )
+            kids.append(f"{page_number} 0 R")
+        objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode('latin-1')
+
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = {}
+        for number in sorted(objects):
+            offsets[number] = len(out)
+            out += f"{number} 0 obj\n".encode('latin-1') + objects[number] + b"\nendobj\n"
+
+        xref = len(out)
+        size = max(objects) + 1
+        out += f"xref\n0 {size}\n0000000000 65535 f \n".encode('latin-1')
+        for number in range(1, size):
+            out += f"{offsets[number]:010d} 00000 n \n".encode('latin-1')
+        out += (
+            f"trailer\n<< /Size {size} /Root 1 0 R /Info 5 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+        ).encode('latin-1')
+        return bytes(out)
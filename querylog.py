@@ -0,0 +1,244 @@
+"""
+Per-request SQL instrumentation
+get_db_connection() hands out a thin wrapper around the pooled connection
+that times every statement, including the time spent fetching its rows,
+and counts the rows returned. At the end of the request the totals go out
+as a Server-Timing header and one structured log line; statements slower
+than QUERYLOG_SLOW_MS are logged once more with their EXPLAIN QUERY PLAN.
+Streamed bodies (the exports) query after the headers are sent, so only
+the log line includes them.
+
+The wrapper costs two perf_counter() calls per statement and per fetch,
+so it can stay on in production; QUERYLOG_ENABLED=False hands out the
+bare connection again.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+
+from flask import current_app, g, has_request_context, request
+
+DEFAULT_CONFIG = {
+    'QUERYLOG_ENABLED': True,
+    'QUERYLOG_SERVER_TIMING': True,   # Server-Timing: db;dur=..., app;dur=...
+    'QUERYLOG_LOG_REQUESTS': True,    # one JSON line per request on the app.sql logger, INFO
+    'QUERYLOG_SLOW_MS': 200.0,        # statements at least this slow are logged with their plan, 0 disables
+    'QUERYLOG_TOP': 3,                # slowest statements named in the request log line
+}
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class Statement:
+    __slots__ = ('sql', 'params', 'seconds', 'rows')
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.seconds = 0.0
+        self.rows = 0
+
+    def summary(self):
+        return {'ms': round(self.seconds * 1000, 3), 'rows': self.rows, 'sql': ' '.join(self.sql.split())}
+
+
+class RequestStats:
+    """Statements run on behalf of one request"""
+
+    def __init__(self, started=None):
+        self.started = started or time.perf_counter()
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def seconds(self):
+        return sum(s.seconds for s in self.statements)
+
+    @property
+    def rows(self):
+        return sum(s.rows for s in self.statements)
+
+    def slowest(self, n):
+        return sorted(self.statements, key=lambda s: s.seconds, reverse=True)[:n]
+
+
+class TracedCursor:
+    """Cursor proxy that charges fetch time and rows to its statement"""
+
+    def __init__(self, cursor, statement):
+        self._cursor = cursor
+        self._statement = statement
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _fetch(self, method, *args):
+        began = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._statement.seconds += time.perf_counter() - began
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is not None:
+            self._statement.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._fetch(self._cursor.fetchmany, *args)
+        self._statement.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._statement.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self._fetch(self._cursor.__next__)
+        self._statement.rows += 1
+        return row
+
+
+class TracedConnection:
+    """Connection proxy recording each execute() into a RequestStats"""
+
+    def __init__(self, conn, stats):
+        self.raw = conn
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def _run(self, method, sql, params):
+        statement = Statement(sql, params)
+        self.stats.statements.append(statement)
+        began = time.perf_counter()
+        try:
+            cursor = method(sql, params)
+        finally:
+            statement.seconds += time.perf_counter() - began
+        return TracedCursor(cursor, statement)
+
+    def execute(self, sql, params=()):
+        return self._run(self.raw.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        # Parameters of a batch are not kept: they may be a one-shot generator
+        statement = Statement(sql, None)
+        self.stats.statements.append(statement)
+        began = time.perf_counter()
+        try:
+            cursor = self.raw.executemany(sql, seq_of_params)
+        finally:
+            statement.seconds += time.perf_counter() - began
+        return TracedCursor(cursor, statement)
+
+    def executescript(self, script):
+        statement = Statement(script, None)
+        self.stats.statements.append(statement)
+        began = time.perf_counter()
+        try:
+            return self.raw.executescript(script)
+        finally:
+            statement.seconds += time.perf_counter() - began
+
+
+def init_app(app):
+    for key, default in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, default)
+    app.before_request(_start)
+    app.after_request(_add_server_timing)
+    app.teardown_request(_log_request)
+
+
+def traced(conn):
+    """Wrap the request's connection; the bare connection when disabled or outside a request"""
+    if not has_request_context() or not current_app.config['QUERYLOG_ENABLED']:
+        return conn
+    wrapper = g.get('_querylog_conn')
+    if wrapper is None or wrapper.raw is not conn:
+        if '_querylog' not in g:
+            g._querylog = RequestStats(g.get('_querylog_started'))
+        wrapper = g._querylog_conn = TracedConnection(conn, g._querylog)
+    return wrapper
+
+
+def current_stats():
+    """RequestStats of the current request, or None when nothing was traced"""
+    return g.get('_querylog') if has_request_context() else None
+
+
+def server_timing(stats):
+    """Server-Timing value: SQL time with statement and row counts, and time in the app so far"""
+    total = (time.perf_counter() - stats.started) * 1000
+    return (f'db;dur={stats.seconds * 1000:.2f};desc="queries={stats.count} rows={stats.rows}", '
+            f'app;dur={total:.2f}')
+
+
+def _start():
+    if current_app.config['QUERYLOG_ENABLED']:
+        g._querylog_started = time.perf_counter()
+
+
+def _add_server_timing(response):
+    stats = current_stats()
+    if stats is not None:
+        g._querylog_status = response.status_code
+        if current_app.config['QUERYLOG_SERVER_TIMING']:
+            response.headers.add('Server-Timing', server_timing(stats))
+    return response
+
+
+def explain(conn, statement):
+    """EXPLAIN QUERY PLAN details of a statement, or None when it cannot be explained"""
+    if statement.params is None or not statement.sql.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    try:
+        return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + statement.sql, statement.params)]
+    except sqlite3.Error:
+        return None
+
+
+def _log_request(exc=None):
+    # teardown_request: streamed responses have finished by now, and the
+    # connection is still checked out (it goes back in teardown_appcontext)
+    stats = g.pop('_querylog', None)
+    wrapper = g.pop('_querylog_conn', None)
+    if stats is None:
+        return
+    config = current_app.config
+    logger = current_app.logger.getChild('sql')
+
+    threshold = config['QUERYLOG_SLOW_MS'] / 1000
+    # A connection handed back early (login) may already serve another request
+    owned = wrapper is not None and g.get('db') is wrapper.raw
+    if threshold > 0 and owned and logger.isEnabledFor(logging.WARNING):
+        for statement in stats.statements:
+            if statement.seconds >= threshold:
+                entry = dict(statement.summary(), event='slow_query', path=request.path,
+                             plan=explain(wrapper.raw, statement))
+                logger.warning(json.dumps(entry))
+
+    if config['QUERYLOG_LOG_REQUESTS'] and logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({
+            'event': 'request_sql',
+            'method': request.method,
+            'path': request.path,
+            'status': g.pop('_querylog_status', None),
+            'queries': stats.count,
+            'sql_ms': round(stats.seconds * 1000, 3),
+            'rows': stats.rows,
+            'total_ms': round((time.perf_counter() - stats.started) * 1000, 3),
+            'slowest': [s.summary() for s in stats.slowest(config['QUERYLOG_TOP'])],
+            'error': type(exc).__name__ if exc is not None else None,
+        }))
@@ -0,0 +1,344 @@
+"""
+Background PDF reports
+A report request is keyed by its date range and the data_version it was
+asked at. The first request claims the job by creating its status file;
+a local process pool renders the PDF and stores it next to the status
+file in REPORT_DIR. Every later request for the same key, from any
+gunicorn worker, reads the status file and is served the cached PDF.
+Nothing leaves the machine: no broker, just files and child processes.
+
+Status files hold {'state': queued|running|done|failed, ...} and are
+written atomically, so pollers never see half a file.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+
+import aggregates
+import exports
+import filters
+import pdf
+
+DEFAULT_CONFIG = {
+    'REPORT_DIR': 'reports_cache',
+    'REPORT_MAX_WORKERS': 2,        # concurrent renders per web worker
+    'REPORT_MAX_PENDING': 8,        # queued + running jobs per web worker
+    'REPORT_JOB_TIMEOUT': 300.0,    # seconds before an unfinished job counts as lost
+    'REPORT_CACHE_FILES': 50,       # rendered PDFs kept on disk
+}
+
+JOB_ID = re.compile(r'^[0-9a-f]{24}$')
+
+GREEN = (0.098, 0.529, 0.329)
+RED = (0.863, 0.208, 0.271)
+GREY = (0.4, 0.4, 0.4)
+
+
+class ReportBusy(Exception):
+    """Raised when this worker already has REPORT_MAX_PENDING jobs in flight"""
+
+
+def init_app(app):
+    for key, default in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, default)
+
+
+def job_key(start, end, version):
+    raw = f"{start or ''}|{end or ''}|{version}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+
+def valid_job_id(job_id):
+    return bool(JOB_ID.match(job_id or ''))
+
+
+def _paths(directory, job_id):
+    base = os.path.join(directory, job_id)
+    return base + '.json', base + '.pdf'
+
+
+def _atomic_write(path, data):
+    directory = os.path.dirname(path) or '.'
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def read_status(directory, job_id):
+    status_path, pdf_path = _paths(directory, job_id)
+    try:
+        with open(status_path, 'r') as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if status.get('state') == 'done' and not os.path.exists(pdf_path):
+        return None
+    return status
+
+
+def write_status(directory, job_id, **fields):
+    status = read_status(directory, job_id) or {}
+    status.update(fields, job_id=job_id, updated=time.time())
+    _atomic_write(_paths(directory, job_id)[0], json.dumps(status).encode())
+    return status
+
+
+def pdf_path(directory, job_id):
+    return _paths(directory, job_id)[1]
+
+
+# Per-process executor; recreated after a fork like the connection pool
+_executor = None
+_executor_pid = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _get_executor(max_workers):
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        # spawn, not fork: the web worker has threads and open connections
+        _executor = ProcessPoolExecutor(max_workers=max_workers,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        _executor_pid = os.getpid()
+        _pending.clear()
+    return _executor
+
+
+def _is_live(status, timeout):
+    if status['state'] == 'done':
+        return True
+    if status['state'] in ('queued', 'running'):
+        return time.time() - status.get('updated', 0) < timeout
+    return False
+
+
+def _claim(directory, job_id, fields):
+    """Create the status file; exactly one worker becomes the owner.
+
+    The JSON is written to a temp file first and hard-linked into place,
+    which fails if the name exists, so readers never see a half-written
+    status the way they could between an O_EXCL create and its write.
+    """
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(dict(fields, job_id=job_id), f)
+        os.link(tmp, _paths(directory, job_id)[0])
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(tmp)
+    return True
+
+
+def submit(database, start, end, version, download_name):
+    """Return the job status for a report, enqueueing a render if needed.
+
+    Raises ReportBusy when this worker is at REPORT_MAX_PENDING.
+    """
+    config = current_app.config
+    directory = config['REPORT_DIR']
+    os.makedirs(directory, exist_ok=True)
+    job_id = job_key(start, end, version)
+
+    status = read_status(directory, job_id)
+    if status and _is_live(status, config['REPORT_JOB_TIMEOUT']):
+        return status
+
+    with _lock:
+        executor = _get_executor(config['REPORT_MAX_WORKERS'])
+        if len(_pending) >= config['REPORT_MAX_PENDING']:
+            raise ReportBusy(job_id)
+
+        fields = {'state': 'queued', 'start': start, 'end': end, 'version': version,
+                  'download_name': download_name, 'created': time.time(), 'updated': time.time()}
+        if status is None and _claim(directory, job_id, fields):
+            status = dict(fields, job_id=job_id)
+        else:
+            if status is None:
+                # Lost the race for a new job, or its PDF was pruned
+                current = read_status(directory, job_id)
+                if current is not None and _is_live(current, config['REPORT_JOB_TIMEOUT']):
+                    return current
+            # Failed, lost or pruned job: take it over
+            status = write_status(directory, job_id, error=None, **fields)
+
+        future = executor.submit(render_job, os.path.abspath(database), os.path.abspath(directory),
+                                 job_id, start, end)
+        _pending.add(future)
+        future.add_done_callback(lambda f: _pending.discard(f))
+
+    prune(directory, config['REPORT_CACHE_FILES'], config['REPORT_JOB_TIMEOUT'])
+    return status
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def prune(directory, keep, timeout):
+    """Keep the newest ``keep`` reports; drop status files of long-dead jobs"""
+    names = os.listdir(directory)
+    pdfs = sorted((os.path.join(directory, n) for n in names if n.endswith('.pdf')),
+                  key=os.path.getmtime, reverse=True)
+    for path in pdfs[keep:]:
+        _remove(path)
+        _remove(path[:-4] + '.json')
+
+    cutoff = time.time() - 2 * timeout
+    for name in names:
+        path = os.path.join(directory, name)
+        if name.endswith('.json') and not os.path.exists(path[:-5] + '.pdf') \
+                and os.path.exists(path) and os.path.getmtime(path) < cutoff:
+            _remove(path)
+
+
+def render_job(database, directory, job_id, start, end):
+    """Child-process entry point: render one report to REPORT_DIR"""
+    write_status(directory, job_id, state='running', pid=os.getpid())
+    try:
+        conn = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            document = render_report(conn, start, end)
+        finally:
+            conn.close()
+        data = document.to_bytes()
+        _atomic_write(pdf_path(directory, job_id), data)
+        write_status(directory, job_id, state='done', size=len(data))
+    except Exception as e:
+        write_status(directory, job_id, state='failed', error=str(e))
+
+
+def rupiah(amount):
+    return 'Rp ' + f"{round(amount or 0):,}".replace(',', '.')
+
+
+def _period_label(start, end):
+    first = date.fromisoformat(start).strftime('%d/%m/%Y') if start else None
+    last = (date.fromisoformat(end) - timedelta(days=1)).strftime('%d/%m/%Y') if end else None
+    if first and last:
+        return f"{first} s/d {last}"
+    if first:
+        return f"sejak {first}"
+    if last:
+        return f"s/d {last}"
+    return 'Semua periode'
+
+
+def render_report(conn, start, end):
+    """Build the laporan PDF for [start, end): totals, chart, categories, rows"""
+    where, params = filters.range_filter(start, end)
+    totals = {row['tipe']: row['total'] for row in conn.execute(
+        f"SELECT tipe, SUM(total) AS total FROM daily_rollups WHERE {where} GROUP BY tipe", params
+    )}
+    categories = conn.execute(
+        f"""
+        SELECT kategori, SUM(total) AS total FROM daily_rollups
+        WHERE tipe = 'pengeluaran' AND {where}
+        GROUP BY kategori ORDER BY total DESC
+        """, params
+    ).fetchall()
+
+    bounds = conn.execute(
+        f"SELECT MIN(tanggal), MAX(tanggal) FROM daily_rollups WHERE {where}", params
+    ).fetchone()
+    series = None
+    if bounds[0]:
+        first = start or bounds[0]
+        stop = end or (date.fromisoformat(bounds[1]) + timedelta(days=1)).isoformat()
+        span = date.fromisoformat(stop) - date.fromisoformat(first)
+        series = aggregates.period_series(conn, first, stop, 'day' if span.days <= 31 else 'month')
+
+    document = pdf.Document(title='Laporan Cashflow Toko Kopi Makmur')
+    page = document.new_page()
+    top = page.height - 60
+    page.text(40, top, 'Laporan Cashflow Toko Kopi Makmur', size=16, bold=True)
+    page.text(40, top - 20, f"Periode: {_period_label(start, end)}", size=10, color=GREY)
+    page.text(40, top - 34, f"Dibuat: {datetime.now().strftime('%d/%m/%Y %H:%M')}", size=8, color=GREY)
+
+    revenue = totals.get('pendapatan') or 0
+    expense = totals.get('pengeluaran') or 0
+    y = top - 70
+    for label, value, color in (('Pendapatan', revenue, GREEN), ('Pengeluaran', expense, RED),
+                                ('Laba bersih', revenue - expense, (0, 0, 0))):
+        page.text(40, y, label, size=10)
+        page.text_right(300, y, rupiah(value), size=10, bold=True, color=color)
+        y -= 16
+
+    y -= 10
+    if series and series.starts:
+        y = _draw_chart(page, series, 40, y - 160, page.width - 80, 150) - 30
+
+    page.text(40, y, 'Pengeluaran per kategori', size=12, bold=True)
+    y -= 18
+    for row in categories:
+        share = (row['total'] / expense * 100) if expense else 0
+        page.text(50, y, row['kategori'], size=9)
+        page.text_right(400, y, rupiah(row['total']), size=9)
+        page.text_right(470, y, f"{share:.1f}%", size=9, color=GREY)
+        y -= 13
+
+    _draw_transactions(document, conn, where, params)
+    return document
+
+
+def _draw_chart(page, series, x, y, width, height):
+    """Grouped revenue/expense bars; returns the y below the chart"""
+    peak = max(series.revenue + series.expense) or 1
+    slot = width / len(series.starts)
+    bar = max(slot * 0.35, 0.5)
+    page.line(x, y, x + width, y, color=GREY)
+    for i, (rev, exp) in enumerate(zip(series.revenue, series.expense)):
+        left = x + i * slot + slot * 0.15
+        page.rect(left, y, bar, height * rev / peak, fill=GREEN)
+        page.rect(left + bar, y, bar, height * exp / peak, fill=RED)
+        if len(series.starts) <= 31:
+            page.text(left, y - 9, series.labels[i], size=6, color=GREY)
+    page.text_right(x + width, y + height + 4, f"maks {rupiah(peak)}", size=7, color=GREY)
+    return y
+
+
+def _draw_transactions(document, conn, where, params):
+    page = None
+    y = 0
+    for rows in exports.iter_batches(conn, where, params, batch_size=500):
+        for row in rows:
+            if page is None or y < 50:
+                page = document.new_page()
+                y = page.height - 50
+                page.text(40, y, 'Daftar transaksi', size=12, bold=True)
+                y -= 18
+                for col, heading in ((40, 'Tanggal'), (100, 'Tipe'), (170, 'Kategori'), (280, 'Deskripsi')):
+                    page.text(col, y, heading, size=8, bold=True)
+                page.text_right(555, y, 'Jumlah', size=8, bold=True)
+                page.line(40, y - 4, 555, y - 4, color=GREY)
+                y -= 15
+            color = GREEN if row['tipe'] == 'pendapatan' else RED
+            page.text(40, y, row['tanggal'], size=8)
+            page.text(100, y, row['tipe'], size=8, color=color)
+            page.text(170, y, (row['kategori'] or '')[:20], size=8)
+            page.text(280, y, (row['deskripsi'] or '')[:42], size=8)
+            page.text_right(555, y, rupiah(row['jumlah']), size=8)
+            y -= 14
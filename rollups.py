@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Daily rollups of the transactions table for Toko Kopi Makmur
+daily_rollups holds one row per (tanggal, tipe, kategori) with the summed
+jumlah and the number of transactions. SQLite triggers keep it in step with
+every INSERT/UPDATE/DELETE on transactions inside the same transaction, so
+reports scale with the number of days instead of the number of rows.
+
+Usage:
+    python rollups.py verify  [--database kopi_makmur.db]
+    python rollups.py rebuild [--database kopi_makmur.db]
+"""
+
+import argparse
+import sqlite3
+import sys
+
+DATABASE = 'kopi_makmur.db'
+
+# Differences below this are float noise from repeated add/subtract
+TOLERANCE = 0.005
+
+# One statement per entry; trigger bodies contain semicolons
+DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS daily_rollups (
+        tanggal DATE NOT NULL,
+        tipe TEXT NOT NULL,
+        kategori TEXT NOT NULL,
+        total REAL NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (tanggal, tipe, kategori)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_rollups_insert AFTER INSERT ON transactions
+    BEGIN
+        INSERT INTO daily_rollups (tanggal, tipe, kategori, total, count)
+        VALUES (NEW.tanggal, NEW.tipe, NEW.kategori, NEW.jumlah, 1)
+        ON CONFLICT (tanggal, tipe, kategori)
+        DO UPDATE SET total = total + excluded.total, count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_rollups_delete AFTER DELETE ON transactions
+    BEGIN
+        UPDATE daily_rollups SET total = total - OLD.jumlah, count = count - 1
+        WHERE tanggal = OLD.tanggal AND tipe = OLD.tipe AND kategori = OLD.kategori;
+        DELETE FROM daily_rollups
+        WHERE tanggal = OLD.tanggal AND tipe = OLD.tipe AND kategori = OLD.kategori AND count <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_rollups_update
+    AFTER UPDATE OF tanggal, tipe, kategori, jumlah ON transactions
+    BEGIN
+        UPDATE daily_rollups SET total = total - OLD.jumlah, count = count - 1
+        WHERE tanggal = OLD.tanggal AND tipe = OLD.tipe AND kategori = OLD.kategori;
+        DELETE FROM daily_rollups
+        WHERE tanggal = OLD.tanggal AND tipe = OLD.tipe AND kategori = OLD.kategori AND count <= 0;
+        INSERT INTO daily_rollups (tanggal, tipe, kategori, total, count)
+        VALUES (NEW.tanggal, NEW.tipe, NEW.kategori, NEW.jumlah, 1)
+        ON CONFLICT (tanggal, tipe, kategori)
+        DO UPDATE SET total = total + excluded.total, count = count + 1;
+    END
+    """,
+]
+
+RAW_TOTALS_SQL = """
+    SELECT tanggal, tipe, kategori, SUM(jumlah) AS total, COUNT(*) AS count
+    FROM transactions
+    GROUP BY tanggal, tipe, kategori
+"""
+
+
+def create(conn):
+    """Create the rollup table and its triggers if missing"""
+    for statement in DDL:
+        conn.execute(statement)
+
+
+def rebuild(conn):
+    """Recompute every rollup from the raw table; returns the row count.
+
+    Runs inside the caller's transaction when one is open.
+    """
+    conn.execute("DELETE FROM daily_rollups")
+    conn.execute(
+        "INSERT INTO daily_rollups (tanggal, tipe, kategori, total, count) " + RAW_TOTALS_SQL
+    )
+    return conn.execute("SELECT COUNT(*) FROM daily_rollups").fetchone()[0]
+
+
+def verify(conn):
+    """Compare rollups with the raw table.
+
+    Returns a list of (tanggal, tipe, kategori, expected, actual) tuples,
+    where expected/actual are (total, count) or None when the row is missing.
+    """
+    expected = {
+        (row[0], row[1], row[2]): (row[3], row[4])
+        for row in conn.execute(RAW_TOTALS_SQL)
+    }
+    actual = {
+        (row[0], row[1], row[2]): (row[3], row[4])
+        for row in conn.execute("SELECT tanggal, tipe, kategori, total, count FROM daily_rollups")
+    }
+
+    mismatches = []
+    for key in sorted(expected.keys() | actual.keys()):
+        want, got = expected.get(key), actual.get(key)
+        if want is None or got is None or want[1] != got[1] or abs(want[0] - got[0]) > TOLERANCE:
+            mismatches.append(key + (want, got))
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Verify or rebuild the daily_rollups table')
+    parser.add_argument('command', choices=['verify', 'rebuild'])
+    parser.add_argument('--database', default=DATABASE)
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.database)
+    try:
+        if args.command == 'rebuild':
+            with conn:
+                create(conn)
+                count = rebuild(conn)
+            print(f"✅ Rebuilt {count} rollup rows")
+            return 0
+
+        if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_rollups'"
+        ).fetchone():
+            print(f"❌ {args.database} has no daily_rollups table yet")
+            print("Run 'python rollups.py rebuild' to create and fill it")
+            return 2
+
+        mismatches = verify(conn)
+        if not mismatches:
+            print("✅ Rollups match the transactions table")
+            return 0
+
+        print(f"❌ {len(mismatches)} rollup rows differ from the transactions table:")
+        for tanggal, tipe, kategori, want, got in mismatches[:50]:
+            print(f"   {tanggal} {tipe:<12} {kategori:<25} expected={want} actual={got}")
+        print("Run 'python rollups.py rebuild' to repair")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -17,6 +17,7 @@ CREATE TABLE IF NOT EXISTS transactions (
     jumlah REAL NOT NULL,
     user_id INTEGER,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    satuan TEXT,
     FOREIGN KEY (user_id) REFERENCES users (id)
 );
 
@@ -30,8 +31,98 @@ CREATE TABLE IF NOT EXISTS products (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Daily rollups of transactions, kept in sync by the triggers below
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    tanggal DATE NOT NULL,
+    tipe TEXT NOT NULL,
+    kategori TEXT NOT NULL,
+    total REAL NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (tanggal, tipe, kategori)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_rollups_insert AFTER INSERT ON transactions
+BEGIN
+    INSERT INTO daily_rollups (tanggal, tipe, kategori, total, count)
+    VALUES (NEW.tanggal, NEW.tipe, NEW.kategori, NEW.jumlah, 1)
+    ON CONFLICT (tanggal, tipe, kategori)
+    DO UPDATE SET total = total + excluded.total, count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rollups_delete AFTER DELETE ON transactions
+BEGIN
+    UPDATE daily_rollups SET total = total - OLD.jumlah, count = count - 1
+    WHERE tanggal = OLD.tanggal AND tipe = OLD.tipe AND kategori = OLD.kategori;
+    DELETE FROM daily_rollups
+    WHERE tanggal = OLD.tanggal AND tipe = OLD.tipe AND kategori = OLD.kategori AND count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rollups_update
+AFTER UPDATE OF tanggal, tipe, kategori, jumlah ON transactions
+BEGIN
+    UPDATE daily_rollups SET total = total - OLD.jumlah, count = count - 1
+    WHERE tanggal = OLD.tanggal AND tipe = OLD.tipe AND kategori = OLD.kategori;
+    DELETE FROM daily_rollups
+    WHERE tanggal = OLD.tanggal AND tipe = OLD.tipe AND kategori = OLD.kategori AND count <= 0;
+    INSERT INTO daily_rollups (tanggal, tipe, kategori, total, count)
+    VALUES (NEW.tanggal, NEW.tipe, NEW.kategori, NEW.jumlah, 1)
+    ON CONFLICT (tanggal, tipe, kategori)
+    DO UPDATE SET total = total + excluded.total, count = count + 1;
+END;
+
+-- Write counter shared by all workers, bumped by the triggers below
+CREATE TABLE IF NOT EXISTS data_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_version_transactions_insert AFTER INSERT ON transactions
+BEGIN
+    UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_transactions_update AFTER UPDATE ON transactions
+BEGIN
+    UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_transactions_delete AFTER DELETE ON transactions
+BEGIN
+    UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_users_insert AFTER INSERT ON users
+BEGIN
+    UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_users_update AFTER UPDATE ON users
+BEGIN
+    UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_users_delete AFTER DELETE ON users
+BEGIN
+    UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+END;
+
+-- Server-side login sessions; the cookie only carries the id
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER,
+    username TEXT NOT NULL,
+    role TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at);
+
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_transactions_tanggal ON transactions(tanggal);
-CREATE INDEX IF NOT EXISTS idx_transactions_tipe ON transactions(tipe);
+CREATE INDEX IF NOT EXISTS idx_transactions_tipe_tanggal_kategori ON transactions(tipe, tanggal, kategori, jumlah);
+CREATE INDEX IF NOT EXISTS idx_transactions_tanggal_tipe_kategori ON transactions(tanggal, tipe, kategori, jumlah);
 CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions(user_id);
 CREATE INDEX IF NOT EXISTS idx_products_kategori ON products(kategori);
@@ -0,0 +1,241 @@
+"""
+Server-side login sessions
+The session cookie keeps only a random session id plus short-lived values
+such as flash messages. Who is logged in lives in the sessions table, and
+username, role and user_id are resolved on every request from an
+in-process LRU cache with a short TTL, falling back to one indexed lookup.
+The role is always read from the users table, so a demoted or deleted user
+loses access within SESSION_CACHE_TTL on every worker, and straight away
+on the worker that made the change.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, has_app_context
+from flask.sessions import SecureCookieSessionInterface
+
+import db
+
+DEFAULT_CONFIG = {
+    'SESSION_STORE_ENABLED': True,
+    'SESSION_CACHE_SIZE': 1024,          # sessions resolved per worker process
+    'SESSION_CACHE_TTL': 5.0,            # seconds before a cached role is re-read
+    'SESSION_CLEANUP_INTERVAL': 3600.0,  # seconds between purges of expired rows
+}
+
+# Keys resolved from the store; never written into the cookie
+IDENTITY_KEYS = ('username', 'role', 'user_id')
+SID_KEY = '_sid'
+
+LOAD_SQL = """
+    SELECT s.user_id, COALESCE(u.username, s.username) AS username,
+           CASE WHEN s.user_id IS NULL THEN s.role ELSE u.role END AS role
+    FROM sessions s LEFT JOIN users u ON u.id = s.user_id
+    WHERE s.id = ? AND s.expires_at > ?
+"""
+
+
+class IdentityCache:
+    """Thread-safe LRU + TTL map of session id -> identity dict, indexed by user_id"""
+
+    def __init__(self, max_entries=1024, ttl=5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sid):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None or entry[0] <= now:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(sid)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, sid, identity):
+        with self._lock:
+            self._discard(sid)
+            self._entries[sid] = (time.monotonic() + self.ttl, identity)
+            if identity.get('user_id') is not None:
+                self._by_user.setdefault(identity['user_id'], set()).add(sid)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, sid):
+        entry = self._entries.pop(sid, None)
+        if entry is not None:
+            user_sids = self._by_user.get(entry[1].get('user_id'))
+            if user_sids is not None:
+                user_sids.discard(sid)
+                if not user_sids:
+                    del self._by_user[entry[1]['user_id']]
+
+    def discard(self, sid):
+        with self._lock:
+            self._discard(sid)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for sid in list(self._by_user.get(user_id, ())):
+                self._discard(sid)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SessionStore:
+    """Session rows in SQLite, read through an IdentityCache"""
+
+    def __init__(self, cache, cleanup_interval=3600.0):
+        self.cache = cache
+        self.cleanup_interval = cleanup_interval
+        self._last_cleanup = 0.0
+
+    def _run(self, app, work):
+        if has_app_context() and current_app._get_current_object() is app and 'db' in g:
+            # Reuse the connection the request already holds: a second one
+            # per request would exhaust the pool under concurrent logins.
+            # Views commit before changing sessions, and whatever they left
+            # uncommitted is rolled back on teardown anyway, so it must not
+            # ride along on our commit
+            conn = g.db
+            if conn.in_transaction:
+                conn.rollback()
+            return work(conn)
+        # Otherwise borrow one just for this statement: binding it to the
+        # request would pin it until teardown, which a stream delays by minutes
+        pool = db.get_pool(app)
+        conn = pool.acquire()
+        try:
+            return work(conn)
+        finally:
+            pool.release(conn)
+
+    def load(self, app, sid):
+        identity = self.cache.get(sid)
+        if identity is None:
+            row = self._run(app, lambda conn: conn.execute(LOAD_SQL, (sid, time.time())).fetchone())
+            if row is None or row['role'] is None:
+                return None
+            identity = {'username': row['username'], 'role': row['role'], 'user_id': row['user_id']}
+            self.cache.set(sid, identity)
+        return identity
+
+    def create(self, app, identity, lifetime):
+        sid = secrets.token_urlsafe(32)
+        now = time.time()
+
+        def insert(conn):
+            conn.execute(
+                "INSERT INTO sessions (id, user_id, username, role, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (sid, identity.get('user_id'), identity.get('username'), identity.get('role'),
+                 now, now + lifetime)
+            )
+            if now - self._last_cleanup > self.cleanup_interval:
+                self._last_cleanup = now
+                conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            conn.commit()
+        self._run(app, insert)
+        return sid
+
+    def delete(self, app, sid):
+        self.cache.discard(sid)
+
+        def remove(conn):
+            conn.execute("DELETE FROM sessions WHERE id = ?", (sid,))
+            conn.commit()
+        self._run(app, remove)
+
+    def revoke_user(self, app, user_id, delete=False):
+        """Forget a user's cached sessions; with delete, end them outright"""
+        self.cache.discard_user(user_id)
+        if delete:
+            def remove(conn):
+                conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+                conn.commit()
+            self._run(app, remove)
+
+
+class ServerSessionInterface(SecureCookieSessionInterface):
+    """Signed-cookie sessions whose identity keys live in the SessionStore"""
+
+    def open_session(self, app, request):
+        session = super().open_session(app, request)
+        if session is None or not app.config['SESSION_STORE_ENABLED']:
+            return session
+        sid = session.get(SID_KEY)
+        identity = get_store(app).load(app, sid) if sid else None
+        if identity is None:
+            for key in IDENTITY_KEYS:
+                # Identity in a plain signed cookie is not trusted
+                dict.pop(session, key, None)
+            if sid:
+                dict.pop(session, SID_KEY)
+                session.modified = True
+            identity = {}
+        # dict.update: resolving the identity is not a change to save
+        dict.update(session, {k: v for k, v in identity.items() if v is not None})
+        # Remembered apart from the dict: logout clears the session first
+        session.sid = session.get(SID_KEY)
+        session.identity = dict(session_identity(session))
+        return session
+
+    def save_session(self, app, session, response):
+        if not app.config['SESSION_STORE_ENABLED'] or not hasattr(session, 'identity'):
+            return super().save_session(app, session, response)
+
+        identity = session_identity(session)
+        if identity != session.identity:
+            store = get_store(app)
+            if session.sid:
+                store.delete(app, session.sid)
+            dict.pop(session, SID_KEY, None)
+            if identity.get('username'):
+                # A new id on every login or role change: no session fixation
+                lifetime = app.permanent_session_lifetime.total_seconds()
+                dict.__setitem__(session, SID_KEY, store.create(app, identity, lifetime))
+            session.modified = True
+        elif session.sid and session.get(SID_KEY) != session.sid:
+            # Cleared and refilled with the same login
+            dict.__setitem__(session, SID_KEY, session.sid)
+
+        # Serialize without the identity keys, then put them back for the
+        # rest of the request
+        resolved = {key: dict.pop(session, key) for key in IDENTITY_KEYS if key in session}
+        try:
+            super().save_session(app, session, response)
+        finally:
+            dict.update(session, resolved)
+
+
+def session_identity(session):
+    return {key: session[key] for key in IDENTITY_KEYS if session.get(key) is not None}
+
+
+def init_app(app):
+    for key, default in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, db.env_default(key, default))
+    app.extensions['session_store'] = SessionStore(
+        IdentityCache(app.config['SESSION_CACHE_SIZE'], app.config['SESSION_CACHE_TTL']),
+        app.config['SESSION_CLEANUP_INTERVAL'],
+    )
+    app.session_interface = ServerSessionInterface()
+
+
+def get_store(app=None):
+    return (app or current_app).extensions['session_store']
+
+
+def revoke_user(user_id, delete=False):
+    """Call after changing or removing a user, so their sessions are re-read or ended"""
+    get_store().revoke_user(current_app._get_current_object(), int(user_id), delete)
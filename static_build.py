@@ -2,35 +2,166 @@
 """
 Static Build Generator for Toko Kopi Makmur
 This script generates a static version of the Flask app for Netlify deployment
+
+Builds are incremental: dist/.build-manifest.json records, for every output
+file, a hash of its inputs (the builder source, which holds the page
+templates, the database data_version and the date window) and of its
+content. A page is only re-rendered when its inputs changed, and only
+rewritten when its content changed, always via temp file + rename, so an
+unchanged tree finishes without querying the database and a Netlify deploy
+only uploads what actually differs. `--full` wipes dist/ and rebuilds.
+
+History is published as api/shards/<YYYY-MM>.json and <YYYY>.json (daily
+series, category breakdown, totals) with api/shards/index.json listing
+them, so the static dashboard downloads only the period it shows.
 """
 
+import argparse
+import calendar
+import gzip
+import hashlib
 import os
 import shutil
 import sqlite3
+import tempfile
+import time
 from jinja2 import Template
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-def build_static_version():
-    """Generate static HTML files from Flask templates"""
-    
-    print("🏗️ Building static version of Toko Kopi Makmur...")
-    
-    # Create dist directory
-    dist_dir = "dist"
-    if os.path.exists(dist_dir):
-        shutil.rmtree(dist_dir)
-    os.makedirs(dist_dir)
-    
-    # Create subdirectories
-    os.makedirs(f"{dist_dir}/static/css")
-    os.makedirs(f"{dist_dir}/static/js")
-    os.makedirs(f"{dist_dir}/static/images")
-    os.makedirs(f"{dist_dir}/api")
-    
-    # Read database
+try:
+    import brotli
+except ImportError:  # optional: only the .gz siblings are written without it
+    brotli = None
+
+DIST_DIR = "dist"
+DATABASE = "kopi_makmur.db"
+MANIFEST = ".build-manifest.json"
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def inputs_hash(*parts):
+    return content_hash(json.dumps(parts, default=str).encode())
+
+
+def file_hash(path):
+    try:
+        with open(path, "rb") as f:
+            return content_hash(f.read())
+    except OSError:
+        return None
+
+
+def write_atomic(path, data):
+    """Write bytes to path via a temp file in the same directory and a rename"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates 0600; published files must be world-readable
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def source_version(database):
+    """data_version of the database (migration 4), or its file stamps before that migration"""
+    if not os.path.exists(database):
+        return None
     try:
-        conn = sqlite3.connect('kopi_makmur.db')
+        conn = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+        try:
+            return conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+        finally:
+            conn.close()
+    except (sqlite3.Error, TypeError):
+        stamps = []
+        for path in (database, database + "-wal"):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                stamps.append((stat.st_size, stat.st_mtime_ns))
+        return stamps
+
+
+class IncrementalBuild:
+    """Writes outputs under dist_dir, skipping those whose inputs and content are unchanged"""
+
+    def __init__(self, dist_dir):
+        self.dist_dir = dist_dir
+        self.manifest_path = os.path.join(dist_dir, MANIFEST)
+        try:
+            with open(self.manifest_path, "r") as f:
+                self.previous = json.load(f).get("outputs", {})
+        except (OSError, ValueError):
+            self.previous = {}
+        self.outputs = {}
+        self.written = []
+        self.unchanged = []
+
+    def output(self, name, inputs, render):
+        """Produce dist_dir/name from render() unless ``inputs`` match the last build"""
+        path = os.path.join(self.dist_dir, name)
+        entry = self.previous.get(name)
+        if entry and entry["inputs"] == inputs and file_hash(path) == entry["sha256"]:
+            self.outputs[name] = entry
+            self.unchanged.append(name)
+            return
+        data = render()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        digest = content_hash(data)
+        if file_hash(path) == digest:
+            self.unchanged.append(name)
+        else:
+            write_atomic(path, data)
+            self.written.append(name)
+        self.outputs[name] = {"inputs": inputs, "sha256": digest}
+
+    def group(self, prefix, inputs, render):
+        """output() for a set of files whose names are only known once rendered.
+
+        ``render`` returns {name: content}; it is not called when every file
+        the last build wrote under ``prefix`` is intact with the same inputs.
+        """
+        previous = {name: entry for name, entry in self.previous.items() if name.startswith(prefix)}
+        if previous and all(
+            entry["inputs"] == inputs and file_hash(os.path.join(self.dist_dir, name)) == entry["sha256"]
+            for name, entry in previous.items()
+        ):
+            self.outputs.update(previous)
+            self.unchanged.extend(previous)
+            return
+        for name, data in render().items():
+            self.output(prefix + name, inputs, lambda data=data: data)
+
+    def finish(self):
+        """Remove outputs the build no longer produces and save the manifest"""
+        removed = []
+        for name in self.previous:
+            if name not in self.outputs:
+                path = os.path.join(self.dist_dir, name)
+                if os.path.exists(path):
+                    os.remove(path)
+                removed.append(name)
+        data = json.dumps({"outputs": self.outputs}, indent=2, sort_keys=True)
+        write_atomic(self.manifest_path, data.encode())
+        return removed
+
+
+def load_dashboard_data(database=DATABASE):
+    """Last-30-days totals and the latest transactions"""
+    try:
+        if not os.path.exists(database):
+            raise FileNotFoundError(database)
+        conn = sqlite3.connect(database)
         conn.row_factory = sqlite3.Row
         
         # Get dashboard data
@@ -60,15 +191,8 @@ def build_static_version():
         total_expense = 0
         recent_transactions = []
     
-    # Copy static files
-    try:
-        if os.path.exists("static"):
-            shutil.copytree("static", f"{dist_dir}/static", dirs_exist_ok=True)
-    except Exception as e:
-        print(f"⚠️ Static files copy error: {e}")
-    
     # Generate sample data for static version
-    sample_data = {
+    return {
         "total_revenue": total_revenue,
         "total_expense": total_expense,
         "profit": total_revenue - total_expense,
@@ -76,19 +200,68 @@ def build_static_version():
         "total_transactions": len(recent_transactions),
         "recent_transactions": [dict(row) for row in recent_transactions]
     }
+
+
+def static_files(source="static"):
+    """Relative paths of every file under the static/ directory"""
+    for root, _, files in os.walk(source):
+        for filename in files:
+            yield os.path.relpath(os.path.join(root, filename), source)
+
+
+def build_static_version(dist_dir=DIST_DIR, database=DATABASE, full=False):
+    """Generate static HTML files from Flask templates"""
+    
+    print("🏗️ Building static version of Toko Kopi Makmur...")
+    started = time.perf_counter()
+    
+    if full and os.path.exists(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(f"{dist_dir}/api", exist_ok=True)
+    
+    build = IncrementalBuild(dist_dir)
+    with open(os.path.abspath(__file__), "rb") as f:
+        # The page templates live in this file
+        builder = content_hash(f.read())
+    # Data pages depend on the rows and on the "last 30 days" window
+    data_inputs = inputs_hash(builder, source_version(database), date.today().isoformat())
+    
+    data = {}
+    def dashboard_data():
+        # Only queried when a data page is out of date
+        if not data:
+            data.update(load_dashboard_data(database))
+        return data
+    
+    # Copy static files
+    try:
+        for name in static_files():
+            source = os.path.join("static", name)
+            with open(source, "rb") as f:
+                content = f.read()
+            build.output(os.path.join("static", name), content_hash(content), lambda: content)
+    except Exception as e:
+        print(f"⚠️ Static files copy error: {e}")
     
     # Generate static pages
-    generate_index_page(dist_dir, sample_data)
-    generate_dashboard_page(dist_dir, sample_data)
-    generate_api_endpoints(dist_dir, sample_data)
-    generate_404_page(dist_dir)
+    build.output("index.html", data_inputs, lambda: render_index_page(dashboard_data()))
+    build.output("dashboard.html", data_inputs, lambda: render_dashboard_page(dashboard_data()))
+    for name in API_ENDPOINTS:
+        build.output(f"api/{name}", data_inputs, lambda name=name: render_api_endpoints(dashboard_data())[name])
+    # History shards only change with the data, not with the date
+    build.group("api/shards/", inputs_hash(builder, source_version(database)),
+                lambda: render_shards(load_daily_rows(database)))
+    build.output("404.html", inputs_hash(builder), render_404_page)
+    removed = build.finish()
     
-    print(f"✅ Static version built successfully in '{dist_dir}/' directory")
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"✅ Static version built in '{dist_dir}/': {len(build.written)} written, "
+          f"{len(build.unchanged)} unchanged, {len(removed)} removed ({elapsed:.1f} ms)")
     print(f"📁 Open {dist_dir}/index.html in your browser to view")
     
-    return dist_dir
+    return build
 
-def generate_index_page(dist_dir, data):
+def render_index_page(data):
     """Generate static index page"""
     
     index_html = """<!DOCTYPE html>
@@ -293,12 +466,9 @@ def generate_index_page(dist_dir, data):
     
     # Render template with data
     template = Template(index_html)
-    html_content = template.render(data=data)
-    
-    with open(f"{dist_dir}/index.html", "w", encoding="utf-8") as f:
-        f.write(html_content)
+    return template.render(data=data)
 
-def generate_dashboard_page(dist_dir, data):
+def render_dashboard_page(data):
     """Generate static dashboard page"""
     
     dashboard_html = """<!DOCTYPE html>
@@ -495,23 +665,69 @@ def generate_dashboard_page(dist_dir, data):
                             {% endif %}
                         </div>
                     </div>
+                    
+                    <!-- History (api/shards, fetched on demand) -->
+                    <div class="card mt-4">
+                        <div class="card-header d-flex justify-content-between align-items-center">
+                            <h5 class="mb-0">Riwayat Cashflow</h5>
+                            <select id="historyPeriod" class="form-select form-select-sm w-auto"></select>
+                        </div>
+                        <div class="card-body" id="historyBody">
+                            <p class="text-muted mb-0">Memuat riwayat...</p>
+                        </div>
+                    </div>
                 </div>
             </div>
         </div>
     </div>
     
     <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js"></script>
+    <script>
+        // Satu shard per bulan/tahun; hanya shard yang dipilih yang diunduh
+        const rupiah = n => 'Rp ' + Math.round(n).toLocaleString('id-ID');
+        const historyPeriod = document.getElementById('historyPeriod');
+        const historyBody = document.getElementById('historyBody');
+        
+        async function showShard(entry) {
+            const shard = await (await fetch(entry.path)).json();
+            const rows = shard.categories.map(c =>
+                `<tr><td>${c.kategori}</td><td>${c.tipe}</td><td>${c.count}</td><td>${rupiah(c.total)}</td></tr>`
+            ).join('');
+            historyBody.innerHTML = `
+                <p>Pemasukan <strong>${rupiah(shard.totals.revenue)}</strong> &middot;
+                   Pengeluaran <strong>${rupiah(shard.totals.expense)}</strong> &middot;
+                   Laba <strong>${rupiah(shard.totals.profit)}</strong> &middot;
+                   ${shard.totals.count} transaksi</p>
+                <div class="table-responsive"><table class="table table-sm">
+                    <thead><tr><th>Kategori</th><th>Tipe</th><th>Transaksi</th><th>Total</th></tr></thead>
+                    <tbody>${rows}</tbody>
+                </table></div>`;
+        }
+        
+        fetch('api/shards/index.json').then(r => r.json()).then(index => {
+            const entries = {...index.months, ...index.years};
+            const periods = Object.keys(entries).sort().reverse();
+            if (!periods.length) {
+                historyBody.innerHTML = '<p class="text-muted mb-0">Belum ada transaksi</p>';
+                return;
+            }
+            historyPeriod.innerHTML = periods.map(p => `<option value="${p}">${p}</option>`).join('');
+            historyPeriod.addEventListener('change', () => showShard(entries[historyPeriod.value]));
+            showShard(entries[periods[0]]);
+        }).catch(() => {
+            historyBody.innerHTML = '<p class="text-muted mb-0">Riwayat tidak tersedia</p>';
+        });
+    </script>
 </body>
 </html>"""
     
     # Render template with data
     template = Template(dashboard_html)
-    html_content = template.render(data=data)
-    
-    with open(f"{dist_dir}/dashboard.html", "w", encoding="utf-8") as f:
-        f.write(html_content)
+    return template.render(data=data)
 
-def generate_api_endpoints(dist_dir, data):
+API_ENDPOINTS = ("dashboard-stats.json", "recent-transactions.json")
+
+def render_api_endpoints(data):
     """Generate static API endpoints"""
     
     # Dashboard stats API
@@ -523,18 +739,126 @@ def generate_api_endpoints(dist_dir, data):
         "margin": float(data["profit_margin"])
     }
     
-    with open(f"{dist_dir}/api/dashboard-stats.json", "w") as f:
-        json.dump(stats_api, f, indent=2)
-    
     # Recent transactions API
     transactions_api = {
         "recent_transactions": data["recent_transactions"]
     }
     
-    with open(f"{dist_dir}/api/recent-transactions.json", "w") as f:
-        json.dump(transactions_api, f, indent=2, default=str)
+    return {
+        "dashboard-stats.json": json.dumps(stats_api, indent=2),
+        "recent-transactions.json": json.dumps(transactions_api, indent=2, default=str),
+    }
+
+def load_daily_rows(database=DATABASE):
+    """(tanggal, tipe, kategori, total, count) per day, from daily_rollups when migrated"""
+    if not os.path.exists(database):
+        return []
+    conn = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+    try:
+        try:
+            return conn.execute(
+                "SELECT tanggal, tipe, kategori, total, count FROM daily_rollups WHERE count > 0 ORDER BY tanggal"
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return conn.execute(
+                "SELECT tanggal, tipe, kategori, SUM(jumlah), COUNT(*) FROM transactions "
+                "GROUP BY tanggal, tipe, kategori ORDER BY tanggal"
+            ).fetchall()
+    finally:
+        conn.close()
+
+
+def _number(value):
+    # 15000.0 -> 15000: whole rupiah amounts without the trailing ".0"
+    value = round(value or 0, 2)
+    return int(value) if value == int(value) else value
+
+
+def _period_days(period):
+    """First day and length of a "YYYY" or "YYYY-MM" period"""
+    if len(period) == 4:
+        year = int(period)
+        return date(year, 1, 1), 366 if calendar.isleap(year) else 365
+    year, month = int(period[:4]), int(period[5:7])
+    return date(year, month, 1), calendar.monthrange(year, month)[1]
+
 
-def generate_404_page(dist_dir):
+def build_shards(rows):
+    """Per month and per year: daily series, category breakdown and totals"""
+    periods = {}
+    for tanggal, tipe, kategori, total, count in rows:
+        day = str(tanggal)[:10]
+        try:
+            date.fromisoformat(day)
+        except ValueError:
+            continue
+        for period in (day[:7], day[:4]):
+            shard = periods.setdefault(period, {"days": {}, "categories": {}})
+            daily = shard["days"].setdefault(day, [0.0, 0.0, 0])
+            daily[0 if tipe == "pendapatan" else 1] += total or 0
+            daily[2] += count
+            category = shard["categories"].setdefault((tipe, kategori), [0.0, 0])
+            category[0] += total or 0
+            category[1] += count
+
+    shards = {}
+    for period, shard in sorted(periods.items()):
+        start, length = _period_days(period)
+        series = {"revenue": [0] * length, "expense": [0] * length, "count": [0] * length}
+        for day, (revenue, expense, count) in shard["days"].items():
+            i = (date.fromisoformat(day) - start).days
+            series["revenue"][i] = _number(revenue)
+            series["expense"][i] = _number(expense)
+            series["count"][i] = count
+        revenue = sum(v[0] for v in shard["days"].values())
+        expense = sum(v[1] for v in shard["days"].values())
+        shards[period] = {
+            "period": period,
+            "start": start.isoformat(),
+            "daily": series,
+            "categories": [
+                {"tipe": tipe, "kategori": kategori, "total": _number(total), "count": count}
+                for (tipe, kategori), (total, count)
+                in sorted(shard["categories"].items(), key=lambda item: -item[1][0])
+            ],
+            "totals": {
+                "revenue": _number(revenue),
+                "expense": _number(expense),
+                "profit": _number(revenue - expense),
+                "count": sum(v[2] for v in shard["days"].values()),
+            },
+        }
+    return shards
+
+
+def compressed_siblings(name, data):
+    """name -> data plus .gz (and .br with the brotli package) for servers that serve them as-is"""
+    files = {name: data, name + ".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        files[name + ".br"] = brotli.compress(data)
+    return files
+
+
+def render_shards(rows):
+    """api/shards/<period>.json for every month and year, plus index.json to find them"""
+    files = {}
+    index = {"months": {}, "years": {}}
+    for period, shard in build_shards(rows).items():
+        name = f"{period}.json"
+        data = json.dumps(shard, separators=(",", ":")).encode()
+        files.update(compressed_siblings(name, data))
+        index["years" if len(period) == 4 else "months"][period] = {
+            "path": f"api/shards/{name}",
+            "sha256": content_hash(data)[:16],
+            "bytes": len(data),
+            "totals": shard["totals"],
+        }
+    data = json.dumps(index, separators=(",", ":")).encode()
+    files.update(compressed_siblings("index.json", data))
+    return files
+
+
+def render_404_page():
     """Generate 404 error page"""
     
     error_404 = """<!DOCTYPE html>
@@ -568,8 +892,16 @@ def generate_404_page(dist_dir):
 </body>
 </html>"""
     
-    with open(f"{dist_dir}/404.html", "w", encoding="utf-8") as f:
-        f.write(error_404)
+    return error_404
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static Netlify version")
+    parser.add_argument("--dist", default=DIST_DIR, help="output directory")
+    parser.add_argument("--database", default=DATABASE)
+    parser.add_argument("--full", action="store_true", help="wipe the output directory and rebuild everything")
+    args = parser.parse_args(argv)
+    build_static_version(args.dist, args.database, args.full)
+    return 0
 
 if __name__ == "__main__":
-    build_static_version()
\ No newline at end of file
+    raise SystemExit(main())
\ No newline at end of file
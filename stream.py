@@ -0,0 +1,197 @@
+"""
+Server-Sent Events push channel for the dashboards
+Write routes publish a small change record after they commit; every open
+/api/stream connection in the same worker wakes up and sends one ``update``
+event carrying the changes and fresh dashboard stats. Writes made by other
+workers are noticed through the shared data_version counter, which each
+worker reads at most once per STREAM_POLL_INTERVAL however many
+subscribers it has.
+
+Each subscriber holds a worker thread for up to STREAM_MAX_AGE seconds,
+after which the browser's EventSource reconnects on its own; run gunicorn
+with threaded workers and keep STREAM_MAX_SUBSCRIBERS below the thread
+count so ordinary requests are still served.
+"""
+
+import json
+import queue
+import threading
+import time
+
+from flask import current_app
+
+from cache import data_version
+
+DEFAULT_CONFIG = {
+    'STREAM_MAX_SUBSCRIBERS': 8,      # per worker process
+    'STREAM_QUEUE_SIZE': 16,          # pending changes per subscriber before the oldest is dropped
+    'STREAM_POLL_INTERVAL': 2.0,      # seconds between data_version reads for other workers' writes
+    'STREAM_KEEPALIVE': 15.0,         # seconds of silence before a comment line is sent
+    'STREAM_MAX_AGE': 300.0,          # seconds before the server ends the stream
+    'STREAM_RETRY_MS': 3000,          # reconnect delay advertised to EventSource
+}
+
+
+class Subscriber:
+    """One open stream: a bounded queue of change records"""
+
+    def __init__(self, max_pending):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+
+    def offer(self, change):
+        # A slow client must not grow memory without bound: drop the oldest
+        # change and let the next update tell it to resync
+        while True:
+            try:
+                self.queue.put_nowait(change)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def drain(self, first=None):
+        changes = [first] if first is not None else []
+        while True:
+            try:
+                changes.append(self.queue.get_nowait())
+            except queue.Empty:
+                return changes
+
+
+class Broadcaster:
+    """Per-process fan-out of change records to a capped set of subscribers"""
+
+    def __init__(self, max_subscribers=8, max_pending=16, poll_interval=2.0):
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self.published = 0
+        self.rejected = 0
+
+    def subscribe(self):
+        """Return a new Subscriber, or None when the cap is reached"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            subscriber = Subscriber(self.max_pending)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, change):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._checked_at = 0.0          # the commit just changed data_version
+            self.published += 1
+        for subscriber in subscribers:
+            subscriber.offer(change)
+
+    def current_version(self, read):
+        """data_version, re-read through ``read()`` at most once per poll interval"""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self.poll_interval:
+                return self._version
+        version = read()
+        with self._lock:
+            self._version = version
+            self._checked_at = now
+        return version
+
+    def stats(self):
+        with self._lock:
+            size = len(self._subscribers)
+        return {
+            'subscribers': size,
+            'max_subscribers': self.max_subscribers,
+            'published': self.published,
+            'rejected': self.rejected,
+        }
+
+
+def init_app(app):
+    for key, default in DEFAULT_CONFIG.items():
+        app.config.setdefault(key, default)
+    app.extensions['stream'] = Broadcaster(
+        max_subscribers=app.config['STREAM_MAX_SUBSCRIBERS'],
+        max_pending=app.config['STREAM_QUEUE_SIZE'],
+        poll_interval=app.config['STREAM_POLL_INTERVAL'],
+    )
+
+
+def get_broadcaster():
+    return current_app.extensions['stream']
+
+
+def publish(action, **fields):
+    """Announce a committed write to this worker's subscribers"""
+    get_broadcaster().publish(dict(fields, action=action))
+
+
+def format_event(data, event=None, id=None):
+    lines = []
+    if id is not None:
+        lines.append(f"id: {id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def event_stream(subscriber, pool, snapshot, version):
+    """Yield SSE text for one subscriber until STREAM_MAX_AGE elapses.
+
+    ``pool`` is the connection pool; a connection is borrowed only for the
+    version check and the snapshot, never for the life of the stream.
+    ``snapshot(conn)`` returns the stats dict sent with each update.
+    """
+    config = current_app.config
+    broadcaster = get_broadcaster()
+
+    def with_conn(fn):
+        conn = pool.acquire()
+        try:
+            return fn(conn)
+        finally:
+            pool.release(conn)
+
+    started = last_sent = time.monotonic()
+    try:
+        yield f"retry: {config['STREAM_RETRY_MS']}\n"
+        yield format_event({'version': version}, event='ready', id=version)
+
+        while time.monotonic() - started < config['STREAM_MAX_AGE']:
+            try:
+                first = subscriber.queue.get(timeout=config['STREAM_POLL_INTERVAL'])
+            except queue.Empty:
+                first = None
+            changes = subscriber.drain(first)
+
+            current = broadcaster.current_version(lambda: with_conn(data_version))
+            if current != version:
+                version = current
+                dropped, subscriber.dropped = subscriber.dropped, 0
+                yield format_event({
+                    'version': version,
+                    'changes': changes,
+                    'resync': bool(dropped),
+                    'stats': with_conn(snapshot),
+                }, event='update', id=version)
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= config['STREAM_KEEPALIVE']:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+    finally:
+        broadcaster.unsubscribe(subscriber)
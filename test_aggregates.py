@@ -0,0 +1,126 @@
+"""
+Tests for the single-pass dashboard aggregates
+"""
+
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import aggregates
+
+
+def _insert(conn, rows):
+    conn.executemany(
+        "INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah, user_id) VALUES (?, ?, ?, 'x', ?, 1)",
+        rows
+    )
+    conn.commit()
+
+
+def test_month_starts_walks_calendar_months():
+    starts = aggregates.month_starts(datetime(2025, 3, 31), 4)
+    assert [s.isoformat() for s in starts] == ['2024-12-01', '2025-01-01', '2025-02-01', '2025-03-01']
+
+
+def test_dashboard_aggregates_matches_per_month_sums(database):
+    conn = sqlite3.connect(database)
+    conn.row_factory = sqlite3.Row
+    _insert(conn, [
+        ('2025-01-15', 'pendapatan', 'Penjualan', 100),   # outside the window
+        ('2025-02-01', 'pendapatan', 'Penjualan', 200),
+        ('2025-02-28', 'pengeluaran', 'Barang', 50),
+        ('2025-06-03', 'pendapatan', 'Penjualan', 300),
+        ('2025-07-10', 'pengeluaran', 'Bahan Pokok', 40),
+        ('2025-07-11', 'pengeluaran', 'Barang', 60),
+        ('2025-07-20', 'pengeluaran', 'Bahan Pokok', 30),
+        ('2025-08-02', 'pendapatan', 'Penjualan', 10),     # future-dated, counted in July
+    ])
+    stats = aggregates.dashboard_aggregates(conn, datetime(2025, 7, 21))
+
+    assert stats.labels('%Y-%m') == ['2025-02', '2025-03', '2025-04', '2025-05', '2025-06', '2025-07']
+    assert stats.revenue_series == [200.0, 0.0, 0.0, 0.0, 300.0, 10.0]
+    assert stats.expense_series == [50.0, 0.0, 0.0, 0.0, 0.0, 130.0]
+    assert stats.profit_series == [150.0, 0.0, 0.0, 0.0, 300.0, -120.0]
+    assert stats.current.count == 4
+    assert [(c.kategori, c.total, c.count) for c in stats.categories] == [
+        ('Bahan Pokok', 70.0, 2), ('Barang', 60.0, 1)
+    ]
+
+
+def test_trend_endpoint_uses_grouped_query(client):
+    response = client.get('/api/cashflow-trend')
+    body = response.get_json()
+    assert len(body['labels']) == 6
+    assert body['revenue'] == [0.0] * 6
+
+
+def test_period_series_buckets_by_granularity(database):
+    conn = sqlite3.connect(database)
+    conn.row_factory = sqlite3.Row
+    _insert(conn, [
+        ('2025-01-01', 'pendapatan', 'Penjualan', 10),
+        ('2025-01-06', 'pendapatan', 'Penjualan', 20),
+        ('2025-01-06', 'pengeluaran', 'Barang', 5),
+        ('2025-04-30', 'pengeluaran', 'Jasa', 7),
+        ('2025-12-31', 'pendapatan', 'Penjualan', 1),
+        ('2026-01-01', 'pendapatan', 'Penjualan', 99),   # outside the range
+    ])
+
+    days = aggregates.period_series(conn, '2025-01-01', '2025-02-01', 'day')
+    assert days.labels[:3] == ['1', '2', '3'] and len(days.labels) == 31
+    assert days.revenue[0] == 10.0 and days.revenue[5] == 20.0 and days.expense[5] == 5.0
+
+    weeks = aggregates.period_series(conn, '2025-01-01', '2025-02-01', 'week')
+    assert weeks.labels[:2] == ['W1', 'W2']
+    assert weeks.revenue[:2] == [10.0, 20.0]
+
+    months = aggregates.period_series(conn, '2025-01-01', '2026-01-01', 'month')
+    assert months.labels[0] == 'Jan' and len(months.labels) == 12
+    assert months.revenue[0] == 30.0 and months.expense[3] == 7.0 and months.revenue[11] == 1.0
+
+    quarters = aggregates.period_series(conn, '2025-01-01', '2026-01-01', 'quarter')
+    assert quarters.labels == ['Q1', 'Q2', 'Q3', 'Q4']
+    assert quarters.revenue == [30.0, 0.0, 0.0, 1.0]
+    assert quarters.expense == [5.0, 7.0, 0.0, 0.0]
+
+
+def test_monthly_cashflow_is_dense_and_capped(client):
+    today = date.today()
+    for offset, jumlah in ((0, '100'), (2, '40')):
+        client.post('/cashflow/add', data={
+            'tanggal': (today - timedelta(days=offset)).isoformat(), 'tipe': 'pengeluaran',
+            'kategori': 'Barang', 'deskripsi': 'x', 'jumlah': jumlah
+        })
+
+    body = client.get('/api/monthly-cashflow').get_json()
+    assert body['success'] and body['days'] == 30
+    assert len(body['labels']) == len(body['income']) == len(body['expense']) == 30
+    assert body['dates'][-1] == today.isoformat()
+    assert body['labels'][-1] == today.strftime('%d/%m')
+    assert body['expense'][-1] == 100.0 and body['expense'][-3] == 40.0
+    assert sum(body['expense']) == 140.0 and sum(body['income']) == 0.0
+
+    assert client.get('/api/monthly-cashflow?days=7').get_json()['days'] == 7
+    assert client.get('/api/monthly-cashflow?days=99999').get_json()['days'] == aggregates.MAX_SERIES_DAYS
+    assert client.get('/api/monthly-cashflow?days=abc').get_json()['days'] == 30
+
+
+def test_dashboard_bundle_matches_single_endpoints(client):
+    client.post('/cashflow/add', data={
+        'tanggal': date.today().isoformat(), 'tipe': 'pengeluaran',
+        'kategori': 'Barang', 'deskripsi': 'x', 'jumlah': '25'
+    })
+
+    bundle = client.get('/api/dashboard').get_json()
+    assert set(bundle) == {'success', 'stats', 'distribution', 'trend', 'daily'}
+    assert bundle['stats'] == client.get('/api/dashboard-stats').get_json()
+    assert bundle['distribution'] == client.get('/api/expense-distribution').get_json()
+    assert bundle['trend'] == client.get('/api/cashflow-trend').get_json()
+    daily = client.get('/api/monthly-cashflow').get_json()
+    assert bundle['daily'] == {k: v for k, v in daily.items() if k != 'success'}
+
+    only = client.get('/api/dashboard?fields=stats,daily&days=7').get_json()
+    assert set(only) == {'success', 'stats', 'daily'}
+    assert only['daily']['days'] == 7
+
+    bad = client.get('/api/dashboard?fields=stats,nope')
+    assert bad.status_code == 400
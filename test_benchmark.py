@@ -0,0 +1,56 @@
+"""
+Tests for the route benchmark harness
+"""
+
+import json
+
+import benchmark
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert benchmark.percentile(values, 50) == 50
+    assert benchmark.percentile(values, 99) == 99
+    assert benchmark.percentile([7], 95) == 7
+    assert benchmark.percentile([], 50) is None
+
+
+def test_client_run_writes_comparable_json(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(benchmark, 'DATA_DIR', str(tmp_path / 'data'))
+    output = tmp_path / 'bench.json'
+    args = ['--sizes', '800', '--mode', 'client', '--requests', '6', '--warmup', '1',
+            '--routes', 'api_dashboard_stats', 'cashflow_add', '--output', str(output)]
+    assert benchmark.main(args) == 0
+
+    report = json.loads(output.read_text())
+    (run,) = report['runs']
+    assert run['size'] == 800 and run['mode'] == 'client'
+    rows = {row['route']: row for row in run['results']}
+    assert set(rows) == {'api_dashboard_stats', 'cashflow_add'}
+    for row in rows.values():
+        assert row['requests'] == 6 and row['errors'] == 0
+        assert row['p50_ms'] <= row['p95_ms'] <= row['p99_ms']
+        assert row['queries_per_request'] > 0
+
+    assert benchmark.main(['--compare', str(output), str(output)]) == 0
+    assert 'cashflow_add' in capsys.readouterr().out
+
+
+def test_html_routes_render(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, 'DATA_DIR', str(tmp_path / 'data'))
+    database = benchmark.seed_database(800)
+    html = [route for route in benchmark.ROUTES if not route.write and not route.path.startswith(('/api/', '/export/'))]
+    assert html
+
+    for row in benchmark.run_client(database, html, requests=1, warmup=0):
+        assert row['status_codes'] == {'200': 1}, row['route']
+
+
+def test_errors_are_left_out_of_the_percentiles():
+    route = benchmark.Route('page', '/page')
+    row = benchmark.summarize(route, [0.010, 0.020], {'200': 2, '500:TemplateNotFound': 3}, elapsed=1.0)
+    assert row['requests'] == 5 and row['errors'] == 3
+    assert row['p99_ms'] == 20.0 and row['mean_ms'] == 15.0
+
+    failed = benchmark.summarize(route, [], {'500:TemplateNotFound': 4}, elapsed=1.0)
+    assert failed['errors'] == 4 and failed['p50_ms'] is None
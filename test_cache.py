@@ -0,0 +1,51 @@
+"""
+Tests for the versioned TTL/LRU response cache
+"""
+
+import time
+
+import cache
+
+
+def test_lru_eviction_and_ttl():
+    c = cache.ResponseCache(max_entries=2, ttl=60)
+    c.set('a', 1, 'A')
+    c.set('b', 1, 'B')
+    assert c.get('a', 1) == 'A'          # a is now most recent
+    c.set('c', 1, 'C')                   # evicts b
+    assert c.get('b', 1) is None
+    assert c.evictions == 1
+
+    c.set('short', 1, 'S', ttl=0.01)
+    time.sleep(0.02)
+    assert c.get('short', 1) is None
+
+
+def test_version_change_invalidates():
+    c = cache.ResponseCache()
+    c.set('k', 1, 'old')
+    assert c.get('k', 2) is None
+    assert c.get_or_compute('k', 2, lambda: 'new') == 'new'
+    assert c.get('k', 2) == 'new'
+
+
+def test_api_hits_until_a_write_bumps_the_version(client, flask_app):
+    flask_app.extensions['response_cache'].clear()
+
+    first = client.get('/api/dashboard-stats')
+    second = client.get('/api/dashboard-stats')
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert first.get_json() == second.get_json()
+
+    today = time.strftime('%Y-%m-%d')
+    client.post('/cashflow/add', data={
+        'tanggal': today, 'tipe': 'pendapatan', 'kategori': 'Penjualan', 'deskripsi': 'x', 'jumlah': '500'
+    })
+    third = client.get('/api/dashboard-stats')
+    assert third.headers['X-Cache'] == 'MISS'
+    assert third.get_json()['total_revenue'] == 500.0
+
+    stats = client.get('/api/cache-stats').get_json()
+    assert stats['hits'] >= 1 and stats['misses'] >= 2
+    assert stats['data_version'] > 0
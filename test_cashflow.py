@@ -0,0 +1,99 @@
+"""
+Tests for the /cashflow and /laporan routes' SQL-side totals and summaries
+"""
+
+import sqlite3
+from datetime import date
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """Capture the context passed to render_template instead of rendering"""
+    captured = {}
+
+    def fake_render(name, **context):
+        captured['template'] = name
+        captured.update(context)
+        return name
+
+    monkeypatch.setattr(app_module, 'render_template', fake_render)
+    return captured
+
+
+def _add(client, **form):
+    data = {'tanggal': '2025-03-10', 'tipe': 'pengeluaran', 'kategori': 'Barang',
+            'deskripsi': 'x', 'jumlah': '1'}
+    data.update(form)
+    assert client.post('/cashflow/add', data=data).status_code == 302
+
+
+def test_category_breakdown_groups_quantities_per_unit(client, rendered):
+    _add(client, kategori='Bahan Pokok', jumlah='2', satuan='kg')
+    _add(client, kategori='Bahan Pokok', jumlah='3', satuan='kg')
+    _add(client, kategori='Bahan Pokok', jumlah='1.5', satuan='liter')
+    _add(client, kategori='Jasa', jumlah='100000')
+    _add(client, tipe='pendapatan', kategori='Penjualan', jumlah='50000')
+
+    client.get('/cashflow?month=3&year=2025')
+
+    breakdown = {row['kategori']: row for row in rendered['category_breakdown']}
+    assert breakdown['Bahan Pokok']['total_quantity'] == '5 kg + 1.5 liter'
+    assert breakdown['Bahan Pokok']['total_items'] == 3
+    assert breakdown['Jasa']['total_quantity'] == '-'
+    assert rendered['total_pendapatan'] == 50000
+    assert rendered['total_pengeluaran'] == 100006.5
+
+
+def test_page_links_keep_filters(client, rendered):
+    for _ in range(3):
+        _add(client)
+    client.get('/cashflow?year=2025&page_size=2')
+    assert rendered['prev_url'] is None
+    assert rendered['next_url'].startswith('/cashflow?after=')
+    assert 'year=2025' in rendered['next_url']
+    assert len(rendered['transactions']) == 2
+
+
+@pytest.mark.parametrize('query', ['date_from=abc', 'month=13', 'year=dua-ribu'])
+def test_invalid_filter_falls_back_to_all_rows(client, rendered, query):
+    _add(client, jumlah='7')
+    response = client.get(f'/cashflow?{query}')
+    assert response.status_code == 200
+    assert rendered['total_pengeluaran'] == 7
+    with client.session_transaction() as sess:
+        assert ('error', 'Filter tanggal tidak valid') in sess['_flashes']
+
+
+def test_totals_come_from_the_rollups(client, rendered, database):
+    _add(client, jumlah='5')
+    # A rollup the raw table does not have shows up in the totals
+    conn = sqlite3.connect(database)
+    conn.execute("UPDATE daily_rollups SET total = total + 1000, count = count + 1")
+    conn.commit()
+    conn.close()
+    client.get('/cashflow')
+    assert rendered['total_pengeluaran'] == 1005
+    assert rendered['category_breakdown'][0]['total_items'] == 2
+
+
+def test_month_without_year_means_this_year(client, rendered):
+    this_year = date.today().year
+    _add(client, tanggal=f'{this_year}-03-10', jumlah='5')
+    _add(client, tanggal=f'{this_year - 1}-03-10', jumlah='700')
+    client.get('/cashflow?month=3')
+    assert rendered['total_pengeluaran'] == 5
+
+
+@pytest.mark.parametrize('query', ['month=13', 'year=dua-ribu', 'month=x&year=2025'])
+def test_report_invalid_filter_falls_back_to_all_rows(client, rendered, query):
+    _add(client, tanggal='2023-05-01', jumlah='7')
+    response = client.get(f'/laporan?{query}')
+    assert response.status_code == 200
+    assert rendered['total_pengeluaran'] == 7
+    assert len(rendered['transactions']) == 1
+    with client.session_transaction() as sess:
+        assert ('error', 'Filter tanggal tidak valid') in sess['_flashes']
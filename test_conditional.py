@@ -0,0 +1,73 @@
+"""
+Tests for ETag / Last-Modified conditional responses
+"""
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Count how often the laporan template is rendered"""
+    counter = {'render': 0}
+
+    def fake_render(name, **context):
+        counter['render'] += 1
+        return name
+
+    monkeypatch.setattr(app_module, 'render_template', fake_render)
+    return counter
+
+
+def test_api_revalidates_with_304_until_a_write(client):
+    first = client.get('/api/cashflow-trend')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag.startswith('W/')
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    again = client.get('/api/cashflow-trend', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert 'X-Cache' not in again.headers       # the view and its cache were skipped
+    assert again.headers['ETag'] == etag
+
+    other_args = client.get('/api/cashflow-trend?x=1', headers={'If-None-Match': etag})
+    assert other_args.status_code == 200
+
+    client.post('/cashflow/add', data={
+        'tanggal': '2025-01-02', 'tipe': 'pendapatan', 'kategori': 'Penjualan', 'deskripsi': 'x', 'jumlah': '5'
+    })
+    changed = client.get('/api/cashflow-trend', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_if_modified_since(client):
+    first = client.get('/api/dashboard-stats')
+    since = first.headers['Last-Modified']
+    assert client.get('/api/dashboard-stats', headers={'If-Modified-Since': since}).status_code == 304
+    old = 'Mon, 01 Jan 2001 00:00:00 GMT'
+    assert client.get('/api/dashboard-stats', headers={'If-Modified-Since': old}).status_code == 200
+
+
+def test_html_etag_is_per_user_and_skips_rendering(client, flask_app, calls):
+    first = client.get('/laporan?month=1&year=2025')
+    etag = first.headers['ETag']
+    assert calls['render'] == 1
+
+    assert client.get('/laporan?month=1&year=2025', headers={'If-None-Match': etag}).status_code == 304
+    assert calls['render'] == 1
+
+    other = flask_app.test_client()
+    with other.session_transaction() as sess:
+        sess.update(username='kasir', role='guest')
+    assert other.get('/laporan?month=1&year=2025', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_disabled(client, flask_app):
+    flask_app.config['CONDITIONAL_RESPONSES'] = False
+    try:
+        response = client.get('/api/dashboard-stats')
+        assert 'ETag' not in response.headers
+    finally:
+        flask_app.config['CONDITIONAL_RESPONSES'] = True
@@ -0,0 +1,88 @@
+"""
+Tests for the login limiter, demo-user index and bounded hash pool
+"""
+
+import sqlite3
+
+import pytest
+from flask import Flask, request
+from werkzeug.security import generate_password_hash
+
+import app as app_module
+import credentials
+
+
+@pytest.fixture
+def login_client(flask_app, monkeypatch, database):
+    """Anonymous client with a fresh limiter (burst of 3 per username)"""
+    monkeypatch.setattr(app_module, 'render_template', lambda name, **context: name)
+    config = dict(flask_app.config, LOGIN_USER_BURST=3, LOGIN_USER_PER_MINUTE=1.0)
+    monkeypatch.setitem(flask_app.extensions, 'credentials',
+                        credentials.Credentials(config, app_module.DEMO_USERS))
+    conn = sqlite3.connect(database)
+    conn.execute("INSERT INTO users (username, password, role) VALUES (?, ?, 'user')",
+                 ('kasir', generate_password_hash('rahasia', method='pbkdf2:sha256:1000')))
+    conn.commit()
+    conn.close()
+    return flask_app.test_client()
+
+
+def test_token_bucket_refills_and_stays_bounded():
+    limiter = credentials.TokenBucketLimiter(burst=2, per_minute=60, max_keys=3)
+    assert limiter.take('a', now=0) == 0 and limiter.take('a', now=0) == 0
+    assert limiter.take('a', now=0) == pytest.approx(1.0)
+    assert limiter.take('a', now=1.0) == 0
+
+    for key in 'bcde':
+        limiter.take(key, now=2)
+    assert len(limiter) == 3
+
+
+def test_demo_users_are_indexed():
+    demo = credentials.DemoUsers(app_module.DEMO_USERS)
+    assert demo.authenticate('BagasNz', '162316')['role'] == 'admin'
+    assert demo.authenticate('BagasNz', 'salah') is None
+    assert demo.authenticate('nobody', 'owner') is None
+
+
+def test_hash_pool_refuses_when_full():
+    pool = credentials.HashPool(workers=1, max_pending=0)
+    with pytest.raises(credentials.HashingBusy):
+        pool.verify(generate_password_hash('x', method='pbkdf2:sha256:1000'), 'x')
+    assert pool.refused == 1
+
+
+def test_database_login_goes_through_the_hash_pool(login_client):
+    response = login_client.post('/login', data={'username': 'kasir', 'password': 'rahasia'})
+    assert response.status_code == 302
+    with login_client.session_transaction() as sess:
+        assert sess['username'] == 'kasir' and sess['user_id'] == 2
+
+    wrong = login_client.post('/login', data={'username': 'kasir', 'password': 'salah'})
+    assert wrong.status_code == 200
+
+
+def test_repeated_attempts_are_throttled(login_client):
+    for _ in range(3):
+        assert login_client.post('/login', data={'username': 'kasir', 'password': 'salah'}).status_code == 200
+    throttled = login_client.post('/login', data={'username': 'Kasir', 'password': 'rahasia'})
+    assert throttled.status_code == 429
+    assert int(throttled.headers['Retry-After']) >= 1
+
+
+def test_trusted_proxy_hops_key_the_limiter_on_the_client_address():
+    app = Flask(__name__)
+    app.config['LOGIN_IP_BURST'] = 1
+    credentials.init_app(app)
+    credentials.trust_proxies(app, 1)
+
+    @app.route('/attempt')
+    def attempt():
+        return str(credentials.get_credentials().throttle('kasir-' + request.remote_addr, request.remote_addr))
+
+    client = app.test_client()
+    first = client.get('/attempt', headers={'X-Forwarded-For': '203.0.113.7'})
+    other = client.get('/attempt', headers={'X-Forwarded-For': '203.0.113.8'})
+    again = client.get('/attempt', headers={'X-Forwarded-For': '203.0.113.7'})
+    assert first.text == other.text == '0.0'
+    assert float(again.text) > 0
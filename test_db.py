@@ -0,0 +1,88 @@
+"""
+Tests for the pooled connection layer in db.py
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+import db
+
+
+def test_pool_reuses_connections(database):
+    pool = db.ConnectionPool(database, max_size=2)
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+    assert second is first
+    assert pool.created == 1
+
+
+def test_pool_is_bounded(database):
+    pool = db.ConnectionPool(database, max_size=1, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(db.PoolTimeout):
+        pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+
+def test_release_rolls_back_open_transaction(database):
+    pool = db.ConnectionPool(database, max_size=1)
+    conn = pool.acquire()
+    conn.execute("INSERT INTO users (username, password, role) VALUES ('tmp', 'x', 'user')")
+    pool.release(conn)
+    conn = pool.acquire()
+    assert conn.execute("SELECT COUNT(*) FROM users WHERE username = 'tmp'").fetchone()[0] == 0
+
+
+def test_stale_connection_is_replaced(database):
+    pool = db.ConnectionPool(database, max_size=1, healthcheck_interval=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.close()
+    fresh = pool.acquire()
+    assert fresh is not conn
+    assert fresh.execute('SELECT 1').fetchone()[0] == 1
+
+
+def test_pragmas_applied_to_every_connection(database):
+    pool = db.ConnectionPool(database, max_size=2, pragmas={'cache_size': -4096})
+    a, b = pool.acquire(), pool.acquire()
+    for conn in (a, b):
+        assert conn.execute('PRAGMA cache_size').fetchone()[0] == -4096
+
+
+def test_request_connection_is_shared_and_returned(flask_app):
+    with flask_app.app_context():
+        conn = db.get_db()
+        assert db.get_db() is conn
+        assert isinstance(conn.execute('SELECT 1').fetchone(), sqlite3.Row)
+    pool = db.get_pool(flask_app)
+    assert pool.stats()['idle'] == 1
+
+
+def test_storage_profile_enables_wal(flask_app):
+    with flask_app.app_context():
+        settings = db.storage_settings(db.get_db())
+    assert settings['journal_mode'] == 'wal'
+    assert settings['synchronous'] == 1  # NORMAL
+    assert settings['busy_timeout'] == flask_app.config['DB_BUSY_TIMEOUT']
+    assert settings['cache_size'] == -flask_app.config['DB_CACHE_SIZE_KB']
+    assert settings['temp_store'] == 2  # MEMORY
+
+
+def test_checkpoint_runs_after_interval(database):
+    pool = db.ConnectionPool(database, max_size=1, checkpoint_interval=0.001)
+    conn = pool.acquire()
+    conn.execute('PRAGMA journal_mode = WAL')
+    time.sleep(0.01)
+    pool.release(conn)
+    assert pool.checkpoints == 1
+
+
+def test_db_status_endpoint(client):
+    response = client.get('/api/db-status')
+    assert response.status_code == 200
+    assert response.get_json()['settings']['journal_mode'] == 'wal'
@@ -0,0 +1,85 @@
+"""
+Tests for the streaming CSV / XLSX exports
+"""
+
+import csv
+import io
+import sqlite3
+import zipfile
+import xml.etree.ElementTree as ET
+
+import exports
+
+NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def _seed(database):
+    conn = sqlite3.connect(database)
+    conn.executemany(
+        "INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah, satuan, user_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, 1)",
+        [
+            ('2025-02-28', 'pengeluaran', 'Barang', 'Gelas <plastik> & tutup', 1500, 'pcs'),
+            ('2025-03-01', 'pendapatan', 'Penjualan', 'Kopi susu, "gula aren"', 25000, None),
+            ('2025-03-31', 'pengeluaran', 'Bahan Pokok', 'Susu', 42000.5, 'liter'),
+            ('2025-04-01', 'pendapatan', 'Penjualan', 'Es kopi', 18000, None),
+        ]
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_csv_export_honors_month_filter_in_batches(client, flask_app, database):
+    _seed(database)
+    flask_app.config['EXPORT_BATCH_SIZE'] = 1
+    try:
+        response = client.get('/export/csv?month=3&year=2025', buffered=False)
+        chunks = list(response.response)
+    finally:
+        flask_app.config['EXPORT_BATCH_SIZE'] = exports.DEFAULT_CONFIG['EXPORT_BATCH_SIZE']
+
+    assert response.mimetype == 'text/csv'
+    assert 'transaksi_2025-03-01_sd_2025-03-31.csv' in response.headers['Content-Disposition']
+    assert len(chunks) == 3                     # header + one chunk per batch
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8-sig'))))
+    assert rows[0] == list(exports.HEADERS)
+    assert [r[1] for r in rows[1:]] == ['2025-03-01', '2025-03-31']
+    assert rows[1][4] == 'Kopi susu, "gula aren"'
+
+
+def test_xlsx_export_is_a_valid_workbook(client, database):
+    _seed(database)
+    response = client.get('/export/excel?year=2025&date_to=2025-03-01')
+    assert response.mimetype == exports.XLSX_MIMETYPE
+
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert archive.testzip() is None
+    assert '[Content_Types].xml' in archive.namelist()
+    sheet = ET.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+    rows = sheet.findall('.//s:row', NS)
+    assert len(rows) == 3
+
+    first = rows[1].findall('s:c', NS)
+    assert first[0].find('s:v', NS).text == '1'
+    assert first[4].find('.//s:t', NS).text == 'Gelas <plastik> & tutup'
+    assert float(first[5].find('s:v', NS).text) == 1500
+
+
+def test_invalid_filter_redirects(client):
+    response = client.get('/export/csv?date_from=kemarin')
+    assert response.status_code == 302
+
+
+def test_date_only_range_from_a_past_year(client, database):
+    _seed(database)
+    response = client.get('/export/csv?date_from=2025-03-01&date_to=2025-03-01')
+    assert 'transaksi_2025-03-01_sd_2025-03-01.csv' in response.headers['Content-Disposition']
+    rows = list(csv.reader(io.StringIO(response.data.decode('utf-8-sig'))))
+    assert [r[1] for r in rows[1:]] == ['2025-03-01']
+
+
+def test_csv_neutralizes_formula_cells():
+    rows = [(1, '2025-03-01', 'pengeluaran', '@SUM(A1)', '=HYPERLINK("http://x")', -5, '+pcs')]
+    text = b''.join(exports.csv_stream([rows])).decode('utf-8-sig')
+    (row,) = list(csv.reader(io.StringIO(text)))[1:]
+    assert row[3:] == ["'@SUM(A1)", '\'=HYPERLINK("http://x")', '-5', "'+pcs"]
@@ -0,0 +1,50 @@
+"""
+Tests for the sargable date filter builder
+"""
+
+import sqlite3
+from datetime import date
+
+import pytest
+
+import filters
+
+
+@pytest.mark.parametrize('kwargs, expected', [
+    ({}, (None, None)),
+    ({'year': '2025'}, ('2025-01-01', '2026-01-01')),
+    ({'month': '12', 'year': '2025'}, ('2025-12-01', '2026-01-01')),
+    ({'month': '2'}, ('2024-02-01', '2024-03-01')),
+    ({'date_from': '2025-03-05', 'date_to': '2025-03-09'}, ('2025-03-05', '2025-03-10')),
+    ({'month': '3', 'year': '2025', 'date_from': '2025-03-05'}, ('2025-03-05', '2025-04-01')),
+])
+def test_date_range(kwargs, expected):
+    assert filters.date_range(today=date(2024, 6, 1), **kwargs) == expected
+
+
+def test_unfiltered_clause():
+    assert filters.build_date_filter() == ('1=1', [])
+
+
+def test_range_includes_the_whole_last_day(database):
+    conn = sqlite3.connect(database)
+    for tanggal in ('2025-02-28', '2025-03-01', '2025-03-31', '2025-04-01'):
+        conn.execute(
+            "INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah) VALUES (?, 'pendapatan', 'Penjualan', 'x', 1)",
+            (tanggal,)
+        )
+    where, params = filters.build_date_filter(month='3', year='2025')
+    rows = conn.execute(f"SELECT tanggal FROM transactions WHERE {where} ORDER BY tanggal", params).fetchall()
+    assert [r[0] for r in rows] == ['2025-03-01', '2025-03-31']
+
+
+def test_query_plan_uses_tanggal_index(database):
+    conn = sqlite3.connect(database)
+    where, params = filters.build_date_filter(month='3', year='2025')
+    plan = conn.execute(
+        f"EXPLAIN QUERY PLAN SELECT * FROM transactions WHERE {where} ORDER BY tanggal DESC, id DESC",
+        params
+    ).fetchall()
+    details = ' | '.join(row[3] for row in plan)
+    assert 'SEARCH transactions USING INDEX idx_transactions_tanggal (tanggal>? AND tanggal<?)' in details
+    assert 'SCAN transactions' not in details
@@ -0,0 +1,71 @@
+"""
+Tests for the {% cache %} fragment tag and the Jinja bytecode cache
+"""
+
+import os
+import sqlite3
+
+from flask import Flask
+from jinja2 import FileSystemBytecodeCache
+
+import fragments
+
+PAGE = "{{ title }}|{% cache 'rows', month %}{% for r in rows %}{{ r }},{% endfor %}{% endcache %}"
+
+
+def render(flask_app, **context):
+    with flask_app.test_request_context():
+        return flask_app.jinja_env.from_string(PAGE).render(**context)
+
+
+def test_fragment_reused_until_the_data_version_changes(flask_app, database):
+    fragments_cache = flask_app.extensions['fragment_cache']
+    fragments_cache.clear()
+    before = fragments_cache.stats()
+
+    assert render(flask_app, title='a', month=1, rows=[1, 2]) == 'a|1,2,'
+    # Outside the block renders per request; inside comes from the cache
+    assert render(flask_app, title='b', month=1, rows=[9]) == 'b|1,2,'
+    # Another key value is another fragment
+    assert render(flask_app, title='c', month=2, rows=[3]) == 'c|3,'
+
+    conn = sqlite3.connect(database)
+    conn.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+    conn.commit()
+    conn.close()
+    assert render(flask_app, title='d', month=1, rows=[9]) == 'd|9,'
+
+    # Other tests render the real pages through the same app
+    stats = fragments_cache.stats()
+    assert stats['hits'] - before['hits'] == 1 and stats['misses'] - before['misses'] == 3
+
+
+def test_disabled_cache_always_renders(flask_app):
+    flask_app.config['FRAGMENT_CACHE_ENABLED'] = False
+    try:
+        assert render(flask_app, title='a', month=1, rows=[1]) == 'a|1,'
+        assert render(flask_app, title='a', month=1, rows=[2]) == 'a|2,'
+    finally:
+        flask_app.config['FRAGMENT_CACHE_ENABLED'] = True
+
+
+def test_precompile_writes_bytecode(tmp_path):
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    (templates / 'page.html').write_text("{% cache 'x' %}{{ 1 + 1 }}{% endcache %}")
+    app = Flask(__name__, template_folder=str(templates))
+    app.config['JINJA_BYTECODE_DIR'] = str(tmp_path / 'bytecode')
+    fragments.init_app(app)
+
+    assert fragments.precompile(app) == ['page.html']
+    assert len(os.listdir(tmp_path / 'bytecode')) == 1
+
+
+def test_precompile_covers_the_real_templates(flask_app, tmp_path, monkeypatch):
+    bytecode = tmp_path / 'bytecode'
+    bytecode.mkdir()
+    monkeypatch.setattr(flask_app.jinja_env, 'bytecode_cache', FileSystemBytecodeCache(str(bytecode)))
+    flask_app.jinja_env.cache.clear()
+    names = fragments.precompile(flask_app)
+    assert {'admin_dashboard.html', 'viewonly.html', 'cashflow_index.html', 'layout.html'} <= set(names)
+    assert len(os.listdir(bytecode)) == len(names)
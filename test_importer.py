@@ -0,0 +1,84 @@
+"""
+Tests for the bulk CSV/JSON transaction import
+"""
+
+import io
+import json
+import sqlite3
+
+import importer
+
+CSV = """tanggal,tipe,kategori,deskripsi,jumlah,satuan
+2025-06-01,pendapatan,Penjualan,Kopi susu,25000,
+2025-06-01,Pengeluaran,Bahan Pokok,Susu,42000,liter
+2025-13-01,pendapatan,Penjualan,Bulan salah,1000,
+2025-06-02,hibah,Penjualan,Tipe salah,1000,
+2025-06-02,pendapatan,Penjualan,Bukan angka,seribu,
+2025-06-02,pendapatan,,Tanpa kategori,1000,
+"""
+
+
+def test_upload_reports_per_row_errors_and_keeps_the_rest(client, database):
+    response = client.post(
+        '/cashflow/import',
+        data={'file': (io.BytesIO(('\ufeff' + CSV).encode('utf-8')), 'pos.csv')},
+        headers={'Accept': 'application/json'},
+    )
+    body = response.get_json()
+    assert body['inserted'] == 2 and body['rejected'] == 4
+    assert [e['line'] for e in body['errors']] == [4, 5, 6, 7]
+    assert 'tipe' in body['errors'][1]['error']
+
+    conn = sqlite3.connect(database)
+    rows = conn.execute("SELECT tipe, jumlah, satuan, user_id FROM transactions ORDER BY id").fetchall()
+    assert rows == [('pendapatan', 25000.0, None, 1), ('pengeluaran', 42000.0, 'liter', 1)]
+    rollup = conn.execute("SELECT SUM(total) FROM daily_rollups WHERE tanggal = '2025-06-01'").fetchone()[0]
+    assert rollup == 67000.0
+
+
+def test_upload_without_file_redirects(client):
+    response = client.post('/cashflow/import', data={})
+    assert response.status_code == 302
+
+
+def test_cli_imports_json_in_chunks(database, tmp_path, capsys):
+    records = [{'tanggal': f'2025-07-{day:02d}', 'tipe': 'pengeluaran', 'kategori': 'Barang',
+                'deskripsi': 'Gelas', 'jumlah': day} for day in range(1, 31)]
+    records.append({'tanggal': '2025-07-31', 'tipe': 'pendapatan'})
+    path = tmp_path / 'dump.json'
+    path.write_text(json.dumps(records))
+
+    status = importer.main([str(path), '--database', database, '--chunk-size', '7'])
+    assert status == 1
+    assert '30 transactions imported' in capsys.readouterr().out
+
+    conn = sqlite3.connect(database)
+    assert conn.execute("SELECT COUNT(*), SUM(jumlah) FROM transactions").fetchone() == (30, 465.0)
+
+
+def test_database_rejection_falls_back_to_single_rows(database):
+    conn = sqlite3.connect(database)
+    conn.execute(
+        "CREATE TRIGGER no_big BEFORE INSERT ON transactions WHEN NEW.jumlah > 100 "
+        "BEGIN SELECT RAISE(ABORT, 'terlalu besar'); END"
+    )
+    records = enumerate([
+        {'tanggal': '2025-01-01', 'tipe': 'pendapatan', 'kategori': 'Penjualan', 'jumlah': n}
+        for n in (10, 500, 20)
+    ], start=2)
+    result = importer.import_records(conn, records)
+    assert result.inserted == 2
+    assert [(e.line, e.error) for e in result.errors] == [(3, 'terlalu besar')]
+    assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 2
+
+
+def test_malformed_csv_is_rejected_with_400(client):
+    huge = 'x' * 200000
+    body = f'tanggal,tipe,kategori,deskripsi,jumlah\n2025-06-01,pendapatan,Penjualan,"{huge}",1000\n'
+    response = client.post(
+        '/cashflow/import',
+        data={'file': (io.BytesIO(body.encode('utf-8')), 'rusak.csv')},
+        headers={'Accept': 'application/json'},
+    )
+    assert response.status_code == 400
+    assert 'Invalid CSV' in response.get_json()['error']
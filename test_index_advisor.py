@@ -0,0 +1,56 @@
+"""
+Tests for the covering-index migration and index_advisor.py
+"""
+
+import sqlite3
+
+import index_advisor
+import migrations
+
+
+def test_migration_replaces_tipe_index(database):
+    conn = sqlite3.connect(database)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_tipe ON transactions(tipe)")
+    conn.commit()
+    conn.close()
+
+    migrations.migrate(database)
+
+    conn = sqlite3.connect(database)
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'idx_transactions_tipe' not in indexes
+    assert 'idx_transactions_tipe_tanggal_kategori' in indexes
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()[0] == 1
+
+    plan = index_advisor.explain(
+        conn,
+        "SELECT kategori, SUM(jumlah) FROM transactions WHERE tipe = ? AND tanggal >= ? GROUP BY kategori"
+    )
+    assert any('COVERING INDEX idx_transactions_tipe_tanggal_kategori' in detail for detail in plan)
+
+
+def test_advisor_flags_full_scans(tmp_path, capsys):
+    module = tmp_path / 'routes.py'
+    module.write_text(
+        "def report(conn):\n"
+        "    where = 'x'\n"
+        "    conn.execute(\"SELECT * FROM transactions WHERE deskripsi = ?\", ('a',))\n"
+        "    query = f\"SELECT * FROM transactions WHERE {where}\"\n"
+        "    conn.execute(query)\n"
+        "    conn.execute(build())\n"
+    )
+    statements = list(index_advisor.collect_statements(str(module)))
+    assert [s[2] for s in statements] == [
+        "SELECT * FROM transactions WHERE deskripsi = ?",
+        "SELECT * FROM transactions WHERE tanggal >= ? AND tanggal < ?",
+        None,
+    ]
+
+    assert index_advisor.main([str(module)]) == 1
+    output = capsys.readouterr().out
+    assert 'full scan of transactions' in output
+    assert '1 with full scans' in output
+
+
+def test_app_queries_have_no_full_scans():
+    assert index_advisor.main([]) == 0
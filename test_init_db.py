@@ -0,0 +1,51 @@
+"""
+Tests for the seeded bulk load in init_db
+"""
+
+import os
+import sqlite3
+from datetime import date
+
+import init_db
+import rollups
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _dump(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT tanggal, tipe, kategori, deskripsi, jumlah FROM transactions ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+def test_bulk_seed_is_deterministic_and_restores_schema(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    first, second = str(tmp_path / 'a.db'), str(tmp_path / 'b.db')
+    args = ['--days', '10', '--rows-per-day', '25', '--seed', '7', '--end-date', '2025-03-10']
+    assert init_db.main(['--database', first] + args) == 0
+    assert init_db.main(['--database', second] + args) == 0
+
+    rows = _dump(first)
+    assert len(rows) == 250 and rows == _dump(second)
+    assert rows[0][0] == '2025-03-01' and rows[-1][0] == '2025-03-10'
+
+    conn = sqlite3.connect(first)
+    names = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE tbl_name = 'transactions' AND type IN ('index', 'trigger')"
+    )}
+    assert {'idx_transactions_tanggal', 'trg_rollups_insert', 'trg_version_transactions_insert'} <= names
+    assert rollups.verify(conn) == []
+
+    # Triggers are live again after the load
+    conn.execute("INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah) "
+                 "VALUES ('2025-03-10', 'pendapatan', 'Penjualan', 'x', 5)")
+    assert rollups.verify(conn) == []
+
+
+def test_other_seed_gives_other_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    a, b = str(tmp_path / 'a.db'), str(tmp_path / 'b.db')
+    init_db.bulk_seed(a, days=3, rows_per_day=5, seed=1, end_date=date(2025, 1, 3))
+    init_db.bulk_seed(b, days=3, rows_per_day=5, seed=2, end_date=date(2025, 1, 3))
+    assert _dump(a) != _dump(b)
@@ -0,0 +1,66 @@
+"""
+Tests for keyset pagination of the transaction list
+"""
+
+import sqlite3
+
+import pytest
+
+import pagination
+
+
+@pytest.fixture
+def conn(database):
+    conn = sqlite3.connect(database)
+    conn.row_factory = sqlite3.Row
+    rows = [(f"2025-01-{day:02d}",) for day in range(1, 11) for _ in range(3)]
+    conn.executemany(
+        "INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah) VALUES (?, 'pendapatan', 'Penjualan', 'x', 1)",
+        rows
+    )
+    return conn
+
+
+def _ids(page):
+    return [row['id'] for row in page.rows]
+
+
+def test_walks_forward_and_back_over_every_row(conn):
+    expected = [r['id'] for r in conn.execute("SELECT id FROM transactions ORDER BY tanggal DESC, id DESC")]
+
+    pages = [pagination.transactions_page(conn, page_size=7)]
+    assert pages[0].prev_cursor is None
+    while pages[-1].next_cursor:
+        pages.append(pagination.transactions_page(conn, after=pages[-1].next_cursor, page_size=7))
+    assert sum((_ids(p) for p in pages), []) == expected
+    assert len(pages) == 5
+
+    back = pagination.transactions_page(conn, before=pages[2].prev_cursor, page_size=7)
+    assert _ids(back) == _ids(pages[1])
+    first = pagination.transactions_page(conn, before=pages[1].prev_cursor, page_size=7)
+    assert _ids(first) == _ids(pages[0])
+    assert first.prev_cursor is None
+    assert first.next_cursor is not None
+
+
+def test_respects_date_range(conn):
+    page = pagination.transactions_page(conn, '2025-01-03', '2025-01-05', page_size=100)
+    assert {row['tanggal'] for row in page.rows} == {'2025-01-03', '2025-01-04'}
+    assert page.next_cursor is None
+
+
+def test_cursor_round_trip_and_validation():
+    assert pagination.decode_cursor(pagination.encode_cursor('2025-01-02', 42)) == ('2025-01-02', 42)
+    with pytest.raises(ValueError):
+        pagination.decode_cursor('not-a-cursor')
+    assert pagination.clamp_page_size('100000') == pagination.MAX_PAGE_SIZE
+    assert pagination.clamp_page_size('abc', 20) == 20
+
+
+def test_deep_page_is_an_index_range(conn):
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM transactions WHERE (tanggal, id) < (?, ?) AND tanggal >= ? "
+        "ORDER BY tanggal DESC, id DESC LIMIT 51",
+        ('2025-01-05', 10, '2025-01-01')
+    ).fetchall()
+    assert 'USING INDEX idx_transactions_tanggal (tanggal>? AND tanggal<?)' in plan[0][3]
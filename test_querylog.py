@@ -0,0 +1,57 @@
+"""
+Tests for per-request SQL instrumentation
+"""
+
+import json
+import logging
+import sqlite3
+
+import app as app_module
+import querylog
+
+
+def test_server_timing_counts_statements_and_rows(client):
+    response = client.get('/api/expense-distribution')
+    header = response.headers['Server-Timing']
+    assert header.startswith('db;dur=')
+    assert 'queries=' in header and 'app;dur=' in header
+    assert int(header.split('queries=')[1].split()[0]) >= 1
+
+
+def test_request_log_line_and_slow_query_plan(client, flask_app, caplog):
+    flask_app.config['QUERYLOG_SLOW_MS'] = 0.000001
+    try:
+        with caplog.at_level(logging.INFO, logger='app.sql'):
+            client.get('/api/dashboard-stats')
+    finally:
+        flask_app.config['QUERYLOG_SLOW_MS'] = querylog.DEFAULT_CONFIG['QUERYLOG_SLOW_MS']
+
+    entries = [json.loads(r.getMessage()) for r in caplog.records if r.name == 'app.sql']
+    (line,) = [e for e in entries if e['event'] == 'request_sql']
+    assert line['path'] == '/api/dashboard-stats' and line['status'] == 200
+    assert line['queries'] >= 1 and len(line['slowest']) <= 3
+    slow = [e for e in entries if e['event'] == 'slow_query']
+    assert slow and any(e['plan'] for e in slow)
+
+
+def test_traced_cursor_tracks_rows(database):
+    conn = sqlite3.connect(database)
+    stats = querylog.RequestStats()
+    traced = querylog.TracedConnection(conn, stats)
+    traced.executemany("INSERT INTO products (nama, kategori, harga, stok) VALUES (?, 'x', 1, 1)",
+                       [('a',), ('b',), ('c',)])
+    assert len(list(traced.execute("SELECT * FROM products"))) == 3
+    assert traced.execute("SELECT nama FROM products ORDER BY nama").fetchmany(2) == [('a',), ('b',)]
+    assert (stats.count, stats.rows) == (3, 5)
+    assert traced.in_transaction
+
+
+def test_disabled_hands_out_the_bare_connection(client, flask_app):
+    flask_app.config['QUERYLOG_ENABLED'] = False
+    try:
+        response = client.get('/api/expense-distribution')
+        assert 'Server-Timing' not in response.headers
+        with flask_app.test_request_context('/'):
+            assert isinstance(app_module.get_db_connection(), sqlite3.Connection)
+    finally:
+        flask_app.config['QUERYLOG_ENABLED'] = True
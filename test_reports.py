@@ -0,0 +1,94 @@
+"""
+Tests for background PDF reports and the minimal PDF writer
+"""
+
+import os
+import re
+import sqlite3
+import time
+import zlib
+
+import pdf
+import reports
+
+
+def _wait(client, status_url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(status_url).get_json()
+        if job['state'] in ('done', 'failed'):
+            return job
+        time.sleep(0.1)
+    raise AssertionError('report job did not finish')
+
+
+def test_pdf_writer_produces_consistent_xref():
+    document = pdf.Document(title='Uji (1)')
+    page = document.new_page()
+    page.text(40, 800, 'Kopi (susu) \\ gula', bold=True)
+    page.rect(40, 700, 100, 20, fill=(1, 0, 0))
+    data = document.to_bytes()
+
+    assert data.startswith(b'%PDF-1.4') and data.rstrip().endswith(b'%%EOF')
+    startxref = int(re.search(rb'startxref\n(\d+)', data).group(1))
+    assert data[startxref:].startswith(b'xref')
+    for number, offset in enumerate(re.findall(rb'(\d{10}) 00000 n', data), start=1):
+        assert data[int(offset):].startswith(f'{number} 0 obj'.encode())
+
+    stream = re.search(rb'stream\n(.*?)\nendstream', data, re.S).group(1)
+    assert b'(Kopi \\(susu\\) \\\\ gula) Tj' in zlib.decompress(stream)
+
+
+def test_report_job_renders_once_and_is_cached(client, flask_app, database, tmp_path):
+    flask_app.config['REPORT_DIR'] = str(tmp_path / 'reports')
+    conn = sqlite3.connect(database)
+    conn.execute(
+        "INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah, user_id) "
+        "VALUES ('2025-03-05', 'pendapatan', 'Penjualan', 'Kopi', 25000, 1)"
+    )
+    conn.commit()
+    conn.close()
+
+    first = client.get('/export/pdf?month=3&year=2025')
+    assert first.status_code == 202
+    job = _wait(client, first.get_json()['status_url'])
+    assert job['state'] == 'done', job
+
+    download = client.get(job['download_url'])
+    assert download.mimetype == 'application/pdf'
+    assert download.data.startswith(b'%PDF')
+    assert 'transaksi_2025-03-01_sd_2025-03-31.pdf' in download.headers['Content-Disposition']
+
+    again = client.get('/export/pdf?month=3&year=2025')
+    assert again.status_code == 200
+    assert again.get_json()['job_id'] == job['job_id']
+
+    # A write changes data_version and therefore the job key
+    client.post('/cashflow/add', data={
+        'tanggal': '2025-03-06', 'tipe': 'pengeluaran', 'kategori': 'Barang', 'deskripsi': 'x', 'jumlah': '1'
+    })
+    changed = client.get('/export/pdf?month=3&year=2025').get_json()
+    assert changed['job_id'] != job['job_id']
+    _wait(client, changed['status_url'])
+
+
+def test_pending_cap_and_unknown_job(client, flask_app, tmp_path):
+    flask_app.config.update(REPORT_DIR=str(tmp_path / 'reports'), REPORT_MAX_PENDING=0)
+    try:
+        busy = client.get('/export/pdf?year=2024')
+        assert busy.status_code == 503
+        assert busy.headers['Retry-After'] == '10'
+    finally:
+        flask_app.config['REPORT_MAX_PENDING'] = reports.DEFAULT_CONFIG['REPORT_MAX_PENDING']
+
+    assert client.get('/export/pdf/status/not-a-job').status_code == 404
+    assert client.get('/export/pdf/download/' + 'a' * 24).status_code == 404
+
+
+def test_claim_publishes_a_complete_status_once(tmp_path):
+    directory = str(tmp_path)
+    assert reports._claim(directory, 'job', {'state': 'queued'})
+    assert not reports._claim(directory, 'job', {'state': 'other'})
+    assert reports.read_status(directory, 'job') == {'state': 'queued', 'job_id': 'job'}
+    # No temp files left behind by either call
+    assert [name for name in os.listdir(directory) if name.startswith('.tmp-')] == []
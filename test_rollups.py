@@ -0,0 +1,98 @@
+"""
+Tests for the trigger-maintained daily rollups and the migration runner
+"""
+
+import sqlite3
+
+import migrations
+import rollups
+
+
+def _connect(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _rollup(conn, tanggal, tipe, kategori):
+    row = conn.execute(
+        "SELECT total, count FROM daily_rollups WHERE tanggal = ? AND tipe = ? AND kategori = ?",
+        (tanggal, tipe, kategori)
+    ).fetchone()
+    return tuple(row) if row else None
+
+
+def test_triggers_follow_insert_update_delete(database):
+    conn = _connect(database)
+    insert = "INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah) VALUES (?, ?, ?, 'x', ?)"
+    conn.execute(insert, ('2025-05-01', 'pengeluaran', 'Barang', 100))
+    conn.execute(insert, ('2025-05-01', 'pengeluaran', 'Barang', 50))
+    assert _rollup(conn, '2025-05-01', 'pengeluaran', 'Barang') == (150.0, 2)
+
+    conn.execute("UPDATE transactions SET kategori = 'Jasa', jumlah = 70 WHERE jumlah = 50")
+    assert _rollup(conn, '2025-05-01', 'pengeluaran', 'Barang') == (100.0, 1)
+    assert _rollup(conn, '2025-05-01', 'pengeluaran', 'Jasa') == (70.0, 1)
+
+    conn.execute("DELETE FROM transactions WHERE kategori = 'Barang'")
+    assert _rollup(conn, '2025-05-01', 'pengeluaran', 'Barang') is None
+    assert rollups.verify(conn) == []
+
+
+def test_verify_detects_and_rebuild_repairs_drift(database):
+    conn = _connect(database)
+    conn.execute(
+        "INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah) VALUES ('2025-05-02', 'pendapatan', 'Penjualan', 'x', 10)"
+    )
+    conn.execute("UPDATE daily_rollups SET total = 999")
+    assert len(rollups.verify(conn)) == 1
+
+    rollups.rebuild(conn)
+    assert rollups.verify(conn) == []
+
+
+def test_migration_backfills_existing_database(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, password TEXT, role TEXT)")
+    conn.execute(
+        "CREATE TABLE transactions (id INTEGER PRIMARY KEY, tanggal DATE, tipe TEXT, kategori TEXT, deskripsi TEXT, jumlah REAL, user_id INTEGER)"
+    )
+    conn.execute(
+        "INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah) VALUES ('2025-01-01', 'pendapatan', 'Penjualan', 'x', 5)"
+    )
+    conn.commit()
+    conn.close()
+
+    assert migrations.migrate(path) == [m[0] for m in migrations.MIGRATIONS]
+    assert migrations.migrate(path) == []
+
+    conn = _connect(path)
+    assert _rollup(conn, '2025-01-01', 'pendapatan', 'Penjualan') == (5.0, 1)
+    assert migrations.current_version(conn) == migrations.LATEST_VERSION
+
+
+def test_cli_verify_reports_drift(database, capsys):
+    conn = _connect(database)
+    conn.execute("INSERT INTO daily_rollups VALUES ('2025-01-01', 'pendapatan', 'Penjualan', 1, 1)")
+    conn.commit()
+    assert rollups.main(['verify', '--database', database]) == 1
+    assert rollups.main(['rebuild', '--database', database]) == 0
+    assert rollups.main(['verify', '--database', database]) == 0
+
+
+def test_cli_verify_on_unmigrated_database(tmp_path, capsys):
+    database = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(database)
+    conn.execute(
+        "CREATE TABLE transactions (id INTEGER PRIMARY KEY, tanggal DATE, tipe TEXT, kategori TEXT, deskripsi TEXT, jumlah REAL, user_id INTEGER)"
+    )
+    conn.execute(
+        "INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah) VALUES ('2025-01-01', 'pendapatan', 'Penjualan', 'x', 5)"
+    )
+    conn.commit()
+    conn.close()
+
+    assert rollups.main(['verify', '--database', database]) == 2
+    assert 'no daily_rollups table' in capsys.readouterr().out
+    assert rollups.main(['rebuild', '--database', database]) == 0
+    assert rollups.main(['verify', '--database', database]) == 0
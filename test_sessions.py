@@ -0,0 +1,95 @@
+"""
+Tests for server-side login sessions
+"""
+
+import sqlite3
+
+import pytest
+
+import db
+import sessions
+
+
+@pytest.fixture
+def kasir(flask_app, database):
+    """Second client logged in as a plain user (id 2)"""
+    conn = sqlite3.connect(database)
+    conn.execute("INSERT INTO users (username, password, role) VALUES ('kasir', 'x', 'user')")
+    conn.commit()
+    conn.close()
+    client = flask_app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(username='kasir', role='user', user_id=2)
+    return client
+
+
+def _cookie(client, flask_app):
+    cookie = client.get_cookie(flask_app.config['SESSION_COOKIE_NAME'])
+    return flask_app.session_interface.get_signing_serializer(flask_app).loads(cookie.value)
+
+
+def test_cookie_carries_only_the_session_id(client, flask_app):
+    payload = _cookie(client, flask_app)
+    assert set(payload) == {sessions.SID_KEY}
+
+    store = sessions.get_store(flask_app)
+    assert client.get('/api/db-status').status_code == 200
+    hits = store.cache.hits
+    assert client.get('/api/db-status').status_code == 200
+    assert store.cache.hits == hits + 1
+
+
+def test_clearing_and_restoring_the_same_login_keeps_the_session(client):
+    with client.session_transaction() as sess:
+        identity = {key: sess[key] for key in sessions.IDENTITY_KEYS}
+        sess.clear()
+        sess.update(identity)
+    assert client.get('/api/db-status').status_code == 200
+
+
+def test_forged_role_in_cookie_is_ignored(flask_app):
+    client = flask_app.test_client()
+    forged = flask_app.session_interface.get_signing_serializer(flask_app).dumps(
+        {'username': 'admin', 'role': 'admin', 'user_id': 1})
+    client.set_cookie(flask_app.config['SESSION_COOKIE_NAME'], forged)
+    assert client.get('/api/db-status').status_code == 302
+
+
+def test_role_change_applies_without_logging_in_again(client, kasir):
+    assert kasir.get('/api/db-status').status_code == 302
+    client.post('/users/edit', data={'user_id': '2', 'username': 'kasir', 'role': 'admin'})
+    assert kasir.get('/api/db-status').status_code == 200
+
+
+def test_deleting_a_user_ends_their_sessions(client, kasir, database):
+    assert kasir.get('/api/dashboard-stats').status_code == 200
+    assert client.post('/delete_user/2').get_json()['success']
+    assert kasir.get('/api/dashboard-stats').status_code == 302
+
+    conn = sqlite3.connect(database)
+    assert conn.execute("SELECT COUNT(*) FROM sessions WHERE user_id = 2").fetchone()[0] == 0
+
+
+def test_logout_deletes_the_row(client, database):
+    client.get('/logout')
+    conn = sqlite3.connect(database)
+    assert conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 0
+
+
+def test_login_and_session_writes_share_the_request_connection(flask_app):
+    pool = flask_app.extensions['db_pool']
+    if pool is not None:
+        pool.close_all()
+    flask_app.extensions['db_pool'] = None
+    flask_app.config.update(DB_POOL_SIZE=1, DB_POOL_TIMEOUT=0.2)
+    try:
+        client = flask_app.test_client()
+        response = client.post('/login', data={'username': 'BagasNz', 'password': '162316'})
+        assert response.status_code == 302
+        assert client.get('/api/db-status').status_code == 200
+        assert client.get('/logout').status_code == 302
+    finally:
+        flask_app.extensions['db_pool'].close_all()
+        flask_app.extensions['db_pool'] = None
+        flask_app.config.update(DB_POOL_SIZE=db.DEFAULT_CONFIG['DB_POOL_SIZE'],
+                                DB_POOL_TIMEOUT=db.DEFAULT_CONFIG['DB_POOL_TIMEOUT'])
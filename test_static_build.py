@@ -0,0 +1,101 @@
+"""
+Tests for the incremental static build
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+
+import static_build
+
+
+def build(tmp_path, database, **kwargs):
+    return static_build.build_static_version(str(tmp_path / 'dist'), database, **kwargs)
+
+
+def test_unchanged_build_writes_nothing(tmp_path, database, monkeypatch):
+    first = build(tmp_path, database)
+    assert sorted(first.written) == ['404.html', 'api/dashboard-stats.json',
+                                     'api/recent-transactions.json', 'api/shards/index.json',
+                                     'api/shards/index.json.gz', 'dashboard.html', 'index.html']
+
+    # Nothing changed: the database is not even queried
+    monkeypatch.setattr(static_build, 'load_dashboard_data', lambda *a: 1 / 0)
+    monkeypatch.setattr(static_build, 'load_daily_rows', lambda *a: 1 / 0)
+    second = build(tmp_path, database)
+    assert second.written == [] and len(second.unchanged) == 7
+    assert not [f for f in os.listdir(tmp_path / 'dist') if f.startswith('.tmp-')]
+
+
+def test_data_change_rebuilds_only_data_pages(tmp_path, database):
+    build(tmp_path, database)
+    conn = sqlite3.connect(database)
+    conn.execute(
+        "INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah, user_id) "
+        "VALUES (date('now'), 'pendapatan', 'Penjualan', 'Kopi', 15000, 1)"
+    )
+    conn.commit()
+    conn.close()
+
+    result = build(tmp_path, database)
+    assert '404.html' in result.unchanged
+    assert 'api/recent-transactions.json' in result.written
+    recent = json.loads((tmp_path / 'dist' / 'api' / 'recent-transactions.json').read_text())
+    assert recent['recent_transactions'][0]['jumlah'] == 15000
+
+
+def test_edited_or_stale_outputs_are_repaired(tmp_path, database):
+    build(tmp_path, database)
+    dist = tmp_path / 'dist'
+    (dist / '404.html').write_text('hand edit')
+    manifest = json.loads((dist / static_build.MANIFEST).read_text())
+    manifest['outputs']['old.html'] = {'inputs': 'x', 'sha256': 'y'}
+    (dist / static_build.MANIFEST).write_text(json.dumps(manifest))
+    (dist / 'old.html').write_text('gone soon')
+
+    result = build(tmp_path, database)
+    assert result.written == ['404.html']
+    assert not (dist / 'old.html').exists()
+    assert 'Halaman Tidak Ditemukan' in (dist / '404.html').read_text()
+
+
+def test_shards_cover_each_month_and_year():
+    rows = [
+        ('2024-02-29', 'pendapatan', 'Penjualan', 30000.0, 3),
+        ('2024-02-29', 'pengeluaran', 'Bahan Pokok', 12500.5, 1),
+        ('2024-12-31', 'pengeluaran', 'Jasa', 1000.0, 1),
+        ('bukan-tanggal', 'pendapatan', 'Penjualan', 1.0, 1),
+    ]
+    shards = static_build.build_shards(rows)
+    assert sorted(shards) == ['2024', '2024-02', '2024-12']
+
+    february = shards['2024-02']
+    assert february['start'] == '2024-02-01' and len(february['daily']['revenue']) == 29
+    assert february['daily']['revenue'][28] == 30000 and february['daily']['expense'][28] == 12500.5
+    assert february['totals'] == {'revenue': 30000, 'expense': 12500.5, 'profit': 17499.5, 'count': 4}
+    assert february['categories'][0] == {'tipe': 'pendapatan', 'kategori': 'Penjualan', 'total': 30000, 'count': 3}
+
+    year = shards['2024']
+    assert len(year['daily']['expense']) == 366 and year['daily']['expense'][365] == 1000
+    assert year['totals']['count'] == 5
+
+
+def test_shard_files_index_and_gzip_siblings(tmp_path, database):
+    conn = sqlite3.connect(database)
+    conn.executemany(
+        "INSERT INTO transactions (tanggal, tipe, kategori, deskripsi, jumlah, user_id) VALUES (?, ?, ?, 'x', ?, 1)",
+        [('2025-05-03', 'pendapatan', 'Penjualan', 20000), ('2025-06-01', 'pengeluaran', 'Barang', 5000)]
+    )
+    conn.commit()
+    conn.close()
+    build(tmp_path, database)
+
+    api = tmp_path / 'dist' / 'api'
+    index = json.loads((api / 'shards' / 'index.json').read_text())
+    assert sorted(index['months']) == ['2025-05', '2025-06'] and list(index['years']) == ['2025']
+    entry = index['months']['2025-06']
+    shard = (tmp_path / 'dist' / entry['path']).read_bytes()
+    assert len(shard) == entry['bytes']
+    assert json.loads(shard)['totals']['expense'] == 5000
+    assert gzip.decompress((api / 'shards' / '2025-06.json.gz').read_bytes()) == shard
@@ -0,0 +1,122 @@
+"""
+Tests for the /api/stream Server-Sent Events channel
+"""
+
+import json
+import threading
+
+import db
+import stream
+
+
+def _events(chunks):
+    """Parse SSE text into (event, data) pairs, skipping comments and retry"""
+    events = []
+    for block in b''.join(chunks).decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines()
+                      if ': ' in line and not line.startswith(':'))
+        if 'data' in fields:
+            events.append((fields.get('event'), json.loads(fields['data'])))
+    return events
+
+
+def test_subscriber_cap_and_drop_oldest():
+    broadcaster = stream.Broadcaster(max_subscribers=1, max_pending=2)
+    subscriber = broadcaster.subscribe()
+    assert broadcaster.subscribe() is None
+    assert broadcaster.stats()['rejected'] == 1
+
+    for i in range(3):
+        broadcaster.publish({'id': i})
+    assert subscriber.dropped == 1
+    assert [c['id'] for c in subscriber.drain()] == [1, 2]
+
+    broadcaster.unsubscribe(subscriber)
+    assert broadcaster.subscribe() is not None
+
+
+def test_version_is_read_once_per_interval():
+    broadcaster = stream.Broadcaster(poll_interval=60)
+    reads = []
+    read = lambda: reads.append(1) or len(reads)
+    assert broadcaster.current_version(read) == 1
+    assert broadcaster.current_version(read) == 1
+    broadcaster.publish({'action': 'add'})
+    assert broadcaster.current_version(read) == 2
+
+
+def test_stream_pushes_update_after_a_write(client, flask_app):
+    flask_app.config.update(STREAM_POLL_INTERVAL=0.01, STREAM_MAX_AGE=0.5)
+    try:
+        response = client.get('/api/stream', buffered=False)
+        assert response.mimetype == 'text/event-stream'
+        chunks = response.response
+        first = [next(chunks), next(chunks)]
+        assert _events(first)[0][0] == 'ready'
+
+        client.post('/cashflow/add', data={
+            'tanggal': '2025-05-01', 'tipe': 'pendapatan', 'kategori': 'Penjualan',
+            'deskripsi': 'x', 'jumlah': '750'
+        })
+        event, data = _events([next(chunks)])[0]
+        assert event == 'update'
+        assert data['changes'][0]['action'] == 'add'
+        assert data['changes'][0]['jumlah'] == '750'
+        assert set(data['stats']) >= {'total_revenue', 'total_expense', 'profit'}
+        response.close()
+    finally:
+        flask_app.config.update(STREAM_POLL_INTERVAL=2.0, STREAM_MAX_AGE=300.0)
+    assert flask_app.extensions['stream'].stats()['subscribers'] == 0
+
+
+def test_stream_rejects_when_full(client, flask_app):
+    broadcaster = flask_app.extensions['stream']
+    held = [broadcaster.subscribe() for _ in range(broadcaster.max_subscribers)]
+    try:
+        response = client.get('/api/stream')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '30'
+    finally:
+        for subscriber in held:
+            broadcaster.unsubscribe(subscriber)
+
+
+def test_open_streams_do_not_hold_pool_connections(client, flask_app, monkeypatch):
+    # Every request resolves its session from the database
+    identities = flask_app.extensions['session_store'].cache
+    monkeypatch.setattr(identities, 'ttl', 0)
+    identities.discard_user(1)
+    pool = flask_app.extensions['db_pool']
+    if pool is not None:
+        pool.close_all()
+    flask_app.extensions['db_pool'] = None
+    flask_app.config.update(DB_POOL_SIZE=2, DB_POOL_TIMEOUT=0.2)
+    cookie = client.get_cookie(flask_app.config['SESSION_COOKIE_NAME']).value
+    opened, done, statuses = threading.Barrier(4), threading.Event(), []
+
+    def listen():
+        # One stream per thread, like one gthread per EventSource
+        listener = flask_app.test_client()
+        listener.set_cookie(flask_app.config['SESSION_COOKIE_NAME'], cookie)
+        response = listener.get('/api/stream', buffered=False)
+        statuses.append(response.status_code)
+        next(response.response)
+        opened.wait()
+        done.wait(5)
+        response.close()
+
+    threads = [threading.Thread(target=listen) for _ in range(3)]
+    try:
+        for thread in threads:
+            thread.start()
+        opened.wait(5)
+        assert statuses == [200, 200, 200]
+        assert client.get('/api/db-status').status_code == 200
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join(5)
+        flask_app.extensions['db_pool'].close_all()
+        flask_app.extensions['db_pool'] = None
+        flask_app.config.update(DB_POOL_SIZE=db.DEFAULT_CONFIG['DB_POOL_SIZE'],
+                                DB_POOL_TIMEOUT=db.DEFAULT_CONFIG['DB_POOL_TIMEOUT'])